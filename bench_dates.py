@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Date parsing micro-benchmark for WAZ Nieplitz Water Meter Add-on
+Compares dateutil parsing with the strict, memoized parsers in run.py on typical portal tables
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_synthetic import portal_rows
+from run import parse_iso_timestamp, parse_manual_date, parse_portal_date
+
+
+def portal_table_cells(meters: int, rows_per_meter: int, seed: int = 42):
+    """Ablesetag/Stichtag cell values of a synthetic portal readings table."""
+    cells = []
+    for row in portal_rows(meters, rows_per_meter, seed):
+        cells.append(row['ablesetag'])
+        cells.append(row['stichtag'])
+    return cells
+
+
+def bench(label: str, func, number: int, baseline: float = None) -> float:
+    """Time func and print the per-call cost."""
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    speedup = f"  ({baseline / seconds:.1f}x)" if baseline else ''
+    print(f"  {label:<48} {seconds * 1e6:>10.1f} µs{speedup}")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark date parsing')
+    parser.add_argument('--meters', type=int, default=2, help='Meters in the portal table')
+    parser.add_argument('--rows', type=int, default=10, help='Rows per meter')
+    parser.add_argument('--number', type=int, default=200, help='Table parses per measurement')
+    args = parser.parse_args()
+
+    from dateutil import parser as date_parser
+
+    cells = portal_table_cells(args.meters, args.rows)
+    iso_dates = [parse_portal_date(c).isoformat() for c in cells if c]
+    manual_dates = [d[:10] for d in iso_dates]
+
+    print("=" * 80)
+    print(f"DATE PARSING BENCHMARK ({len(cells)} portal date cells per table)")
+    print("=" * 80)
+
+    def dateutil_table():
+        for cell in cells:
+            if cell:
+                try:
+                    date_parser.parse(cell, dayfirst=True)
+                except (ValueError, OverflowError):
+                    pass
+
+    def fast_table_cold():
+        parse_portal_date.cache_clear()
+        for cell in cells:
+            parse_portal_date(cell)
+
+    def fast_table_warm():
+        for cell in cells:
+            parse_portal_date(cell)
+
+    print("\nPortal table (Ablesetag + Stichtag):")
+    baseline = bench('dateutil.parser.parse(dayfirst=True)', dateutil_table, args.number)
+    bench('parse_portal_date, cold cache', fast_table_cold, args.number, baseline)
+    bench('parse_portal_date, warm cache', fast_table_warm, args.number, baseline)
+
+    def strptime_manual():
+        from datetime import datetime
+        for value in manual_dates:
+            try:
+                datetime.strptime(value, "%d.%m.%Y")
+            except ValueError:
+                datetime.strptime(value, "%Y-%m-%d")
+
+    def fast_manual_cold():
+        parse_manual_date.cache_clear()
+        for value in manual_dates:
+            parse_manual_date(value)
+
+    print("\nManual dates (add_reading / delete_reading):")
+    baseline = bench('strptime, two formats', strptime_manual, args.number)
+    bench('parse_manual_date, cold cache', fast_manual_cold, args.number, baseline)
+
+    def fromisoformat_rows():
+        from datetime import datetime, timezone
+        for value in iso_dates:
+            date_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if date_obj.tzinfo is None:
+                date_obj = date_obj.replace(tzinfo=timezone.utc)
+
+    def fast_iso_warm():
+        for value in iso_dates:
+            parse_iso_timestamp(value)
+
+    print("\nStatistics rows (import_statistics):")
+    baseline = bench('fromisoformat + tz per row', fromisoformat_rows, args.number)
+    bench('parse_iso_timestamp, warm cache', fast_iso_warm, args.number, baseline)
+
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
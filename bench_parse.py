@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Readings page parsing benchmark for WAZ Nieplitz Water Meter Add-on
+Compares parsing many accounts' readings pages in the fetching thread with a process pool
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_synthetic import readings_page
+from run import (
+    available_cpus, build_meters, iter_readings_rows, parse_readings_page, soup_readings_rows,
+    _pooled_readings_rows
+)
+
+
+def parse_in_thread(pages, streaming: bool):
+    """Parse every page in this thread, like the fetch loop does without a pool."""
+    for page in pages:
+        if streaming:
+            chunks = (page[i:i + 16384] for i in range(0, len(page), 16384))
+            build_meters(iter_readings_rows(chunks))
+        else:
+            build_meters(soup_readings_rows(page))
+
+
+def parse_in_pool(pool, pages):
+    """Hand every page to the pool at once, like concurrent fetches of many accounts."""
+    futures = [pool.submit(parse_readings_page, page, 'utf-8') for page in pages]
+    for future in futures:
+        build_meters(_pooled_readings_rows(future))
+
+
+def measure(label: str, func, pages: int, baseline: float = None) -> float:
+    """Time func and print the page throughput."""
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    speedup = f"  ({baseline / seconds:.1f}x)" if baseline else ''
+    print(f"  {label:<40} {seconds:>7.2f} s {pages / seconds:>8.1f} pages/s{speedup}")
+    return seconds
+
+
+def peak_memory(func) -> int:
+    """Peak Python heap allocated while running func, in KiB."""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak // 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark readings page parsing')
+    parser.add_argument('--accounts', type=int, default=64, help='Readings pages parsed per cycle')
+    parser.add_argument('--meters', type=int, default=3, help='Meters per account')
+    parser.add_argument('--rows', type=int, default=10, help='Readings per meter')
+    parser.add_argument('--padding', type=int, default=200000, help='Bytes of page content outside the table')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Pool sizes to measure')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    pages = [readings_page(args.meters, args.rows, args.padding, seed) for seed in range(args.accounts)]
+
+    print("=" * 80)
+    print(f"READINGS PARSE BENCHMARK ({args.accounts} pages of {len(pages[0]) // 1024} KiB, "
+          f"{available_cpus()} CPU core(s) available)")
+    print("=" * 80)
+
+    print("\nThroughput:")
+    baseline = measure('BeautifulSoup, in thread', lambda: parse_in_thread(pages, streaming=False), len(pages))
+    streaming = measure('Streaming parser, in thread', lambda: parse_in_thread(pages, streaming=True),
+                        len(pages), baseline)
+    for workers in args.workers:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            # Start the workers before measuring, as the add-on does at startup
+            list(pool.map(abs, range(workers)))
+            measure(f'Process pool, {workers} worker(s)', lambda: parse_in_pool(pool, pages), len(pages), streaming)
+
+    print("\nPeak memory of one page:")
+    page = pages[0]
+    print(f"  {'BeautifulSoup':<40} {peak_memory(lambda: parse_in_thread([page], streaming=False)):>7} KiB")
+    print(f"  {'Streaming parser':<40} {peak_memory(lambda: parse_in_thread([page], streaming=True)):>7} KiB")
+
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for WAZ Nieplitz Water Meter Add-on
+Records import time per module and the time until the web interface answers /status
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Libraries that should only be loaded once the subsystem needing them runs
+HEAVY_MODULES = ['requests', 'bs4', 'dateutil', 'flask', 'werkzeug', 'websocket', 'lxml']
+
+# Child process: import run.py, start the web server and time the first /status answer
+STATUS_PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import run
+t_import = time.perf_counter() - t0
+import threading
+threading.Thread(target=run.run_web_server, daemon=True).start()
+run.app_state['web_ready'].wait(30)
+import http.client
+conn = http.client.HTTPConnection('127.0.0.1', run.INGRESS_PORT, timeout=10)
+conn.request('GET', '/status')
+status = conn.getresponse().status
+t_status = time.perf_counter() - t0
+scraping = [m for m in ('requests', 'bs4', 'dateutil', 'websocket', 'lxml') if m in sys.modules]
+print(json.dumps({'import_run': t_import, 'status': status,
+                  'time_to_status': t_status, 'scraping_loaded': scraping}))
+'''
+
+
+def free_port() -> int:
+    """Find a free TCP port on localhost."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure_import_times():
+    """Run 'import run' with -X importtime and return per-module timings in microseconds."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import json, sys, run; '
+         f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'],
+        cwd=SCRIPT_DIR, capture_output=True, text=True, check=True
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings.append((name.rstrip(), int(self_us), int(cumulative_us)))
+
+    heavy_loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, heavy_loaded
+
+
+def measure_time_to_status():
+    """Start the web server in a fresh interpreter and time the first /status answer."""
+    env = dict(os.environ, INGRESS_PORT=str(free_port()))
+    result = subprocess.run(
+        [sys.executable, '-c', STATUS_PROBE],
+        cwd=SCRIPT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark add-on startup time')
+    parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to average')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest modules to list')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='Fail if median time to /status exceeds this many seconds')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("STARTUP BENCHMARK")
+    print("=" * 80)
+
+    timings, heavy_loaded = measure_import_times()
+    run_entry = next((t for t in timings if t[0].strip() == 'run'), None)
+
+    print(f"\nImport time per module (top {args.top} by cumulative time):\n")
+    print(f"  {'module':<45} {'self [ms]':>10} {'cumulative [ms]':>16}")
+    for name, self_us, cumulative_us in sorted(timings, key=lambda t: t[2], reverse=True)[:args.top]:
+        print(f"  {name:<45} {self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}")
+
+    if run_entry:
+        print(f"\n'import run' cumulative: {run_entry[2] / 1000:.1f} ms")
+    print(f"Heavy modules loaded by 'import run': {', '.join(heavy_loaded) or 'none'}")
+
+    results = [measure_time_to_status() for _ in range(args.runs)]
+    times = sorted(r['time_to_status'] for r in results)
+    median = times[len(times) // 2]
+    scraping_loaded = sorted({m for r in results for m in r['scraping_loaded']})
+
+    print(f"\nTime to first /status answer over {args.runs} cold start(s):")
+    print(f"  min {times[0] * 1000:.1f} ms, median {median * 1000:.1f} ms, max {times[-1] * 1000:.1f} ms")
+    print(f"  Scraping libraries loaded at that point: {', '.join(scraping_loaded) or 'none'}")
+
+    failed = False
+    if any(r['status'] != 200 for r in results):
+        print("✗ /status did not answer with HTTP 200")
+        failed = True
+    if scraping_loaded:
+        print("✗ Scraping libraries were loaded before the web server answered")
+        failed = True
+    if args.budget is not None:
+        if median > args.budget:
+            print(f"✗ Median time to /status {median:.3f}s exceeds budget of {args.budget:.3f}s")
+            failed = True
+        else:
+            print(f"✓ Median time to /status within budget of {args.budget:.3f}s")
+
+    print("=" * 80)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
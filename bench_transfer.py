@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Transfer benchmark for WAZ Nieplitz Water Meter Add-on
+Measures response bytes of the web interface with and without gzip and estimates time to interactive
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+import run
+from generate_synthetic import write_historical_store
+
+# (name, bandwidth in bit/s, round-trip time in seconds)
+LINK_PROFILES = [
+    ('Mobile 3G', 1_600_000, 0.150),
+    ('Remote DSL', 16_000_000, 0.040),
+    ('Local network', 100_000_000, 0.002),
+]
+
+
+def transfer(client, path: str, headers: dict) -> tuple:
+    """Request a path and return (status, body bytes, response headers, server seconds)."""
+    start = time.perf_counter()
+    response = client.get(path, headers=headers)
+    elapsed = time.perf_counter() - start
+    return response.status_code, len(response.get_data()), response.headers, elapsed
+
+
+def time_to_interactive(index_bytes: int, config_bytes: int, summary_bytes: int, status_bytes: int,
+                        page_bytes: int, bandwidth: float, rtt: float) -> float:
+    """
+    Estimate time to interactive for the page load sequence:
+    index.html, then /config, then /status and the historical summary in parallel,
+    then the first page of readings of every meter in parallel.
+    """
+    def fetch(size):
+        return rtt + size * 8 / bandwidth
+
+    return (fetch(index_bytes) + fetch(config_bytes) + rtt + (status_bytes + summary_bytes) * 8 / bandwidth
+            + fetch(page_bytes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark web interface transfer size')
+    parser.add_argument('--meters', type=int, default=2, help='Meters in the historical store')
+    parser.add_argument('--readings', type=int, default=300, help='Historical readings per meter')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'historical_readings.json')
+        write_historical_store(store, args.meters, args.readings)
+
+        run.INDEX_HTML_FILE = os.path.join(SCRIPT_DIR, 'index.html')
+        run.app_state['historical_manager'] = run.HistoricalReadingsManager(filepath=store)
+        run.app_state['config'] = {'main_meter_number': '15093668', 'garden_meter_number': '15093669'}
+        client = run.create_app().test_client()
+
+        plain = {}
+        compressed = {}
+        print("=" * 80)
+        print(f"TRANSFER BENCHMARK ({args.meters} meter(s) x {args.readings} historical reading(s))")
+        print("=" * 80)
+        print(f"\n  {'path':<44} {'identity [B]':>13} {'gzip [B]':>10} {'ratio':>7} {'gzip server [ms]':>17}")
+        first_pages = [f"/historical/list?meter={15093668 + m}&limit={run.HISTORICAL_PAGE_SIZE}"
+                       for m in range(args.meters)]
+        for path in ['/', '/config', '/status', '/historical/list', '/historical/list?summary=1'] + first_pages:
+            _, plain[path], _, _ = transfer(client, path, {})
+            _, compressed[path], headers, seconds = transfer(client, path, {'Accept-Encoding': 'gzip'})
+            encoding = headers.get('Content-Encoding', 'identity')
+            print(f"  {path:<44} {plain[path]:>13} {compressed[path]:>10} "
+                  f"{plain[path] / max(compressed[path], 1):>6.1f}x {seconds * 1000:>16.2f}  ({encoding})")
+
+        _, _, headers, _ = transfer(client, '/', {'Accept-Encoding': 'gzip'})
+        status, revalidated, _, _ = transfer(client, '/', {'Accept-Encoding': 'gzip',
+                                                          'If-None-Match': headers['ETag']})
+        print(f"\n  Revalidated index.html: HTTP {status}, {revalidated} body bytes")
+
+        plain_pages = sum(plain[path] for path in first_pages)
+        compressed_pages = sum(compressed[path] for path in first_pages)
+        print(f"\n  Initial historical load: {compressed['/historical/list?summary=1'] + compressed_pages} gzip bytes "
+              f"(summary + first pages) instead of {compressed['/historical/list']} (full list)")
+
+        print("\nEstimated time to interactive:")
+        print(f"  {'link':<16} {'identity':>10} {'gzip':>10} {'gzip + 304':>12}")
+        for name, bandwidth, rtt in LINK_PROFILES:
+            before = time_to_interactive(plain['/'], plain['/config'], plain['/historical/list?summary=1'],
+                                         plain['/status'], plain_pages, bandwidth, rtt)
+            after = time_to_interactive(compressed['/'], compressed['/config'], compressed['/historical/list?summary=1'],
+                                        compressed['/status'], compressed_pages, bandwidth, rtt)
+            cached = time_to_interactive(revalidated, compressed['/config'], compressed['/historical/list?summary=1'],
+                                         compressed['/status'], compressed_pages, bandwidth, rtt)
+            print(f"  {name:<16} {before * 1000:>8.0f}ms {after * 1000:>8.0f}ms {cached * 1000:>10.0f}ms")
+
+        print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for WAZ Nieplitz Water Meter Add-on
+Builds portal readings pages and historical readings stores far larger than a real account,
+for benchmarks and soak tests
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Dict, List
+
+FIRST_METER = 15093668  # Meter numbers count up from the main meter
+LAST_DATE = date(2024, 12, 31)  # Newest Stichtag; older rows step back from here
+READING_TYPES = [
+    'Kundenangabe',
+    'Kundenangabe, Jahresabrechnung',
+    'Ablesung durch Versorger',
+    'Schätzung'
+]
+
+
+def european_number(value: float, decimals: int = 1, thousands: bool = False) -> str:
+    """Format a number like the portal: decimal comma, optionally dots between thousands."""
+    text = f"{value:,.{decimals}f}" if thousands else f"{value:.{decimals}f}"
+    return text.replace(',', ' ').replace('.', ',').replace(' ', '.')
+
+
+def portal_rows(meters: int, rows_per_meter: int, seed: int = 0, edge_cases: bool = True,
+                interval_days: int = 365) -> List[Dict[str, str]]:
+    """
+    Build readings rows as cell texts keyed by the portal's td classes, newest first.
+
+    With edge_cases, about one row in ten has no Ablesetag, one in ten shows
+    its Stand with thousands separators and three decimals (1.234,567), and
+    one in twenty is followed by a correction with the same dates.
+
+    Args:
+        meters: Number of meters
+        rows_per_meter: Readings per meter, not counting duplicated dates
+        seed: Random seed; the same arguments always give the same rows
+        edge_cases: Mix in the unusual rows described above
+        interval_days: Days between consecutive Stichtage of a meter
+
+    Returns:
+        One dict per row with zaehler, ablesetag, stichtag, stand, verbrauch and ablesart
+    """
+    rng = random.Random(seed)
+    rows = []
+    for m in range(meters):
+        meter_number = str(FIRST_METER + m)
+        reading = 1000.0 * (m + 1) + rows_per_meter * 170
+        for i in range(rows_per_meter):
+            stichtag = LAST_DATE - timedelta(days=i * interval_days)
+            ablesetag = stichtag - timedelta(days=rng.randint(0, min(20, interval_days - 1)))
+            consumption = rng.randint(20, 160)
+            row = {
+                'zaehler': meter_number,
+                'ablesetag': ablesetag.strftime('%d.%m.%Y'),
+                'stichtag': stichtag.strftime('%d.%m.%Y'),
+                'stand': european_number(reading),
+                'verbrauch': str(consumption),
+                'ablesart': rng.choice(READING_TYPES)
+            }
+
+            roll = rng.random() if edge_cases else 1.0
+            if roll < 0.1:
+                row['ablesetag'] = ''
+            elif roll < 0.2:
+                row['stand'] = european_number(reading, decimals=3, thousands=True)
+            rows.append(row)
+            if roll < 0.05:
+                correction = dict(row, stand=european_number(reading + 0.5), ablesart='Korrektur')
+                rows.append(correction)
+
+            reading -= consumption + rng.randint(0, 9) / 10
+    return rows
+
+
+def row_html(row: Dict[str, str]) -> str:
+    """Render one readings row the way the portal does, with a label span per cell."""
+    labels = {
+        'zaehler': 'Zähler', 'ablesetag': 'Ablesetag', 'stichtag': 'Stichtag',
+        'stand': 'Stand', 'verbrauch': 'Verbrauch (m³)', 'ablesart': 'Ableseart'
+    }
+    suffix = {'stand': ' m³'}
+    cells = ''.join(
+        f'<td class="{cls}"><span class="label">{label}</span> {row[cls]}{suffix.get(cls, "") if row[cls] else ""}</td>'
+        for cls, label in labels.items()
+    )
+    return f'<tr class="item">{cells}</tr>'
+
+
+def readings_page(meters: int, rows_per_meter: int, padding: int = 0, seed: int = 0,
+                  edge_cases: bool = True, interval_days: int = 365) -> bytes:
+    """
+    Build a readings page like the portal's for the rows of portal_rows().
+
+    The page has navigation, a script of about padding/4 bytes and news
+    blocks of about padding bytes around the readings table, plus another
+    listview table with a tr.item row the parser has to skip.
+    """
+    rows = portal_rows(meters, rows_per_meter, seed, edge_cases, interval_days)
+    nav = ''.join(f'<li><a href="/seite/{i}">Menüpunkt {i}</a></li>' for i in range(40))
+    filler = '<div class="news"><p>' + 'Informationen zur Trinkwasserversorgung. ' * 30 + '</p></div>'
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Ablesungen</title>'
+        f'<script>var config = {{"token": "{"x" * (padding // 4)}"}};</script></head>'
+        f'<body><nav><ul>{nav}</ul></nav>'
+        + filler * (padding // 2400)
+        + '<table class="listview other"><tr class="item"><td class="zaehler">99999999</td></tr></table>'
+        + '<table class="listview ablesungen"><tr class="head"><th>Zähler</th><th>Stand</th></tr>'
+        + ''.join(row_html(row) for row in rows)
+        + '</table></body></html>'
+    ).encode('utf-8')
+
+
+def historical_store(meters: int, readings_per_meter: int, seed: int = 0, edge_cases: bool = True,
+                     interval_days: int = 1) -> Dict[str, List[Dict]]:
+    """
+    Build a single-file historical readings store (meter number -> readings by date).
+
+    Entries have the shape HistoricalReadingsManager writes. With edge_cases,
+    about one date in a hundred appears twice (the later entry wins when the
+    store is loaded) and one entry in twenty has no consumption.
+    """
+    rng = random.Random(seed)
+    first_day = LAST_DATE - timedelta(days=(readings_per_meter - 1) * interval_days)
+    data = {}
+    for m in range(meters):
+        reading = 100.0
+        readings = []
+        for i in range(readings_per_meter):
+            day = first_day + timedelta(days=i * interval_days)
+            consumption = round(rng.uniform(0, 2) * interval_days, 1)
+            reading = round(reading + consumption, 1)
+            entry = {
+                'date': f"{day.isoformat()}T00:00:00",
+                'reading': reading,
+                'consumption': consumption,
+                'reading_type': 'Manual Entry',
+                'manual': True
+            }
+            roll = rng.random() if edge_cases else 1.0
+            if roll < 0.05:
+                entry['consumption'] = None
+            readings.append(entry)
+            if roll < 0.01:
+                readings.append(dict(entry, reading=round(reading + 0.1, 1), reading_type='Korrektur'))
+        data[str(FIRST_METER + m)] = readings
+    return data
+
+
+def write_historical_store(path: str, meters: int, readings_per_meter: int, seed: int = 0,
+                           edge_cases: bool = True, interval_days: int = 1) -> int:
+    """Write historical_store() to path as JSON. Returns the number of entries written."""
+    data = historical_store(meters, readings_per_meter, seed, edge_cases, interval_days)
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return sum(len(readings) for readings in data.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic portal pages and historical stores')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--no-edge-cases', dest='edge_cases', action='store_false',
+                        help='Only regular rows: no missing dates, thousands separators or duplicates')
+    subparsers = parser.add_subparsers(dest='kind', required=True)
+
+    page = subparsers.add_parser('page', help='Portal readings page (HTML)')
+    page.add_argument('--meters', type=int, default=3, help='Meters on the page')
+    page.add_argument('--rows', type=int, default=10, help='Readings per meter')
+    page.add_argument('--padding', type=int, default=0, help='Bytes of page content outside the table')
+    page.add_argument('--interval-days', type=int, default=365, help='Days between readings')
+    page.add_argument('--output', '-o', default='Ablesungen.html', help='File to write')
+
+    store = subparsers.add_parser('store', help='Historical readings store (JSON)')
+    store.add_argument('--meters', type=int, default=2, help='Meters in the store')
+    store.add_argument('--readings', type=int, default=50000, help='Readings per meter')
+    store.add_argument('--interval-days', type=int, default=1, help='Days between readings')
+    store.add_argument('--output', '-o', default='historical_readings.json', help='File to write')
+    args = parser.parse_args()
+
+    if args.kind == 'page':
+        body = readings_page(args.meters, args.rows, args.padding, args.seed, args.edge_cases, args.interval_days)
+        with open(args.output, 'wb') as f:
+            f.write(body)
+        print(f"Wrote readings page for {args.meters} meter(s) x {args.rows} row(s) "
+              f"to {args.output} ({len(body) // 1024} KiB)")
+    else:
+        entries = write_historical_store(args.output, args.meters, args.readings, args.seed,
+                                         args.edge_cases, args.interval_days)
+        print(f"Wrote {entries} historical reading(s) for {args.meters} meter(s) "
+              f"to {args.output} ({os.path.getsize(args.output) // 1024} KiB)")
+
+
+if __name__ == '__main__':
+    main()
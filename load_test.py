@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Load test for the WAZ Nieplitz Water Meter Add-on web interface
+Shows /status and /historical/list latency under concurrency while slow /fetch calls are running
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import run
+
+
+def free_port() -> int:
+    """Find a free TCP port on localhost."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(port: int, method: str, path: str, timeout: float) -> tuple:
+    """Send one request on a new connection and return (status, seconds)."""
+    start = time.perf_counter()
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        conn.request(method, path)
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status, time.perf_counter() - start
+    except (OSError, http.client.HTTPException):
+        return 'error', time.perf_counter() - start
+
+
+def percentile(values: list, pct: float) -> float:
+    """Return the pct-th percentile of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_phase(port: int, clients: int, fetchers: int, duration: float, timeout: float) -> dict:
+    """Hammer read endpoints with `clients` threads while `fetchers` threads POST /fetch."""
+    results = {'read': [], 'fetch': []}
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def reader(i):
+        path = '/status' if i % 2 == 0 else '/historical/list'
+        while time.monotonic() < stop:
+            outcome = request(port, 'GET', path, timeout)
+            with lock:
+                results['read'].append(outcome)
+
+    def fetcher():
+        while time.monotonic() < stop:
+            outcome = request(port, 'POST', '/fetch', timeout)
+            with lock:
+                results['fetch'].append(outcome)
+            if outcome[0] == 409:
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(clients)]
+    threads += [threading.Thread(target=fetcher) for _ in range(fetchers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(label: str, outcomes: list):
+    """Print status counts and latency percentiles."""
+    statuses = Counter(status for status, _ in outcomes)
+    latencies = [seconds for status, seconds in outcomes if status == 200]
+    counts = ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str))
+    print(f"  {label:<14} {len(outcomes):>6} req  "
+          f"p50 {percentile(latencies, 50) * 1000:>7.1f}ms  "
+          f"p95 {percentile(latencies, 95) * 1000:>7.1f}ms  "
+          f"p99 {percentile(latencies, 99) * 1000:>7.1f}ms  ({counts})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the add-on web interface')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent read clients')
+    parser.add_argument('--fetchers', type=int, default=4, help='Concurrent /fetch clients')
+    parser.add_argument('--fetch-seconds', type=float, default=2.0, help='Simulated duration of one fetch')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per phase')
+    parser.add_argument('--workers', type=int, default=run.DEFAULT_WEB_WORKERS)
+    parser.add_argument('--queue-size', type=int, default=run.DEFAULT_WEB_QUEUE_SIZE)
+    parser.add_argument('--flood', type=int, default=64, help='Concurrent clients for the saturation phase')
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger('run').setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run.INGRESS_PORT = free_port()
+        run.INDEX_HTML_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
+        run.app_state['config'] = {
+            'main_meter_number': '15093668',
+            'web_workers': args.workers,
+            'web_queue_size': args.queue_size,
+            'web_request_timeout': 10
+        }
+        run.app_state['historical_manager'] = run.HistoricalReadingsManager(
+            filepath=os.path.join(tmp, 'historical_readings.json'))
+
+        def slow_fetch(trigger='web'):
+            time.sleep(args.fetch_seconds)
+            return True
+
+        run.app_state['fetch_callback'] = slow_fetch
+        threading.Thread(target=run.run_web_server, daemon=True).start()
+        run.app_state['web_ready'].wait(10)
+        port = run.INGRESS_PORT
+
+        print("=" * 80)
+        print(f"LOAD TEST ({args.workers} workers, queue of {args.queue_size}, "
+              f"fetch takes {args.fetch_seconds:.1f}s)")
+        print("=" * 80)
+
+        print(f"\n1. {args.clients} read clients, no fetches:")
+        results = run_phase(port, args.clients, 0, args.duration, 15)
+        report('reads', results['read'])
+
+        print(f"\n2. {args.clients} read clients while {args.fetchers} clients POST /fetch:")
+        results = run_phase(port, args.clients, args.fetchers, args.duration, 15)
+        report('reads', results['read'])
+        report('/fetch', results['fetch'])
+
+        print(f"\n3. Saturation: {args.flood} read clients:")
+        results = run_phase(port, args.flood, 0, args.duration, 15)
+        report('reads', results['read'])
+
+        server = run.app_state['web_server']
+        print(f"\nConnections rejected with 503: {server.rejected}")
+        print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,19 +4,38 @@ WAZ Nieplitz Water Meter Add-on
 Fetches water meter readings from kundenportal.waz-nieplitz.de
 """
 
+import argparse
+import atexit
+import bisect
+import copy
+import csv
+import gzip
+import hashlib
+import heapq
+import html.parser
+import io
+import itertools
 import json
 import logging
 import os
+import queue
+import re
+import signal
+import socket
 import sys
 import threading
 import time
-from datetime import datetime
-from typing import Dict, List, Optional
-
-import requests
-from bs4 import BeautifulSoup
-from dateutil import parser as date_parser
-from flask import Flask, jsonify, send_file, request
+import urllib.parse
+import zlib
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Heavy third-party libraries (requests, bs4, dateutil, flask) are imported
+# where they are first needed, so the web interface can start answering
+# before the scraping stack has been loaded.
 
 # Configure logging
 logging.basicConfig(
@@ -29,60 +48,874 @@ logger = logging.getLogger(__name__)
 BASE_URL = "https://kundenportal.waz-nieplitz.de"
 LOGIN_URL = BASE_URL  # Login form is at the root
 READINGS_URL = f"{BASE_URL}/ablesungen"
+READINGS_CHUNK_SIZE = 16384  # Bytes of the readings page fed to the parser at a time
+DEFAULT_PARSE_WORKERS = 0  # Processes parsing readings pages (0 = in the fetching thread, -1 = one per core)
 SUPERVISOR_TOKEN = os.environ.get("SUPERVISOR_TOKEN")
 HA_URL = "http://supervisor/core/api"
 MANUAL_FETCH_TRIGGER = "/data/manual_fetch"
 CHECK_INTERVAL = 60  # Check for manual trigger every 60 seconds
+DEFAULT_FETCH_CYCLE_TIMEOUT = 300  # Seconds a whole fetch cycle may take before it is cancelled
+FETCH_RETRY_INTERVAL = 300  # Seconds before a failed scheduled fetch is retried
+MIN_FETCH_INTERVAL = 86400  # Scheduled fetches are never closer together than one day
+FETCH_SCHEDULE_FILE = "/data/fetch_schedule.json"  # What the adaptive scheduler learned
+DEFAULT_FETCH_DENSE_INTERVAL = 172800  # Polling interval while a new reading is expected
+DEFAULT_FETCH_MAX_INTERVAL = 10368000  # Longest wait between fetches outside the expected window (120 days)
+DEFAULT_FETCH_WINDOW_DAYS = 7  # Days around the expected publication date that are polled densely
+DEFAULT_PUBLICATION_DELAY_DAYS = 14  # Assumed delay until a reading is on the portal, before one was observed
+FETCH_DELAY_HISTORY = 10  # Observed publication delays kept
+DEFAULT_FETCH_JITTER = 0.1  # Largest per-account delay of a scheduled fetch, as a fraction of its interval
+INITIAL_FETCH_JITTER_MAX = 900  # Upper bound in seconds for delaying the fetch after startup
+FETCH_HISTORY_FILE = "/data/fetch_history.json"  # Records of recent fetch cycles
+DEFAULT_FETCH_HISTORY_SIZE = 200  # Fetch cycles kept in the history
+FETCH_HISTORY_SAVE_INTERVAL = 300  # Seconds between saves of a changed fetch history
+DEFAULT_LEASE_DURATION = 60  # Seconds after the leader's last heartbeat until a standby takes over
+LEASE_FILE = "leader.json"  # Current leader and its heartbeat, in the coordination path
+LEASE_LOCK_FILE = "leader.lock"  # flock()ed while the lease is read and renewed
 HISTORICAL_READINGS_FILE = "/data/historical_readings.json"
+DEFAULT_HISTORICAL_FLUSH_INTERVAL = 2  # Seconds edits may wait in memory before a group commit
+DEFAULT_HISTORICAL_FLUSH_THRESHOLD = 50  # Pending edits that trigger a group commit immediately
+HISTORICAL_FLUSH_RETRY_MAX = 300  # Upper bound for the backoff between failed group commits
+DEFAULT_HISTORICAL_MAX_RESIDENT_METERS = 16  # Meters whose readings are kept in memory at most
+DEFAULT_HISTORICAL_IDLE_TIMEOUT = 600  # Seconds without access before a meter's readings are unloaded
+HISTORICAL_PAGE_SIZE = 100  # Readings per page of /historical/list?meter=N
+HISTORICAL_PAGE_SIZE_MAX = 1000  # Largest page a client may request
+HISTORICAL_EVICTION_CHECK_INTERVAL = 60  # Seconds between checks for idle meters
 INGRESS_PORT = int(os.environ.get('INGRESS_PORT', '8099'))
-
-# Flask app
-app = Flask(__name__)
-app.logger.setLevel(logging.ERROR)  # Suppress Flask logging
+WEB_READY_TIMEOUT = 10  # Seconds to wait for the web server to bind on startup
+INDEX_HTML_FILE = "/index.html"
+GZIP_MIN_SIZE = 1024  # Only compress JSON responses of at least this many bytes
+GZIP_LEVEL = 6
+DEFAULT_WEB_WORKERS = 4  # Fixed number of threads serving web requests
+DEFAULT_WEB_QUEUE_SIZE = 16  # Accepted connections waiting for a worker before returning 503
+DEFAULT_WEB_REQUEST_TIMEOUT = 30  # Seconds for socket reads/writes and for waiting in the queue
+DEFAULT_STATE_REFRESH_INTERVAL = 604800  # Seconds after which an unchanged sensor state is pushed again (7 days)
+PUSHED_STATES_FILE = "/data/pushed_states.json"  # Digests of the last state pushed per sensor
+DEFAULT_PORTAL_REQUESTS_PER_MINUTE = 20  # Sustained portal request rate shared by the whole add-on
+DEFAULT_PORTAL_BURST = 5  # Portal requests allowed back to back (one fetch needs 4)
+PORTAL_THROTTLE_PAUSE = 60  # Seconds to pause portal requests after HTTP 429/503 without Retry-After
+PORTAL_THROTTLE_PAUSE_MAX = 300  # Longest pause honoured from a Retry-After header
+HISTORICAL_COMMAND_FILE = "/data/historical_command.json"  # Single command file, still accepted
+HISTORICAL_COMMAND_DIR = "/data/historical_commands"  # Spool directory for command files
+PORTAL_READINGS_FILE = "/data/portal_readings.json"  # Portal readings of the last successful fetch
+EXPORT_FIELDS = ['meter_number', 'date', 'reading', 'consumption', 'reading_type', 'source']
+EXPORT_CHUNK_SIZE = 16384  # Characters collected before an export chunk is sent
+OUTBOUND_QUEUE_FILE = "/data/outbound_queue.json"
+OUTBOUND_BATCH_SIZE = 20  # Queued updates replayed per batch
+OUTBOUND_RETRY_MIN = 5  # Seconds before the first retry while Home Assistant is unavailable
+OUTBOUND_RETRY_MAX = 600  # Upper bound for the exponential retry backoff
+STATISTICS_CHUNK_SIZE = 500  # Statistics sent per recorder/import_statistics command
+EVENT_HEARTBEAT = 15  # Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_LIFETIME = 300  # Seconds before an event stream is closed and the browser reconnects
+EVENT_RETRY_MS = 2000  # Reconnect delay advertised to EventSource clients
+EVENT_REPLAY_SIZE = 100  # Recent events kept for clients reconnecting with Last-Event-ID
+
+# Flask app, created on first use by create_app()
+app = None
+
+# Routes registered via @route, added to the Flask app by create_app()
+_routes = []
+
+# Serializes fetch cycles between the main loop and the web interface
+fetch_lock = threading.Lock()
 
 # Global state for web interface
 app_state = {
     'last_fetch': None,
     'fetch_callback': None,  # Will be set to trigger manual fetch
     'historical_manager': None,  # Will be set to historical readings manager
-    'config': None  # Will be set to configuration
+    'config': None,  # Will be set to configuration
+    'meter_registry': None,  # Will be set to meter number -> sensor definition
+    'web_ready': threading.Event(),  # Set once the web server is accepting connections
+    'index_asset': None,  # Precompressed index.html, loaded by create_app()
+    'web_server': None,  # Running web server, set by run_web_server()
+    'ha_api': None,  # Home Assistant API client, set once the add-on has started
+    'next_fetch': None,  # Unix time of the next scheduled fetch
+    'last_cycle': None,  # Report of the last fetch cycle: outcome, completed phases and meters
+    'fetch_history': None,  # Records of recent fetch cycles
+    'aggregates': None,  # Yearly and monthly consumption per meter
+    'lease': None,  # Leader lease when several instances share a coordination path
+    'portal_readings_file': PORTAL_READINGS_FILE  # Moved to the coordination path when one is set
 }
 
+DATE_CACHE_SIZE = 4096  # Distinct raw date strings memoized by the date parsers
+
+# Strict fast-path date shapes: German portal dates and ISO dates
+_GERMAN_DATE_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')
+_ISO_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+
+def _parse_strict_date(value: str) -> Optional[datetime]:
+    """Parse "DD.MM.YYYY" or "YYYY-MM-DD", returning None for any other shape."""
+    match = _GERMAN_DATE_RE.fullmatch(value)
+    if match:
+        day, month, year = match.groups()
+        return datetime(int(year), int(month), int(day))
+
+    match = _ISO_DATE_RE.fullmatch(value)
+    if match:
+        year, month, day = match.groups()
+        return datetime(int(year), int(month), int(day))
+
+    return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_portal_date(value: str) -> Optional[datetime]:
+    """
+    Parse a date cell from the portal (Ablesetag, Stichtag).
+
+    German and ISO dates take a strict fast path; only unknown shapes fall
+    back to dateutil (day first). Results are memoized on the raw string.
+
+    Returns:
+        The parsed datetime, or None if the value is empty or unparseable
+    """
+    value = value.strip()
+    if not value:
+        return None
+
+    try:
+        parsed = _parse_strict_date(value)
+        if parsed is not None:
+            return parsed
+
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+
+        from dateutil import parser as date_parser
+        return date_parser.parse(value, dayfirst=True)
+    except (ValueError, OverflowError) as e:
+        logger.debug(f"Could not parse date '{value}': {e}")
+        return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_manual_date(value: str) -> datetime:
+    """
+    Parse a manually entered date in format "YYYY-MM-DD" or "DD.MM.YYYY".
+
+    Raises:
+        ValueError: If the date has any other format or is not a valid date
+    """
+    parsed = _parse_strict_date(value.strip())
+    if parsed is None:
+        raise ValueError(f"Unsupported date format: '{value}' (use YYYY-MM-DD or DD.MM.YYYY)")
+    return parsed
+
+
+def parse_portal_number(value: str) -> float:
+    """
+    Parse a number cell from the portal (Stand, Verbrauch) in German format.
+
+    The comma is the decimal separator; dots next to a comma separate
+    thousands ("1.234,5" is 1234.5).
+
+    Raises:
+        ValueError: If the value is not a number
+    """
+    cleaned = value.replace(' ', '').replace('\xa0', '')
+    if ',' in cleaned:
+        cleaned = cleaned.replace('.', '').replace(',', '.')
+    return float(cleaned)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_iso_timestamp(value: str) -> datetime:
+    """
+    Parse a stored ISO date into a timezone-aware datetime (UTC if naive).
+
+    Raises:
+        ValueError: If the value is not an ISO date
+    """
+    date_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if date_obj.tzinfo is None:
+        date_obj = date_obj.replace(tzinfo=timezone.utc)
+    return date_obj
+
+
+class EventBroker:
+    """Fan-out of server-sent events to the connected /events streams."""
+
+    def __init__(self, queue_size: int = 100, replay_size: int = EVENT_REPLAY_SIZE):
+        """Initialize the broker."""
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._last_id = 0
+
+    def publish(self, event: str, data: Dict):
+        """Send an event to every subscriber, dropping its oldest event if it is not keeping up."""
+        with self._lock:
+            self._last_id += 1
+            message = (self._last_id, event, data)
+            self._recent.append(message)
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+                    subscriber.put_nowait(message)
+
+    def subscribe(self, last_event_id: Optional[int] = None,
+                  max_subscribers: Optional[int] = None) -> Optional[queue.Queue]:
+        """
+        Register a new subscriber, replaying the recent events after last_event_id.
+
+        Args:
+            last_event_id: ID of the last event the subscriber has seen, if any
+            max_subscribers: Refuse the subscriber when this many are connected
+
+        Returns:
+            The subscriber's queue, or None if max_subscribers are already connected
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if max_subscribers is not None and len(self._subscribers) >= max_subscribers:
+                return None
+            if last_event_id is not None:
+                for message in self._recent:
+                    if message[0] > last_event_id:
+                        subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        """Remove a subscriber."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers."""
+        with self._lock:
+            return len(self._subscribers)
+
+
+# Events pushed to the web interface via /events
+events = EventBroker()
+
 
 class HistoricalReadingsManager:
-    """Manager for manual historical water meter readings."""
+    """
+    Manager for manual historical water meter readings.
+
+    Readings are stored as one JSON file per meter in storage_dir, plus a
+    manifest with the count and date range of every meter. Only the manifest
+    is read at startup; a meter's readings are loaded on first access and
+    evicted again after idle_timeout seconds without access, or when more
+    than max_resident_meters are loaded. A legacy single-file store at
+    filepath is merged into the shards on startup and renamed to *.migrated.
+
+    Readers take the current snapshot without locking: a dict mapping each
+    loaded meter to a date-sorted tuple of reading dicts. Published snapshots
+    are never modified; writers serialize on a single lock, build new tuples
+    and swap in a new snapshot dict, so a reader keeps a consistent view even
+    while a write or save is in progress.
+
+    With a flush_interval of 0 every edit is persisted before it returns.
+    Otherwise edits are acknowledged in memory and a background flusher
+    writes them as one group commit once flush_interval seconds have passed
+    since the first pending edit, or as soon as flush_threshold edits are
+    pending. Only the shards of edited meters and the manifest are rewritten.
+    Call flush() to persist immediately and close() on shutdown.
+    """
 
-    def __init__(self, filepath: str = HISTORICAL_READINGS_FILE):
-        """Initialize the manager."""
+    def __init__(self, filepath: str = HISTORICAL_READINGS_FILE, flush_interval: float = 0,
+                 flush_threshold: int = DEFAULT_HISTORICAL_FLUSH_THRESHOLD,
+                 storage_dir: Optional[str] = None,
+                 max_resident_meters: int = DEFAULT_HISTORICAL_MAX_RESIDENT_METERS,
+                 idle_timeout: float = DEFAULT_HISTORICAL_IDLE_TIMEOUT, migrate_legacy: bool = True,
+                 read_only: bool = False):
+        """Initialize the manager; a read_only manager writes nothing until set_read_only(False)."""
         self.filepath = filepath
-        self.readings = self._load_readings()
+        self.storage_dir = storage_dir or os.path.splitext(filepath)[0]
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_resident_meters = max_resident_meters
+        self.idle_timeout = idle_timeout
+        self.read_only = read_only
+        self._migrate_legacy = migrate_legacy
+        self._write_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._flush_needed = threading.Condition(self._write_lock)
+        self._pending_edits = 0
+        self._dirty_since = 0.0
+        # Group commits failed in a row; the flusher backs off while this is non-zero
+        self._flush_failures = 0
+        self._flusher = None
+        self._closing = False
+        # Edited meters not yet written, mapped to the edit version that made them dirty
+        self._dirty: Dict[str, int] = {}
+        self._version = 0
+        self._last_access: Dict[str, float] = {}
+        self._next_eviction = 0.0
+        self._snapshot: Dict[str, Tuple[Dict, ...]] = {}
+        self._manifest: Dict[str, Dict] = self._load_manifest()
+        self._manifest_mtime = self._stat_manifest()
+        # Edits acknowledged and durable writes done; writes / edits is the write amplification
+        self.stats = {'edits': 0, 'writes': 0, 'loads': 0, 'evictions': 0}
+        # Called as on_change(action, meter_number, entry) after each add, update or delete
+        self.on_change: Optional[Callable[[str, str, Dict], None]] = None
+        self._add_missing_totals(save=migrate_legacy and not read_only)
+        if migrate_legacy and not read_only:
+            self._migrate_legacy_file()
+
+    @property
+    def readings(self) -> Dict[str, Tuple[Dict, ...]]:
+        """All readings of all meters (loads every meter). Treat as read-only."""
+        return self.get_all_readings()
+
+    def _notify(self, action: str, meter_number: str, entry: Dict):
+        """Report a change to the on_change callback, if any."""
+        if self.on_change:
+            try:
+                self.on_change(action, meter_number, entry)
+            except Exception as e:
+                logger.error(f"Error in historical change callback: {e}")
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.storage_dir, 'manifest.json')
+
+    def _shard_path(self, meter_number: str) -> str:
+        """Path of the shard file holding the readings of one meter."""
+        return os.path.join(self.storage_dir, f"{urllib.parse.quote(meter_number, safe='')}.json")
+
+    @staticmethod
+    def _summarize(readings: Tuple[Dict, ...]) -> Dict:
+        """Manifest entry for a meter's readings: count, date range and consumption totals."""
+        totals = new_totals()
+        for index, reading in enumerate(readings):
+            add_to_totals(totals, reading['date'], reading_consumption(readings, index), 1)
+        return {
+            'count': len(readings),
+            'first_date': readings[0]['date'],
+            'last_date': readings[-1]['date'],
+            'totals': totals
+        }
 
-    def _load_readings(self) -> Dict[str, List[Dict]]:
-        """Load historical readings from file."""
+    def _summarize_change(self, meter_number: str, old: Tuple[Dict, ...], new: Tuple[Dict, ...],
+                          date: str) -> Optional[Dict]:
+        """Manifest entry for readings that changed only at date, updating the totals incrementally."""
+        entry = self._manifest.get(meter_number)
+        if not new or entry is None or 'totals' not in entry:
+            return self._summarize(new) if new else None
+        totals = copy.deepcopy(entry['totals'])
+        update_totals(totals, old, new, date)
+        return {
+            'count': len(new),
+            'first_date': new[0]['date'],
+            'last_date': new[-1]['date'],
+            'totals': totals
+        }
+
+    def _stat_manifest(self) -> Optional[float]:
+        """Modification time of the manifest, None if there is none."""
         try:
-            if os.path.exists(self.filepath):
-                with open(self.filepath, 'r') as f:
-                    data = json.load(f)
-                    logger.info(f"Loaded {sum(len(r) for r in data.values())} historical reading(s)")
-                    return data
-            else:
-                logger.info("No historical readings file found, starting fresh")
-                return {}
+            return os.path.getmtime(self._manifest_path)
+        except OSError:
+            return None
+
+    def _load_manifest(self) -> Dict[str, Dict]:
+        """Load the manifest of stored meters."""
+        try:
+            if os.path.exists(self._manifest_path):
+                with open(self._manifest_path, 'r') as f:
+                    manifest = json.load(f).get('meters', {})
+                    logger.info(f"Found {sum(m['count'] for m in manifest.values())} historical reading(s) "
+                                f"for {len(manifest)} meter(s)")
+                    return manifest
+            logger.info("No historical readings found, starting fresh")
+            return {}
         except Exception as e:
-            logger.error(f"Error loading historical readings: {e}")
+            logger.error(f"Error loading historical readings manifest: {e}")
             return {}
 
-    def _save_readings(self):
-        """Save historical readings to file."""
+    def _add_missing_totals(self, save: bool = True):
+        """Add consumption totals to manifest entries written without them (reads those shards once)."""
+        missing = [meter_number for meter_number, entry in self._manifest.items() if 'totals' not in entry]
+        if not missing:
+            return
+
+        manifest = dict(self._manifest)
+        for meter_number in missing:
+            readings = self._read_shard(meter_number)
+            if readings:
+                manifest[meter_number] = self._summarize(readings)
+        self._manifest = manifest
+        if not save:
+            return
+
+        try:
+            with self._io_lock:
+                self._write_json(self._manifest_path, {'version': 1, 'meters': manifest})
+                self._manifest_mtime = self._stat_manifest()
+            logger.info(f"Added consumption totals of {len(missing)} meter(s) to the historical readings manifest")
+        except OSError as e:
+            logger.error(f"Error saving historical readings manifest: {e}")
+
+    def _read_shard(self, meter_number: str) -> Tuple[Dict, ...]:
+        """Read one meter's readings from its shard file."""
+        try:
+            with open(self._shard_path(meter_number), 'r') as f:
+                readings = tuple(sorted(json.load(f), key=lambda x: x["date"]))
+            self.stats['loads'] += 1
+            logger.debug(f"Loaded {len(readings)} historical reading(s) for meter {meter_number}")
+            return readings
+        except FileNotFoundError:
+            return ()
+        except Exception as e:
+            logger.error(f"Error loading historical readings for meter {meter_number}: {e}")
+            return ()
+
+    def _migrate_legacy_file(self):
+        """Merge a single-file store into the per-meter shards and rename it."""
+        if not os.path.exists(self.filepath):
+            return
+
         try:
-            # Ensure /data directory exists
-            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            with open(self.filepath, 'r') as f:
+                data = json.load(f) if os.path.getsize(self.filepath) else {}
+        except Exception as e:
+            logger.error(f"Error loading historical readings from {self.filepath}, not migrating: {e}")
+            return
+
+        with self._write_lock:
+            for meter_number, readings in data.items():
+                merged = {r["date"]: r for r in self._current(meter_number)}
+                merged.update((r["date"], r) for r in readings)
+                self._publish(meter_number, tuple(sorted(merged.values(), key=lambda x: x["date"])))
+
+        if not data:
+            return
 
-            with open(self.filepath, 'w') as f:
-                json.dump(self.readings, f, indent=2)
-            logger.info("Historical readings saved successfully")
+        if self.flush():
+            os.replace(self.filepath, f"{self.filepath}.migrated")
+            logger.info(f"Migrated {sum(len(r) for r in data.values())} historical reading(s) "
+                        f"from {self.filepath} to {self.storage_dir}")
+
+    def _save_shards(self, snapshot: Dict[str, Tuple[Dict, ...]], manifest: Dict[str, Dict],
+                     meter_numbers) -> bool:
+        """Write the shards of the given meters and the manifest."""
+        try:
+            os.makedirs(self.storage_dir, exist_ok=True)
+
+            for meter_number in meter_numbers:
+                path = self._shard_path(meter_number)
+                readings = snapshot.get(meter_number)
+                if readings:
+                    self._write_json(path, readings)
+                elif os.path.exists(path):
+                    os.remove(path)
+
+            self._write_json(self._manifest_path, {'version': 1, 'meters': manifest})
+            self._manifest_mtime = self._stat_manifest()
+            logger.info(f"Historical readings saved successfully ({len(meter_numbers)} meter(s))")
+            return True
         except Exception as e:
             logger.error(f"Error saving historical readings: {e}")
+            return False
+
+    @staticmethod
+    def _write_json(path: str, data):
+        """Write JSON to a temporary file and rename it, so the file is never half-written."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _current(self, meter_number: str) -> Tuple[Dict, ...]:
+        """Readings of a meter, loading its shard if needed. Caller holds the write lock."""
+        readings = self._snapshot.get(meter_number)
+        if readings is None:
+            readings = self._read_shard(meter_number) if meter_number in self._manifest else ()
+        return readings
+
+    def _publish(self, meter_number: str, readings: Tuple[Dict, ...],
+                 summary: Optional[Dict] = None) -> Dict[str, Tuple[Dict, ...]]:
+        """
+        Swap in a new snapshot with the readings of one meter replaced. Caller holds the write lock.
+
+        summary is the meter's new manifest entry if the caller already has it.
+        """
+        snapshot = dict(self._snapshot)
+        manifest = dict(self._manifest)
+        if readings:
+            snapshot[meter_number] = readings
+            manifest[meter_number] = summary or self._summarize(readings)
+        else:
+            snapshot.pop(meter_number, None)
+            manifest.pop(meter_number, None)
+        self._snapshot = snapshot
+        self._manifest = manifest
+        self._last_access[meter_number] = time.monotonic()
+        self._version += 1
+        self._dirty[meter_number] = self._version
+        self._record_edit()
+        return snapshot
+
+    def _record_edit(self):
+        """Count a published edit and wake the flusher. Caller holds the write lock."""
+        self.stats['edits'] += 1
+        self._pending_edits += 1
+        if self._pending_edits == 1:
+            self._dirty_since = time.monotonic()
+        self._flush_needed.notify()
+
+    def _persist_edit(self):
+        """Make an edit durable now, or leave it to the flusher in write-behind mode."""
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+
+        if self._flusher is None:
+            with self._write_lock:
+                if self._flusher is None and not self._closing:
+                    self._flusher = threading.Thread(target=self._flush_loop,
+                                                     name='historical-flusher', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        """Background flusher: group-commit pending edits per flush window or threshold."""
+        while True:
+            with self._write_lock:
+                while self._pending_edits == 0 and not self._closing:
+                    self._flush_needed.wait()
+                if self._closing:
+                    return
+
+                # Let more edits join this commit until the window ends or the threshold is hit
+                deadline = self._dirty_since + self.flush_interval
+                while self._pending_edits < self.flush_threshold and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._flush_needed.wait(remaining)
+
+            self.flush()
+
+            with self._write_lock:
+                if self._flush_failures and not self._closing:
+                    # Do not retry a failed write at once, even with the threshold reached
+                    retry_at = time.monotonic() + min(
+                        self.flush_interval * 2 ** (self._flush_failures - 1), HISTORICAL_FLUSH_RETRY_MAX)
+                    while not self._closing:
+                        remaining = retry_at - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._flush_needed.wait(remaining)
+
+    def flush(self) -> bool:
+        """
+        Write pending edits to disk now.
+
+        Returns:
+            True if a write happened, False if nothing was pending or the write failed
+        """
+        with self._io_lock:
+            with self._write_lock:
+                if not self._dirty:
+                    return False
+                snapshot = self._snapshot
+                manifest = self._manifest
+                dirty = dict(self._dirty)
+                edits = self._pending_edits
+                self._pending_edits = 0
+
+            saved = self._save_shards(snapshot, manifest, list(dirty))
+
+            with self._write_lock:
+                if saved:
+                    # Meters edited again during the write stay dirty
+                    for meter_number, version in dirty.items():
+                        if self._dirty.get(meter_number) == version:
+                            del self._dirty[meter_number]
+                    self.stats['writes'] += 1
+                    self._flush_failures = 0
+                else:
+                    # Keep the edits pending and retry after another flush window
+                    self._pending_edits += edits
+                    self._dirty_since = time.monotonic()
+                    self._flush_failures += 1
+
+            if saved and edits > 1:
+                logger.info(f"Group commit of {edits} historical edit(s)")
+            return saved
+
+    def close(self):
+        """Stop the background flusher and persist any pending edits."""
+        with self._write_lock:
+            self._closing = True
+            self._flush_needed.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def set_read_only(self, read_only: bool):
+        """
+        Switch between owning the store (active instance) and following it (standby).
+
+        Going read-only stops the background flusher and drops edits it has
+        not written yet: another instance owns the store now, and writing them
+        would overwrite its changes. Going writable migrates a legacy store
+        if migrate_legacy was set.
+        """
+        if not read_only:
+            self.read_only = False
+            if self._migrate_legacy:
+                self._migrate_legacy_file()
+            return
+
+        with self._write_lock:
+            self.read_only = True
+            self._closing = True
+            self._flush_needed.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+
+        with self._io_lock:
+            with self._write_lock:
+                dropped = self._pending_edits
+                self._dirty.clear()
+                self._pending_edits = 0
+                self._snapshot = {}
+                self._last_access.clear()
+                # Make the next reload() read the manifest written by the new owner
+                self._manifest_mtime = None
+                self._flusher = None
+                self._closing = False
+        if dropped:
+            logger.warning(f"Dropped {dropped} unsaved historical edit(s), this instance no longer owns the store")
+
+    def reload(self) -> bool:
+        """
+        Follow writes by another instance: if the manifest changed on disk,
+        re-read it and unload all meters so they are read again when accessed.
+
+        Returns:
+            True if reloaded, False if unchanged or edits of this instance are pending
+        """
+        mtime = self._stat_manifest()
+        if mtime == self._manifest_mtime:
+            return False
+
+        manifest = self._load_manifest()
+        with self._write_lock:
+            if self._dirty:
+                return False
+            self._manifest = manifest
+            self._snapshot = {}
+            self._last_access.clear()
+            self._manifest_mtime = mtime
+        return True
+
+    def _scan_storage(self) -> Tuple[Dict[str, str], List[str]]:
+        """Shard files in storage_dir by meter number, and leftover temporary files."""
+        shards = {}
+        leftovers = []
+        try:
+            for entry in os.scandir(self.storage_dir):
+                if entry.name.endswith('.tmp'):
+                    leftovers.append(entry.path)
+                elif entry.name.endswith('.json') and entry.path != self._manifest_path:
+                    shards[urllib.parse.unquote(entry.name[:-len('.json')])] = entry.path
+        except FileNotFoundError:
+            pass
+        return shards, leftovers
+
+    def verify(self) -> List[str]:
+        """
+        Check the shards on disk against the manifest without changing anything.
+
+        Every shard must be a list of readings with an ISO date and a numeric
+        reading, sorted by date without duplicates, and match its manifest entry.
+
+        Returns:
+            One message per problem found; empty if the store is consistent
+        """
+        problems = []
+        shards, leftovers = self._scan_storage()
+        problems.extend(f"Leftover temporary file {path}" for path in leftovers)
+
+        for meter_number in sorted(set(self._manifest) | set(shards)):
+            if meter_number not in shards:
+                problems.append(f"Meter {meter_number}: in the manifest, but its shard is missing")
+                continue
+            try:
+                with open(shards[meter_number], 'r') as f:
+                    readings = json.load(f)
+                if not isinstance(readings, list) or not all(isinstance(r, dict) for r in readings):
+                    raise ValueError("not a list of readings")
+            except Exception as e:
+                problems.append(f"Meter {meter_number}: unreadable shard {shards[meter_number]}: {e}")
+                continue
+
+            invalid = 0
+            for reading in readings:
+                try:
+                    datetime.fromisoformat(reading['date'])
+                    if isinstance(reading['reading'], bool) or not isinstance(reading['reading'], (int, float)):
+                        raise TypeError
+                except (KeyError, TypeError, ValueError):
+                    invalid += 1
+            if invalid:
+                problems.append(f"Meter {meter_number}: {invalid} reading(s) without a valid date or reading")
+                continue
+
+            dates = [r['date'] for r in readings]
+            if dates != sorted(dates):
+                problems.append(f"Meter {meter_number}: readings are not sorted by date")
+            if len(set(dates)) != len(dates):
+                problems.append(f"Meter {meter_number}: {len(dates) - len(set(dates))} duplicated date(s)")
+            if meter_number not in self._manifest:
+                problems.append(f"Meter {meter_number}: shard is not in the manifest")
+            elif readings and self._manifest[meter_number] != self._summarize(sorted(readings, key=lambda x: x['date'])):
+                problems.append(f"Meter {meter_number}: manifest {self._manifest[meter_number]} does not match "
+                                f"the shard ({len(readings)} reading(s))")
+        return problems
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrite the store from the shards on disk with one group commit.
+
+        Readings are sorted and de-duplicated by date (the last entry for a
+        date wins), entries without a date are dropped, shards missing from
+        the manifest are adopted, manifest entries without a shard removed and
+        leftover temporary files deleted. Unreadable shards are left alone.
+
+        Returns:
+            Counts of 'meters', 'readings', 'dropped' entries and 'removed_files'
+        """
+        self.flush()
+        shards, leftovers = self._scan_storage()
+        result = {'meters': 0, 'readings': 0, 'dropped': 0, 'removed_files': 0}
+
+        # Before rewriting, which uses the same temporary file names
+        for path in leftovers:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Could not remove {path}: {e}")
+                continue
+            result['removed_files'] += 1
+
+        with self._write_lock:
+            for meter_number in set(self._manifest) - set(shards):
+                self._publish(meter_number, ())
+            for meter_number, path in shards.items():
+                try:
+                    with open(path, 'r') as f:
+                        entries = json.load(f)
+                    merged = {r['date']: r for r in entries if isinstance(r, dict) and isinstance(r.get('date'), str)}
+                except Exception as e:
+                    logger.error(f"Not compacting unreadable shard {path}: {e}")
+                    continue
+                self._publish(meter_number, tuple(sorted(merged.values(), key=lambda x: x['date'])))
+                result['meters'] += 1
+                result['readings'] += len(merged)
+                result['dropped'] += len(entries) - len(merged)
+
+        self.flush()
+        return result
+
+    @property
+    def pending_edits(self) -> int:
+        """Number of acknowledged edits not yet written to disk."""
+        return self._pending_edits
+
+    @property
+    def resident_meters(self) -> int:
+        """Number of meters whose readings are currently loaded."""
+        return len(self._snapshot)
+
+    def evict_idle(self):
+        """Unload meters that have not been accessed recently or exceed max_resident_meters."""
+        now = time.monotonic()
+        with self._write_lock:
+            # Meters with unsaved edits must stay loaded
+            candidates = sorted(
+                (m for m in self._snapshot if m not in self._dirty),
+                key=lambda m: self._last_access.get(m, 0)
+            )
+            excess = len(self._snapshot) - self.max_resident_meters
+            evict = [
+                m for i, m in enumerate(candidates)
+                if i < excess or now - self._last_access.get(m, 0) > self.idle_timeout
+            ]
+            if not evict:
+                return
+
+            snapshot = dict(self._snapshot)
+            for meter_number in evict:
+                del snapshot[meter_number]
+                self._last_access.pop(meter_number, None)
+            self._snapshot = snapshot
+            self.stats['evictions'] += len(evict)
+        logger.debug(f"Evicted historical readings of {len(evict)} meter(s) from memory")
+
+    def _apply_add(self, meter_number: str, date: str, reading: float,
+                   consumption: Optional[float], reading_type: str) -> Tuple[str, Dict]:
+        """Publish an added or updated reading without persisting it. Returns (action, entry)."""
+        if self.read_only:
+            raise ValueError("Historical readings are read-only on a standby instance")
+
+        # Parse date (ISO or German format)
+        parsed_date = parse_manual_date(date)
+
+        # Create reading entry
+        entry = {
+            "date": parsed_date.isoformat(),
+            "reading": float(reading),
+            "consumption": float(consumption) if consumption is not None else None,
+            "reading_type": reading_type,
+            "manual": True
+        }
+
+        with self._write_lock:
+            current = self._current(meter_number)
+
+            # Replace an existing reading for this date, keep readings sorted by date
+            others = [r for r in current if r["date"] != entry["date"]]
+            updated = len(others) != len(current)
+            others.append(entry)
+            readings = tuple(sorted(others, key=lambda x: x["date"]))
+            self._publish(meter_number, readings,
+                          self._summarize_change(meter_number, current, readings, entry["date"]))
+
+        if updated:
+            logger.info(f"Updated historical reading for meter {meter_number} on {date}")
+        else:
+            logger.info(f"Added historical reading for meter {meter_number} on {date}: {reading} m³")
+        return ('update' if updated else 'add'), entry
+
+    def _apply_delete(self, meter_number: str, date: str) -> Tuple[str, Dict]:
+        """Publish a deletion without persisting it. Returns (action, entry)."""
+        if self.read_only:
+            raise ValueError("Historical readings are read-only on a standby instance")
+        if meter_number not in self._manifest:
+            raise ValueError(f"No historical readings for meter {meter_number}")
+
+        # Parse date (ISO or German format)
+        parsed_date = parse_manual_date(date)
+
+        iso_date = parsed_date.isoformat()
+
+        with self._write_lock:
+            # Find and remove reading; the meter entry is dropped if no readings are left
+            current = self._current(meter_number)
+            remaining = tuple(r for r in current if r["date"] != iso_date)
+            self._publish(meter_number, remaining,
+                          self._summarize_change(meter_number, current, remaining, iso_date))
+
+        logger.info(f"Deleted historical reading for meter {meter_number} on {date}")
+        return 'delete', {'date': iso_date}
 
     def add_reading(self, meter_number: str, date: str, reading: float,
                    consumption: Optional[float] = None, reading_type: str = "Manual Entry") -> bool:
@@ -100,320 +933,1240 @@ class HistoricalReadingsManager:
             True if successful, False otherwise
         """
         try:
-            # Parse date
+            action, entry = self._apply_add(meter_number, date, reading, consumption, reading_type)
+        except Exception as e:
+            logger.error(f"Error adding historical reading: {e}")
+            return False
+
+        # Save to file (now, or with the next group commit)
+        self._persist_edit()
+        self._notify(action, meter_number, entry)
+        return True
+
+    def apply_batch(self, commands: List[Dict]) -> List[Optional[str]]:
+        """
+        Apply many add/delete commands and persist them with a single write.
+
+        Args:
+            commands: Dicts with 'action' ('add' or 'delete'), 'meter_number', 'date'
+                and for adds 'reading' and optionally 'consumption' and 'reading_type'
+
+        Returns:
+            One entry per command: None if it was applied, otherwise the error message
+        """
+        results = []
+        changes = []
+        for command in commands:
             try:
-                # Try ISO format first
-                parsed_date = datetime.strptime(date, "%Y-%m-%d")
-            except ValueError:
-                # Try German format
-                parsed_date = datetime.strptime(date, "%d.%m.%Y")
+                action = command.get('action')
+                meter_number = command.get('meter_number')
+                date = command.get('date')
+
+                if action == 'add':
+                    if not meter_number or not date or command.get('reading') is None:
+                        raise ValueError("Missing required fields for add command")
+                    change = self._apply_add(meter_number, date, command['reading'], command.get('consumption'),
+                                             command.get('reading_type', 'Manual Entry'))
+                elif action == 'delete':
+                    if not meter_number or not date:
+                        raise ValueError("Missing required fields for delete command")
+                    change = self._apply_delete(meter_number, date)
+                else:
+                    raise ValueError(f"Unknown action: {action!r}")
+
+                changes.append((change[0], meter_number, change[1]))
+                results.append(None)
+            except Exception as e:
+                results.append(str(e))
+
+        if changes:
+            self.flush()
+            for action, meter_number, entry in changes:
+                self._notify(action, meter_number, entry)
+        return results
+
+    def get_readings(self, meter_number: str) -> Tuple[Dict, ...]:
+        """Get all historical readings for a meter (immutable snapshot), loading them if needed."""
+        now = time.monotonic()
+        if now >= self._next_eviction:
+            self._next_eviction = now + HISTORICAL_EVICTION_CHECK_INTERVAL
+            self.evict_idle()
+
+        readings = self._snapshot.get(meter_number)
+        if readings is None:
+            if meter_number not in self._manifest:
+                return ()
+            with self._write_lock:
+                readings = self._snapshot.get(meter_number)
+                if readings is None:
+                    readings = self._read_shard(meter_number)
+                    snapshot = dict(self._snapshot)
+                    snapshot[meter_number] = readings
+                    self._snapshot = snapshot
+
+        self._last_access[meter_number] = now
+        return readings
+
+    def get_all_readings(self) -> Dict[str, Tuple[Dict, ...]]:
+        """Get all historical readings for all meters (loads every meter). Treat as read-only."""
+        return {meter_number: self.get_readings(meter_number) for meter_number in list(self._manifest)}
+
+    def get_summary(self) -> Dict[str, Dict]:
+        """Count and date range of every stored meter, without loading readings."""
+        return self._manifest
 
-            # Initialize meter if not exists
-            if meter_number not in self.readings:
-                self.readings[meter_number] = []
+    def delete_reading(self, meter_number: str, date: str) -> bool:
+        """Delete a specific historical reading."""
+        try:
+            if meter_number not in self._manifest:
+                return False
+            action, entry = self._apply_delete(meter_number, date)
+        except Exception as e:
+            logger.error(f"Error deleting historical reading: {e}")
+            return False
 
-            # Create reading entry
-            entry = {
-                "date": parsed_date.isoformat(),
-                "reading": float(reading),
-                "consumption": float(consumption) if consumption is not None else None,
-                "reading_type": reading_type,
-                "manual": True
-            }
+        self._persist_edit()
+        self._notify(action, meter_number, entry)
+        return True
+
+
+def reading_consumption(readings, index: int) -> Optional[float]:
+    """
+    Consumption of readings[index] in a date-sorted sequence: as recorded, or
+    if none was recorded, the increase over the previous reading's meter value.
+    """
+    consumption = readings[index].get('consumption')
+    if consumption is not None:
+        return consumption
+    if index == 0:
+        return None
+    previous, current = readings[index - 1].get('reading'), readings[index].get('reading')
+    if previous is None or current is None or current < previous:
+        return None
+    return round(current - previous, 3)
+
+
+def new_totals() -> Dict:
+    """Empty consumption totals of a meter."""
+    return {'consumption': 0.0, 'readings': 0, 'years': {}}
+
+
+def add_to_totals(totals: Dict, date: str, consumption: Optional[float], sign: int):
+    """
+    Add (sign 1) or remove (sign -1) one reading from a meter's totals and
+    its year and month buckets. Buckets left without readings are dropped.
+    """
+    year, month = date[:4], date[5:7]
+    year_bucket = totals['years'].setdefault(year, {'consumption': 0.0, 'readings': 0, 'months': {}})
+    month_bucket = year_bucket['months'].setdefault(month, {'consumption': 0.0, 'readings': 0})
+    for bucket in (totals, year_bucket, month_bucket):
+        bucket['readings'] += sign
+        bucket['consumption'] = round(bucket['consumption'] + sign * (consumption or 0), 3)
+
+    if month_bucket['readings'] == 0:
+        del year_bucket['months'][month]
+    if year_bucket['readings'] == 0:
+        del totals['years'][year]
+
+
+def update_totals(totals: Dict, old, new, date: str):
+    """
+    Update a meter's totals for date-sorted readings that changed only at date.
 
-            # Check if reading already exists for this date
-            existing_idx = None
-            for idx, r in enumerate(self.readings[meter_number]):
-                if r["date"] == entry["date"]:
-                    existing_idx = idx
-                    break
-
-            if existing_idx is not None:
-                # Update existing entry
-                self.readings[meter_number][existing_idx] = entry
-                logger.info(f"Updated historical reading for meter {meter_number} on {date}")
+    Only the reading at date and the one after it are applied again, as the
+    next reading's derived consumption depends on its predecessor.
+    """
+    for readings, sign in ((old, -1), (new, 1)):
+        index = bisect.bisect_left(readings, date, key=lambda r: r['date'])
+        affected = []
+        if index < len(readings) and readings[index]['date'] == date:
+            affected.append(index)
+            index += 1
+        if index < len(readings):
+            affected.append(index)
+        for i in affected:
+            add_to_totals(totals, readings[i]['date'], reading_consumption(readings, i), sign)
+
+
+class AggregateIndex:
+    """
+    Consumption and reading counts per meter in year and month buckets.
+
+    Portal and manual readings both count, like in the export. A reading's
+    consumption is attributed to the month of its date; a reading without
+    one counts the increase over the previous reading of the same source.
+    The totals of the manual readings are kept in the historical manifest by
+    HistoricalReadingsManager, so no readings are loaded for them. The portal
+    totals are kept here: a new set of portal readings only applies the
+    readings that changed and the readings following them.
+    """
+
+    def __init__(self, historical_manager: Optional['HistoricalReadingsManager'] = None):
+        """Initialize an index without portal readings."""
+        self._lock = threading.Lock()
+        self.historical_manager = historical_manager
+        # meter_number -> portal readings sorted by date
+        self._portal: Dict[str, List[Dict]] = {}
+        # meter_number -> totals of its portal readings (see new_totals)
+        self._meters: Dict[str, Dict] = {}
+
+    def set_portal_readings(self, meter_number: str, readings: List[Dict]):
+        """Replace a meter's portal readings, applying only added, changed and removed ones."""
+        new = {r['date']: r for r in readings if r.get('date')}
+        with self._lock:
+            current = self._portal.get(meter_number, [])
+            old = {r['date']: r for r in current}
+            changed = [date for date in old if date not in new]
+            changed += [date for date, r in new.items() if date not in old or
+                        (old[date].get('reading'), old[date].get('consumption'))
+                        != (r.get('reading'), r.get('consumption'))]
+
+            totals = self._meters.get(meter_number) or new_totals()
+            for date in sorted(changed):
+                following = sorted([r for r in current if r['date'] != date] + ([new[date]] if date in new else []),
+                                   key=lambda r: r['date'])
+                update_totals(totals, current, following, date)
+                current = following
+
+            if current:
+                self._portal[meter_number] = current
+                self._meters[meter_number] = totals
             else:
-                # Add new entry
-                self.readings[meter_number].append(entry)
-                logger.info(f"Added historical reading for meter {meter_number} on {date}: {reading} m³")
+                self._portal.pop(meter_number, None)
+                self._meters.pop(meter_number, None)
+
+    def build(self, historical_manager: Optional['HistoricalReadingsManager'],
+              portal_readings: Dict[str, List[Dict]]):
+        """Index the portal readings from scratch and take the manual totals from historical_manager."""
+        with self._lock:
+            self.historical_manager = historical_manager
+            self._portal = {}
+            self._meters = {}
+        for meter_number, readings in portal_readings.items():
+            self.set_portal_readings(meter_number, readings)
+
+    def _manual_totals(self) -> Dict[str, Dict]:
+        """Totals of the manual readings per meter, from the historical manifest."""
+        if self.historical_manager is None:
+            return {}
+        return {meter_number: entry['totals'] for meter_number, entry in self.historical_manager.get_summary().items()
+                if 'totals' in entry}
 
-            # Sort readings by date
-            self.readings[meter_number].sort(key=lambda x: x["date"])
+    @staticmethod
+    def _merge(buckets: List[Dict]) -> Dict:
+        """Sum of buckets and their sub-buckets, with consumption rounded."""
+        result = {
+            'consumption': round(sum(b['consumption'] for b in buckets), 3),
+            'readings': sum(b['readings'] for b in buckets)
+        }
+        for key in ('years', 'months'):
+            if any(key in b for b in buckets):
+                names = sorted(set().union(*(b.get(key, {}) for b in buckets)))
+                result[key] = {name: AggregateIndex._merge([b[key][name] for b in buckets if name in b.get(key, {})])
+                               for name in names}
+        return result
+
+    def meters(self) -> List[str]:
+        """Meters with indexed readings."""
+        with self._lock:
+            portal = set(self._meters)
+        return sorted(portal | set(self._manual_totals()))
+
+    def get(self, meter_number: str, year: Optional[str] = None, month: Optional[str] = None) -> Optional[Dict]:
+        """
+        A meter's totals with its year and month buckets, or a single year or month bucket.
 
-            # Save to file
-            self._save_readings()
-            return True
+        Returns:
+            The bucket, or None if there are no readings for it
+        """
+        with self._lock:
+            buckets = [self._meters.get(meter_number), self._manual_totals().get(meter_number)]
+            for key, name in (('years', year), ('months', month)):
+                if name is not None:
+                    buckets = [b.get(key, {}).get(name) for b in buckets if b is not None]
+            buckets = [b for b in buckets if b is not None and b['readings']]
+            return self._merge(buckets) if buckets else None
 
-        except Exception as e:
-            logger.error(f"Error adding historical reading: {e}")
-            return False
 
-    def get_readings(self, meter_number: str) -> List[Dict]:
-        """Get all historical readings for a meter."""
-        return self.readings.get(meter_number, [])
+class FetchDeadlineExceeded(Exception):
+    """The fetch cycle ran past its deadline."""
 
-    def get_all_readings(self) -> Dict[str, List[Dict]]:
-        """Get all historical readings for all meters."""
-        return self.readings
 
-    def delete_reading(self, meter_number: str, date: str) -> bool:
-        """Delete a specific historical reading."""
+def _shutdown_socket(sock: Optional[socket.socket]):
+    """Shut down a socket, waking up any thread blocked reading from it."""
+    if sock is not None:
         try:
-            if meter_number not in self.readings:
-                return False
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
-            # Parse date
+
+class FetchCycle:
+    """
+    Deadline and progress of one fetch cycle.
+
+    enter() starts a phase: it records the previous phase as completed,
+    checks the deadline and publishes a fetch_phase event. Request timeouts
+    are capped at the time left. When the deadline passes, a timer calls the
+    cancel callbacks registered with cancellable(), which shut down the
+    sockets the cycle is blocked on, so a stalled read fails immediately.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_FETCH_CYCLE_TIMEOUT, trigger: str = 'scheduled'):
+        """
+        Initialize the cycle; the deadline starts counting now.
+
+        Args:
+            timeout: Seconds the whole cycle may take
+            trigger: What started the cycle: 'scheduled', 'manual_file' or 'web'
+        """
+        self.timeout = timeout
+        self.trigger = trigger
+        self.started = datetime.now()
+        self._started = time.monotonic()
+        self._deadline = self._started + timeout
+        self._lock = threading.Lock()
+        self._cancels: Dict[int, Callable[[], None]] = {}
+        self._next_token = itertools.count()
+        self._timer = threading.Timer(timeout, self._expire)
+        self._timer.daemon = True
+        self._phase_started = 0.0
+        self.expired = False
+        self.current: Optional[Dict] = None
+        self.completed: List[Dict] = []
+        self.meters_completed: List[str] = []
+        self.outcome: Optional[str] = None
+        self.seconds: Optional[float] = None
+        # Portal response bytes and readings table rows seen by the cycle
+        self.counters = {'bytes': 0, 'rows': 0}
+
+    def start(self):
+        """Start the timer that cancels the cycle at its deadline."""
+        self._timer.start()
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline."""
+        return self._deadline - time.monotonic()
+
+    def check(self):
+        """Raise FetchDeadlineExceeded if the deadline has passed."""
+        if self.expired or self.remaining() <= 0:
+            phase = f" during {self.current['phase']}" if self.current else ''
+            raise FetchDeadlineExceeded(f"Fetch cycle exceeded its deadline of {self.timeout:g}s{phase}")
+
+    def request_timeout(self, limit: float) -> float:
+        """Timeout for a single request: limit, or less if the deadline is closer."""
+        self.check()
+        return min(limit, self.remaining())
+
+    def _complete_phase(self):
+        """Record the current phase as completed."""
+        if self.current is not None:
+            self.current['seconds'] = round(time.monotonic() - self._phase_started, 3)
+            self.completed.append(self.current)
+            self.current = None
+
+    def enter(self, phase: str, meter_number: Optional[str] = None):
+        """Complete the current phase and start the next one, if the deadline allows."""
+        self._complete_phase()
+        self.check()
+        self.current = {'phase': phase}
+        if meter_number is not None:
+            self.current['meter_number'] = meter_number
+        self._phase_started = time.monotonic()
+        events.publish('fetch_phase', dict(self.current))
+
+    def count(self, counter: str, amount: int):
+        """Add to one of the cycle's counters."""
+        self.counters[counter] += amount
+
+    def meter_done(self, meter_number: str):
+        """Record that all phases of a meter completed."""
+        self._complete_phase()
+        self.meters_completed.append(meter_number)
+
+    @contextmanager
+    def cancellable(self, cancel: Callable[[], None]):
+        """Call cancel if the deadline passes while the block runs."""
+        token = next(self._next_token)
+        with self._lock:
+            expired = self.expired
+            if not expired:
+                self._cancels[token] = cancel
+        if expired:
+            cancel()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._cancels.pop(token, None)
+
+    def _expire(self):
+        """Timer callback: mark the cycle expired and cancel blocked operations."""
+        with self._lock:
+            self.expired = True
+            cancels = list(self._cancels.values())
+            self._cancels.clear()
+        logger.warning(f"Fetch cycle deadline of {self.timeout:g}s reached, cancelling "
+                       f"{len(cancels)} pending operation(s)")
+        for cancel in cancels:
             try:
-                parsed_date = datetime.strptime(date, "%Y-%m-%d")
-            except ValueError:
-                parsed_date = datetime.strptime(date, "%d.%m.%Y")
+                cancel()
+            except Exception as e:
+                logger.debug(f"Error cancelling operation: {e}")
+
+    def finish(self, outcome: str):
+        """Stop the deadline timer and record the outcome ('success', 'failed' or 'timeout')."""
+        self._timer.cancel()
+        if outcome == 'success':
+            self._complete_phase()
+        self.outcome = outcome
+        self.seconds = round(time.monotonic() - self._started, 3)
+
+    def report(self) -> Dict:
+        """Partial-result report: outcome, completed phases and meters, interrupted phase."""
+        return {
+            'trigger': self.trigger,
+            'started': self.started.isoformat(),
+            'timeout': self.timeout,
+            'seconds': self.seconds,
+            'outcome': self.outcome,
+            **self.counters,
+            'completed_phases': list(self.completed),
+            'interrupted_phase': dict(self.current) if self.current else None,
+            'meters_completed': list(self.meters_completed)
+        }
 
-            iso_date = parsed_date.isoformat()
 
-            # Find and remove reading
-            self.readings[meter_number] = [
-                r for r in self.readings[meter_number]
-                if r["date"] != iso_date
-            ]
+class TokenBucket:
+    """
+    Token bucket rate limiter shared by all threads of the process.
 
-            # Remove meter entry if no readings left
-            if not self.readings[meter_number]:
-                del self.readings[meter_number]
+    Tokens refill at rate per second up to burst. acquire() takes one token,
+    reserving a future token and sleeping until it is due when the bucket is
+    empty, so waiting callers are served in arrival order. A caller that
+    cannot wait that long gets no token and does not sleep.
+    """
 
-            self._save_readings()
-            logger.info(f"Deleted historical reading for meter {meter_number} on {date}")
-            return True
+    def __init__(self, rate: float, burst: int):
+        """Initialize a full bucket."""
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self.stats = {'requests': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait': 0.0}
+
+    def configure(self, rate: float, burst: int):
+        """Change rate and burst, keeping the tokens currently available."""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = burst
+            self._tokens = min(self._tokens, float(burst))
+
+    def _refill(self):
+        """Add the tokens accrued since the last update. Caller holds the lock."""
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Take one token, waiting for it if the bucket is empty.
 
-        except Exception as e:
-            logger.error(f"Error deleting historical reading: {e}")
-            return False
+        Args:
+            max_wait: Longest acceptable wait in seconds (None waits as long as needed)
+
+        Returns:
+            Seconds waited, or None without waiting if the token is due later than max_wait
+        """
+        with self._lock:
+            self._refill()
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            self.stats['requests'] += 1
+            if wait > 0:
+                self.stats['waited'] += 1
+                self.stats['wait_seconds'] += wait
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """Withhold tokens for the given time, e.g. after the server asked to slow down."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+# Shared by every portal request of the process, configured from portal_requests_per_minute / portal_burst
+portal_rate_limiter = TokenBucket(DEFAULT_PORTAL_REQUESTS_PER_MINUTE / 60, DEFAULT_PORTAL_BURST)
 
 
 class WAZNieplitzClient:
     """Client for WAZ Nieplitz customer portal."""
 
-    def __init__(self, username: str, password: str):
-        """Initialize the client."""
-        self.username = username
-        self.password = password
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+    def __init__(self, username: str, password: str, rate_limiter: Optional[TokenBucket] = None,
+                 streaming: bool = True, parse_pool=None):
+        """
+        Initialize the client.
+
+        Args:
+            streaming: Parse the readings page while it is read instead of all at once
+            parse_pool: Executor parsing readings pages in other processes; takes
+                precedence over streaming, since the page is handed over whole
+        """
+        self.username = username
+        self.password = password
+        self.rate_limiter = rate_limiter or portal_rate_limiter
+        self.streaming = streaming
+        self.parse_pool = parse_pool
+
+        import requests
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+
+    def _request(self, method: str, url: str, cycle: Optional[FetchCycle] = None, stream: bool = False,
+                 **kwargs):
+        """
+        Send a portal request once the rate limiter allows it.
+
+        With a cycle, the timeout is capped at the time left and the body is
+        read while the socket can be shut down at the cycle's deadline.
+        With stream, the body is left unread for _iter_body().
+        """
+        waited = self.rate_limiter.acquire(max(0.0, cycle.remaining()) if cycle else None)
+        if waited is None:
+            raise FetchDeadlineExceeded("Portal rate limit delays the next request past the fetch cycle deadline")
+        if waited > 0:
+            logger.debug(f"Waited {waited:.1f}s for portal rate limit")
+
+        if cycle is None:
+            response = self.session.request(method, url, stream=stream, **kwargs)
+        else:
+            kwargs['timeout'] = cycle.request_timeout(kwargs.get('timeout', 30))
+            try:
+                response = self.session.request(method, url, stream=True, **kwargs)
+                if not stream:
+                    with cycle.cancellable(lambda: _shutdown_socket(_response_socket(response))):
+                        cycle.count('bytes', len(response.content))
+            except Exception as e:
+                if cycle.expired or cycle.remaining() <= 0:
+                    raise FetchDeadlineExceeded(f"Portal request cancelled at the fetch cycle deadline: {e}") from e
+                raise
+
+        if response.status_code in (429, 503):
+            retry_after = response.headers.get('Retry-After', '')
+            seconds = min(float(retry_after), PORTAL_THROTTLE_PAUSE_MAX) if retry_after.isdigit() \
+                else PORTAL_THROTTLE_PAUSE
+            logger.warning(f"Portal answered HTTP {response.status_code}, pausing portal requests for {seconds:.0f}s")
+            self.rate_limiter.pause(seconds)
+        return response
+
+    @staticmethod
+    def _iter_body(response, cycle: Optional[FetchCycle] = None):
+        """
+        Yield the response body in chunks of READINGS_CHUNK_SIZE.
+
+        With a cycle, the socket is shut down if the cycle's deadline passes while reading.
+        """
+        sock = _response_socket(response)
+        with cycle.cancellable(lambda: _shutdown_socket(sock)) if cycle else nullcontext():
+            try:
+                for chunk in response.iter_content(READINGS_CHUNK_SIZE):
+                    if cycle is not None:
+                        cycle.count('bytes', len(chunk))
+                    yield chunk
+            except Exception as e:
+                if cycle is not None and (cycle.expired or cycle.remaining() <= 0):
+                    raise FetchDeadlineExceeded(f"Portal request cancelled at the fetch cycle deadline: {e}") from e
+                raise
+
+    def login(self, cycle: Optional[FetchCycle] = None) -> bool:
+        """Login to the portal."""
+        try:
+            logger.info("Attempting to login to WAZ Nieplitz portal...")
+
+            # First, get the login page to retrieve any CSRF tokens or form data
+            response = self._request('GET', LOGIN_URL, cycle, timeout=30)
+            response.raise_for_status()
+
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(response.content, 'html.parser')
+
+            # Find the login form
+            form = soup.find('form')
+            if not form:
+                logger.error("Could not find login form")
+                return False
+
+            # Prepare login data with correct field names
+            login_data = {
+                'fieldLoginBenutzername': self.username,
+                'fieldLoginPasswort': self.password,
+                'fieldFormSent': 'formLogin',
+                'fieldSFileReferer': ''
+            }
+
+            # Add any other hidden fields from the form (if they exist)
+            for hidden_input in soup.find_all('input', type='hidden'):
+                name = hidden_input.get('name')
+                value = hidden_input.get('value', '')
+                if name and name not in login_data:
+                    login_data[name] = value
+
+            # Submit login form
+            action = form.get('action', LOGIN_URL)
+            if not action.startswith('http'):
+                action = BASE_URL + action
+
+            logger.debug(f"Posting login to: {action}")
+            response = self._request('POST', action, cycle, data=login_data, timeout=30)
+            response.raise_for_status()
+
+            # Check if login was successful by trying to access the readings page
+            test_response = self._request('GET', READINGS_URL, cycle, timeout=30)
+            if test_response.status_code == 200 and 'Ablesungen' in test_response.text:
+                logger.info("Login successful")
+                return True
+            else:
+                logger.error("Login failed - could not access readings page")
+                logger.debug(f"Response status: {test_response.status_code}")
+                logger.debug(f"Response contains 'Ablesungen': {'Ablesungen' in test_response.text}")
+                return False
+
+        except FetchDeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Login error: {e}")
+            return False
+
+    def get_meter_readings(self, cycle: Optional[FetchCycle] = None) -> List[Dict]:
+        """
+        Fetch meter readings from the portal.
+
+        With a parse pool the page is parsed in another process; in streaming
+        mode it is read in chunks and parsed incrementally, keeping only the
+        readings table rows in memory; otherwise the whole page is parsed
+        with BeautifulSoup.
+        """
+        try:
+            logger.info("Fetching meter readings...")
+
+            if self.parse_pool is not None:
+                response = self._request('GET', READINGS_URL, cycle, timeout=30)
+                response.raise_for_status()
+                future = self.parse_pool.submit(parse_readings_page, response.content, _response_charset(response))
+                rows = _pooled_readings_rows(future, cycle)
+            elif self.streaming:
+                response = self._request('GET', READINGS_URL, cycle, stream=True, timeout=30)
+                response.raise_for_status()
+                rows = iter_readings_rows(self._iter_body(response, cycle), _response_charset(response))
+            else:
+                response = self._request('GET', READINGS_URL, cycle, timeout=30)
+                response.raise_for_status()
+                rows = soup_readings_rows(response.content)
+
+            meters = build_meters(rows)
+            if cycle is not None:
+                cycle.count('rows', sum(len(meter['portal_readings']) for meter in meters))
+            return meters
+
+        except FetchDeadlineExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching readings: {e}")
+            return []
+
+
+class ReadingsTableNotFound(Exception):
+    """The readings page has no readings table."""
+
+
+# Cells of a readings row: td class -> label the portal prefixes for small screens
+READINGS_CELLS = {
+    'zaehler': 'Zähler',
+    'ablesetag': 'Ablesetag',
+    'stichtag': 'Stichtag',
+    'stand': 'Stand',
+    'verbrauch': 'Verbrauch (m³)',
+    'ablesart': 'Ableseart'
+}
+
+
+def _response_socket(response):
+    """Socket a streamed response is read from, if still attached."""
+    return getattr(getattr(response.raw, 'connection', None), 'sock', None)
+
+
+def _response_charset(response) -> Optional[str]:
+    """Charset declared in the Content-Type header, if any (otherwise the parser detects it)."""
+    match = re.search(r'charset=([\w.:-]+)', response.headers.get('Content-Type', ''))
+    return match.group(1) if match else None
+
+
+def soup_readings_rows(content: bytes):
+    """
+    Yield the cell texts of each readings row, parsing the whole page with BeautifulSoup.
+
+    Raises:
+        ReadingsTableNotFound: If the page has no readings table
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Find the table with readings
+    table = soup.find('table', class_='listview ablesungen')
+    if not table:
+        raise ReadingsTableNotFound()
+
+    for row in table.find_all('tr', class_='item'):
+        cells = {}
+        for cell_class in READINGS_CELLS:
+            cell = row.find('td', class_=cell_class)
+            if cell:
+                cells[cell_class] = cell.get_text(strip=True)
+        yield cells
+
+
+class _ReadingsTableParser(html.parser.HTMLParser):
+    """
+    Incremental parser collecting the cell texts of readings table rows.
+
+    No document tree is built: only the row being read is kept, and finished
+    rows wait in self.rows until the caller takes them. The bodies of scripts
+    and styles outside the table are dropped in feed() before they reach
+    HTMLParser, which would otherwise buffer them whole until their end tag.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.found = False
+        self.rows = []
+        self._depth = 0  # Nesting of tables inside the readings table
+        self._row = None
+        self._cell = None
+        self._texts = []
+        self._text = []
+        self._skipping = None  # Script or style outside the table whose body is being dropped
+        self._held = ''  # End of the dropped text, in case it is the start of a split end tag
+
+    def feed(self, data: str):
+        if self._skipping is None:
+            super().feed(data)
+            return
+
+        pending = self._held + data
+        end = pending.lower().find('</' + self._skipping)
+        if end < 0:
+            # Keep just enough to recognise an end tag split by the chunk boundary
+            self._held = pending[-len(self._skipping) - 1:]
+            return
+        self._skipping = None
+        self._held = ''
+        super().feed(pending[end:])
+
+    def _flush_text(self):
+        # Text between two tags is one string, stripped like get_text(strip=True)
+        if self._text:
+            self._texts.append(''.join(self._text).strip())
+            self._text = []
+
+    def _end_cell(self):
+        self._flush_text()
+        if self._cell and self._cell not in self._row:
+            self._row[self._cell] = ''.join(self._texts)
+        self._cell = None
+        self._texts = []
+
+    def _end_row(self):
+        if self._cell is not None:
+            self._end_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+        self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        classes = set((dict(attrs).get('class') or '').split())
+        if self._depth == 0:
+            if tag == 'table' and {'listview', 'ablesungen'} <= classes and not self.found:
+                self.found = True
+                self._depth = 1
+            elif tag in ('script', 'style'):
+                self._skipping = tag
+            return
+        if tag == 'table':
+            self._depth += 1
+        elif self._depth == 1 and tag == 'tr':
+            self._end_row()
+            if 'item' in classes:
+                self._row = {}
+        elif self._row is not None and tag == 'td':
+            if self._cell is not None:
+                self._end_cell()
+            self._cell = next((c for c in READINGS_CELLS if c in classes), '')
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag == self._skipping:
+            # Ended within the chunk it started in
+            self._skipping = None
+        if self._depth == 0:
+            return
+        if tag == 'table':
+            self._depth -= 1
+            if self._depth == 0:
+                self._end_row()
+        elif self._depth == 1 and tag == 'tr':
+            self._end_row()
+        elif tag == 'td' and self._cell is not None:
+            self._end_cell()
+
+    def handle_data(self, data):
+        if self._cell:
+            self._text.append(data)
+
+
+def _sniff_charset(head: bytes) -> str:
+    """Charset declared in a meta tag at the start of a page, defaulting to UTF-8."""
+    match = re.search(rb'<meta[^>]+charset=["\']?([\w.:-]+)', head, re.IGNORECASE)
+    return match.group(1).decode('ascii') if match else 'utf-8'
+
+
+def iter_readings_rows(chunks, encoding: Optional[str] = None):
+    """
+    Yield the cell texts of each readings row, parsing the page incrementally.
+
+    Everything outside the readings table is dropped as it is read and each
+    row is released once yielded, so memory stays flat however large the
+    page is.
+
+    Args:
+        chunks: Iterable of byte chunks of the page
+        encoding: Page encoding, or None to take it from the page's meta tag
+
+    Raises:
+        ReadingsTableNotFound: If the page has no readings table
+    """
+    import codecs
+
+    parser = _ReadingsTableParser()
+    decoder = None
+    head = b''
+
+    for chunk in chunks:
+        if decoder is None:
+            # Wait for enough of the page to find a meta charset
+            head += chunk
+            if encoding is None and len(head) < 1024:
+                continue
+            decoder = codecs.getincrementaldecoder(encoding or _sniff_charset(head))(errors='replace')
+            chunk, head = head, b''
+        parser.feed(decoder.decode(chunk))
+        yield from parser.rows
+        parser.rows.clear()
+
+    if decoder is None:
+        decoder = codecs.getincrementaldecoder(encoding or _sniff_charset(head))(errors='replace')
+    parser.feed(decoder.decode(head, final=True))
+    parser.close()
+    yield from parser.rows
+    parser.rows.clear()
+
+    if not parser.found:
+        raise ReadingsTableNotFound()
+
+
+def parse_readings_page(content: bytes, encoding: Optional[str] = None) -> List[Tuple]:
+    """
+    Parse a whole readings page into compact records, for running in a parse pool.
+
+    Returns:
+        One tuple of cell texts per row, in READINGS_CELLS order (None for missing cells)
+
+    Raises:
+        ReadingsTableNotFound: If the page has no readings table
+    """
+    chunks = (content[i:i + READINGS_CHUNK_SIZE] for i in range(0, len(content), READINGS_CHUNK_SIZE))
+    return [tuple(cells.get(cell_class) for cell_class in READINGS_CELLS)
+            for cells in iter_readings_rows(chunks, encoding)]
+
+
+def _pooled_readings_rows(future, cycle: Optional[FetchCycle] = None):
+    """Yield the rows of a page parsed by parse_readings_page() in a parse pool."""
+    import concurrent.futures
+
+    try:
+        records = future.result(timeout=cycle.remaining() if cycle else None)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise FetchDeadlineExceeded("Parsing the readings page did not finish before the fetch cycle deadline")
+
+    for record in records:
+        yield {cell_class: text for cell_class, text in zip(READINGS_CELLS, record) if text is not None}
+
+
+def available_cpus() -> int:
+    """CPU cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def create_parse_pool(workers: int):
+    """
+    Create the process pool parsing readings pages, or None to parse in the fetching thread.
+
+    Args:
+        workers: Worker processes; 0 disables the pool, -1 uses one per CPU core
+    """
+    if workers == 0:
+        return None
+
+    import concurrent.futures
+    import multiprocessing
+
+    if workers < 0:
+        workers = available_cpus()
+    # The web server and other threads are already running; a forked worker could inherit a held lock
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    logger.info(f"Parsing readings pages in {workers} worker process(es)")
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context(method))
 
-    def login(self) -> bool:
-        """Login to the portal."""
-        try:
-            logger.info("Attempting to login to WAZ Nieplitz portal...")
 
-            # First, get the login page to retrieve any CSRF tokens or form data
-            response = self.session.get(LOGIN_URL, timeout=30)
-            response.raise_for_status()
+def build_meters(rows) -> List[Dict]:
+    """
+    Build meters from readings rows, collecting ALL readings per meter.
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+    Args:
+        rows: Iterable of dicts mapping the READINGS_CELLS classes to cell texts
 
-            # Find the login form
-            form = soup.find('form')
-            if not form:
-                logger.error("Could not find login form")
-                return False
+    Returns:
+        One dict per meter with its most recent reading and all portal readings
+    """
+    meters = {}
 
-            # Prepare login data with correct field names
-            login_data = {
-                'fieldLoginBenutzername': self.username,
-                'fieldLoginPasswort': self.password,
-                'fieldFormSent': 'formLogin',
-                'fieldSFileReferer': ''
-            }
+    try:
+        for idx, cells in enumerate(rows):
+            # Extract meter number
+            if 'zaehler' not in cells:
+                continue
+            meter_number = cells['zaehler'].replace('Zähler', '').strip()
+            logger.info(f"Row {idx+1}: Processing meter {meter_number}")
 
-            # Add any other hidden fields from the form (if they exist)
-            for hidden_input in soup.find_all('input', type='hidden'):
-                name = hidden_input.get('name')
-                value = hidden_input.get('value', '')
-                if name and name not in login_data:
-                    login_data[name] = value
+            # Extract reading date (Ablesetag) and reference date (Stichtag)
+            ablesetag = cells.get('ablesetag', '').replace('Ablesetag', '').strip()
+            stichtag = cells.get('stichtag', '').replace('Stichtag', '').strip()
 
-            # Submit login form
-            action = form.get('action', LOGIN_URL)
-            if not action.startswith('http'):
-                action = BASE_URL + action
+            # Extract meter reading (Stand)
+            stand = cells['stand'].replace('Stand', '').replace('m³', '').strip() if 'stand' in cells else '0'
 
-            logger.debug(f"Posting login to: {action}")
-            response = self.session.post(action, data=login_data, timeout=30)
-            response.raise_for_status()
+            # Extract consumption (Verbrauch)
+            verbrauch = cells['verbrauch'].replace('Verbrauch (m³)', '').replace('m³', '').strip() if 'verbrauch' in cells else '0'
 
-            # Check if login was successful by trying to access the readings page
-            test_response = self.session.get(READINGS_URL, timeout=30)
-            if test_response.status_code == 200 and 'Ablesungen' in test_response.text:
-                logger.info("Login successful")
-                return True
-            else:
-                logger.error("Login failed - could not access readings page")
-                logger.debug(f"Response status: {test_response.status_code}")
-                logger.debug(f"Response contains 'Ablesungen': {'Ablesungen' in test_response.text}")
-                return False
+            # Extract reading type
+            ablesart = cells.get('ablesart', '').replace('Ableseart', '').strip()
 
-        except Exception as e:
-            logger.error(f"Login error: {e}")
-            return False
+            # Parse reading date (Ablesetag) and reference date (Stichtag)
+            reading_date = parse_portal_date(ablesetag)
+            reference_date = parse_portal_date(stichtag)
 
-    def get_meter_readings(self) -> List[Dict]:
-        """Fetch meter readings from the portal."""
-        try:
-            logger.info("Fetching meter readings...")
+            # Determine primary date: prioritize Ablesetag over Stichtag
+            primary_date = reading_date if reading_date else reference_date
 
-            response = self.session.get(READINGS_URL, timeout=30)
-            response.raise_for_status()
+            # Parse reading value (European format)
+            try:
+                reading_value = int(parse_portal_number(stand))
+            except (ValueError, AttributeError):
+                reading_value = 0
+                logger.warning(f"Could not parse reading value: '{stand}'")
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Parse consumption value
+            try:
+                consumption_value = int(parse_portal_number(verbrauch))
+            except (ValueError, AttributeError):
+                consumption_value = 0
+                logger.warning(f"Could not parse consumption value: '{verbrauch}'")
 
-            # Find the table with readings
-            table = soup.find('table', class_='listview ablesungen')
-            if not table:
-                logger.error("Could not find readings table")
-                return []
-
-            meters = {}
-
-            # Parse table rows - collect ALL readings per meter
-            rows = table.find_all('tr', class_='item')
-            logger.info(f"Found {len(rows)} row(s) in readings table")
-
-            for idx, row in enumerate(rows):
-                # Extract meter number
-                meter_cell = row.find('td', class_='zaehler')
-                if meter_cell:
-                    meter_number = meter_cell.get_text(strip=True).replace('Zähler', '').strip()
-                    logger.info(f"Row {idx+1}: Processing meter {meter_number}")
-
-                    # Extract reading date (Ablesetag)
-                    ablesetag_cell = row.find('td', class_='ablesetag')
-                    ablesetag = ablesetag_cell.get_text(strip=True).replace('Ablesetag', '').strip() if ablesetag_cell else ''
-
-                    # Extract reference date (Stichtag)
-                    stichtag_cell = row.find('td', class_='stichtag')
-                    stichtag = stichtag_cell.get_text(strip=True).replace('Stichtag', '').strip() if stichtag_cell else ''
-
-                    # Extract meter reading (Stand)
-                    stand_cell = row.find('td', class_='stand')
-                    stand = stand_cell.get_text(strip=True).replace('Stand', '').replace('m³', '').strip() if stand_cell else '0'
-
-                    # Extract consumption (Verbrauch)
-                    verbrauch_cell = row.find('td', class_='verbrauch')
-                    verbrauch = verbrauch_cell.get_text(strip=True).replace('Verbrauch (m³)', '').replace('m³', '').strip() if verbrauch_cell else '0'
-
-                    # Extract reading type
-                    ablesart_cell = row.find('td', class_='ablesart')
-                    ablesart = ablesart_cell.get_text(strip=True).replace('Ableseart', '').strip() if ablesart_cell else ''
-
-                    # Parse reading date (Ablesetag)
-                    reading_date = None
-                    if ablesetag:
-                        try:
-                            reading_date = date_parser.parse(ablesetag, dayfirst=True)
-                        except:
-                            pass
-
-                    # Parse reference date (Stichtag)
-                    reference_date = None
-                    if stichtag:
-                        try:
-                            reference_date = date_parser.parse(stichtag, dayfirst=True)
-                        except:
-                            pass
-
-                    # Determine primary date: prioritize Ablesetag over Stichtag
-                    primary_date = reading_date if reading_date else reference_date
-
-                    # Parse reading value - remove commas and handle decimal points
-                    try:
-                        # Remove spaces and replace comma with dot for European format
-                        cleaned_stand = stand.replace(' ', '').replace(',', '.')
-                        reading_value = int(float(cleaned_stand))
-                    except (ValueError, AttributeError):
-                        reading_value = 0
-                        logger.warning(f"Could not parse reading value: '{stand}'")
-
-                    # Parse consumption value
-                    try:
-                        cleaned_verbrauch = verbrauch.replace(' ', '').replace(',', '.')
-                        consumption_value = int(float(cleaned_verbrauch))
-                    except (ValueError, AttributeError):
-                        consumption_value = 0
-                        logger.warning(f"Could not parse consumption value: '{verbrauch}'")
-
-                    # Create reading entry
-                    reading_entry = {
-                        'date': primary_date.isoformat() if primary_date else None,
-                        'reading': reading_value,
-                        'consumption': consumption_value,
-                        'reading_type': ablesart,
-                        'reading_date': reading_date.isoformat() if reading_date else None,
-                        'reference_date': reference_date.isoformat() if reference_date else None
-                    }
+            # Create reading entry
+            reading_entry = {
+                'date': primary_date.isoformat() if primary_date else None,
+                'reading': reading_value,
+                'consumption': consumption_value,
+                'reading_type': ablesart,
+                'reading_date': reading_date.isoformat() if reading_date else None,
+                'reference_date': reference_date.isoformat() if reference_date else None
+            }
 
-                    logger.info(f"  → Date={primary_date}, Reading={reading_value} m³, Consumption={consumption_value} m³, Type={ablesart}")
+            logger.info(f"  → Date={primary_date}, Reading={reading_value} m³, Consumption={consumption_value} m³, Type={ablesart}")
 
-                    # Initialize meter if not exists
-                    if meter_number not in meters:
-                        meters[meter_number] = {
-                            'meter_number': meter_number,
+            # Initialize meter if not exists
+            if meter_number not in meters:
+                meters[meter_number] = {
+                    'meter_number': meter_number,
+                    'reading_date': reading_date,
+                    'reference_date': reference_date,
+                    'primary_date': primary_date,
+                    'reading': reading_value,
+                    'consumption': consumption_value,
+                    'reading_type': ablesart,
+                    'portal_readings': [reading_entry]
+                }
+            else:
+                # Add this reading to the portal readings list
+                meters[meter_number]['portal_readings'].append(reading_entry)
+                logger.debug(f"  Added to existing meter {meter_number} (now {len(meters[meter_number]['portal_readings'])} reading(s))")
+
+                # Update current reading if this one is more recent
+                existing = meters[meter_number]
+                if primary_date and existing.get('primary_date'):
+                    if primary_date > existing['primary_date']:
+                        logger.debug(f"  Updating current reading for {meter_number} (newer date)")
+                        meters[meter_number].update({
                             'reading_date': reading_date,
                             'reference_date': reference_date,
                             'primary_date': primary_date,
                             'reading': reading_value,
                             'consumption': consumption_value,
-                            'reading_type': ablesart,
-                            'portal_readings': [reading_entry]
-                        }
-                    else:
-                        # Add this reading to the portal readings list
-                        meters[meter_number]['portal_readings'].append(reading_entry)
-                        logger.debug(f"  Added to existing meter {meter_number} (now {len(meters[meter_number]['portal_readings'])} reading(s))")
-
-                        # Update current reading if this one is more recent
-                        existing = meters[meter_number]
-                        if primary_date and existing.get('primary_date'):
-                            if primary_date > existing['primary_date']:
-                                logger.debug(f"  Updating current reading for {meter_number} (newer date)")
-                                meters[meter_number].update({
-                                    'reading_date': reading_date,
-                                    'reference_date': reference_date,
-                                    'primary_date': primary_date,
-                                    'reading': reading_value,
-                                    'consumption': consumption_value,
-                                    'reading_type': ablesart
-                                })
-
-            result = list(meters.values())
-            logger.info(f"Found {len(result)} meter(s)")
-            for meter in result:
-                portal_count = len(meter.get('portal_readings', []))
-                logger.info(f"Meter {meter['meter_number']}: {meter['reading']} m³ "
-                          f"({portal_count} portal reading(s), Date: {meter.get('primary_date')})")
-
-            return result
+                            'reading_type': ablesart
+                        })
+    except ReadingsTableNotFound:
+        logger.error("Could not find readings table")
+        return []
+
+    logger.info(f"Found {sum(len(m['portal_readings']) for m in meters.values())} row(s) in readings table")
+    result = list(meters.values())
+    logger.info(f"Found {len(result)} meter(s)")
+    for meter in result:
+        portal_count = len(meter.get('portal_readings', []))
+        logger.info(f"Meter {meter['meter_number']}: {meter['reading']} m³ "
+                  f"({portal_count} portal reading(s), Date: {meter.get('primary_date')})")
+
+    return result
+
+
+class HomeAssistantUnavailable(Exception):
+    """Home Assistant could not be reached; the update can be retried later."""
+
+    def __init__(self, message: str, delivered: int = 0):
+        super().__init__(message)
+        # Statistics accepted before the connection failed
+        self.delivered = delivered
+
+
+class OutboundQueue:
+    """
+    Persistent queue of Home Assistant updates that could not be delivered.
+
+    Items are keyed by what they update ('state:<entity_id>' or
+    'statistics:<entity_id>'); a newer update replaces a queued one for the
+    same key, keeping the time the first one was queued. The queue is
+    written to filepath on every change, so it survives add-on restarts.
+    """
+
+    def __init__(self, filepath: str = OUTBOUND_QUEUE_FILE):
+        """Initialize the queue and load items left from a previous run."""
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self._items: Dict[str, Dict] = self._load()
+        self.stats = {'queued': 0, 'coalesced': 0, 'delivered': 0, 'dropped': 0}
+        if self._items:
+            logger.info(f"{len(self._items)} undelivered Home Assistant update(s) queued")
+            self.wakeup.set()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load queued items from file."""
+        try:
+            if os.path.exists(self.filepath):
+                with open(self.filepath, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading outbound queue: {e}")
+        return {}
 
+    def _save(self):
+        """Write the queue to a temporary file and rename it. Caller holds the lock."""
+        try:
+            tmp_path = f"{self.filepath}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._items, f)
+            os.replace(tmp_path, self.filepath)
         except Exception as e:
-            logger.error(f"Error fetching readings: {e}")
-            return []
+            logger.error(f"Error saving outbound queue: {e}")
+
+    def put(self, key: str, kind: str, payload: Dict):
+        """Queue an update, replacing a queued update with the same key."""
+        with self._lock:
+            previous = self._items.get(key)
+            self._items[key] = {
+                'kind': kind,
+                'payload': payload,
+                'queued_at': previous['queued_at'] if previous else time.time(),
+                'attempts': 0
+            }
+            self.stats['coalesced' if previous else 'queued'] += 1
+            self._save()
+        self.wakeup.set()
+
+    def discard(self, key: str):
+        """Drop a queued update that was superseded by a delivered one."""
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self._save()
+
+    def batch(self, size: int) -> List[Tuple[str, Dict]]:
+        """The oldest queued items, at most size of them."""
+        with self._lock:
+            return sorted(self._items.items(), key=lambda kv: kv[1]['queued_at'])[:size]
+
+    def complete(self, key: str, item: Dict, delivered: bool = True):
+        """Remove a delivered or undeliverable item, unless a newer update replaced it meanwhile."""
+        with self._lock:
+            if self._items.get(key) is item:
+                del self._items[key]
+                self._save()
+            self.stats['delivered' if delivered else 'dropped'] += 1
+
+    def retry(self, key: str, item: Dict, payload: Optional[Dict] = None):
+        """Record a failed attempt, optionally keeping only the undelivered part of the payload."""
+        with self._lock:
+            if self._items.get(key) is item:
+                item['attempts'] += 1
+                if payload is not None:
+                    item['payload'] = payload
+                self._save()
+
+    @property
+    def depth(self) -> int:
+        """Number of queued updates."""
+        return len(self._items)
+
+    @property
+    def oldest_age(self) -> Optional[float]:
+        """Seconds since the oldest queued update was queued, None if the queue is empty."""
+        with self._lock:
+            if not self._items:
+                return None
+            return time.time() - min(item['queued_at'] for item in self._items.values())
 
 
 class HomeAssistantAPI:
     """Interface to Home Assistant API."""
 
-    def __init__(self):
-        """Initialize the API client."""
+    def __init__(self, refresh_interval: float = DEFAULT_STATE_REFRESH_INTERVAL,
+                 outbound: Optional[OutboundQueue] = None, pushed_file: Optional[str] = None):
+        """
+        Initialize the API client.
+
+        Args:
+            refresh_interval: Seconds after which an unchanged state is pushed again (0 pushes every time)
+            outbound: Queue for updates that fail while Home Assistant is unavailable (None drops them)
+            pushed_file: File keeping the digests of pushed states across restarts (None keeps them in memory)
+        """
         self.token = SUPERVISOR_TOKEN
         self.headers = {
             'Authorization': f'Bearer {self.token}',
             'Content-Type': 'application/json'
         }
+        self.refresh_interval = refresh_interval
+        self.outbound = outbound
+        self._drainer = None
+        self.pushed_file = pushed_file
+        self._pushed_lock = threading.Lock()
+        # Entity ID -> (digest of the last accepted payload, wall-clock time of that push)
+        self._pushed: Dict[str, Tuple[str, float]] = self._load_pushed()
+        self.stats = {'pushed': 0, 'skipped': 0}
+
+    def _load_pushed(self) -> Dict[str, Tuple[str, float]]:
+        """Load the digests of pushed states from pushed_file."""
+        try:
+            if self.pushed_file and os.path.exists(self.pushed_file):
+                with open(self.pushed_file, 'r') as f:
+                    return {entity_id: tuple(pushed) for entity_id, pushed in json.load(f).items()}
+        except Exception as e:
+            logger.error(f"Error loading pushed states: {e}")
+        return {}
+
+    def _set_pushed(self, entity_id: str, digest: Optional[str]):
+        """Record the digest of an accepted push (None forgets it) and persist the digests."""
+        with self._pushed_lock:
+            if digest is None:
+                if self._pushed.pop(entity_id, None) is None:
+                    return
+            else:
+                self._pushed[entity_id] = (digest, time.time())
+            if not self.pushed_file:
+                return
+            try:
+                tmp_path = f"{self.pushed_file}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._pushed, f)
+                os.replace(tmp_path, self.pushed_file)
+            except Exception as e:
+                logger.error(f"Error saving pushed states: {e}")
+
+    @staticmethod
+    def _payload_digest(data: Dict) -> str:
+        """Digest of a state payload, independent of attribute order."""
+        encoded = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _has_state(self, entity_id: str, state_str: str, timeout: float = 10) -> bool:
+        """Check that Home Assistant still holds the given state (it loses pushed states on restart)."""
+        try:
+            import requests
+            response = requests.get(f"{HA_URL}/states/{entity_id}", headers=self.headers, timeout=timeout)
+            return response.status_code == 200 and response.json().get('state') == state_str
+        except Exception as e:
+            logger.debug(f"Could not read state of {entity_id}: {e}")
+            return False
+
+    def _post_state(self, entity_id: str, data: Dict, timeout: float = 10, cycle: Optional[FetchCycle] = None):
+        """
+        POST a state to Home Assistant.
+
+        Raises:
+            HomeAssistantUnavailable: If Home Assistant could not be reached or answered with a server error
+            FetchDeadlineExceeded: If the request failed because the cycle's deadline passed
+            requests.HTTPError: If Home Assistant rejected the state
+        """
+        import requests
+        try:
+            response = requests.post(f"{HA_URL}/states/{entity_id}", headers=self.headers, json=data, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # A timeout capped by the deadline is not an outage of Home Assistant
+            if cycle:
+                cycle.check()
+            raise HomeAssistantUnavailable(str(e))
+        if response.status_code >= 500:
+            raise HomeAssistantUnavailable(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        logger.debug(f"HA Response: {response.status_code}")
+
+    def update_sensor(self, entity_id: str, state: float, attributes: Dict, force: bool = False,
+                      cycle: Optional[FetchCycle] = None) -> bool:
+        """
+        Update or create a sensor in Home Assistant.
 
-    def update_sensor(self, entity_id: str, state: float, attributes: Dict) -> bool:
-        """Update or create a sensor in Home Assistant."""
+        A payload identical to the last accepted one is not pushed again while Home Assistant
+        still reports that state, until refresh_interval has passed or force is set.
+        If Home Assistant is unavailable, the update is queued for later delivery.
+        With a cycle, request timeouts are capped at the time left in the cycle.
+        """
         try:
-            url = f"{HA_URL}/states/{entity_id}"
+            timeout = cycle.request_timeout(10) if cycle else 10
+
             # Convert state to string as HA expects
             state_str = str(state)
             data = {
@@ -421,15 +2174,44 @@ class HomeAssistantAPI:
                 'attributes': attributes
             }
 
+            digest = self._payload_digest(data)
+            last = self._pushed.get(entity_id)
+            if (not force and last is not None and last[0] == digest
+                    and 0 <= time.time() - last[1] < self.refresh_interval
+                    and self._has_state(entity_id, state_str, timeout)):
+                self.stats['skipped'] += 1
+                logger.info(f"Sensor {entity_id} unchanged, skipping update")
+                return True
+
             logger.debug(f"Sending to HA: entity={entity_id}, state={state_str}")
-            response = requests.post(url, headers=self.headers, json=data, timeout=10)
-            response.raise_for_status()
+            self._post_state(entity_id, data, timeout, cycle)
 
+            self._set_pushed(entity_id, digest)
+            self.stats['pushed'] += 1
+            if self.outbound:
+                self.outbound.discard(f"state:{entity_id}")
             logger.info(f"Updated sensor {entity_id}: {state}")
-            logger.debug(f"HA Response: {response.status_code}")
             return True
 
+        except HomeAssistantUnavailable as e:
+            self._set_pushed(entity_id, None)
+            if self.outbound:
+                # Round-trip through JSON so tuples of readings are stored like they are sent
+                self.outbound.put(f"state:{entity_id}", 'state', {
+                    'entity_id': entity_id,
+                    'data': json.loads(json.dumps(data, default=str))
+                })
+                logger.warning(f"Home Assistant unavailable ({e}), queued update of {entity_id}")
+            else:
+                logger.error(f"Error updating sensor {entity_id}: {e}")
+            return False
+
+        except FetchDeadlineExceeded:
+            raise
+
         except Exception as e:
+            # Push the next payload even if it is identical
+            self._set_pushed(entity_id, None)
             logger.error(f"Error updating sensor {entity_id}: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 logger.error(f"Response status: {e.response.status_code}")
@@ -440,6 +2222,7 @@ class HomeAssistantAPI:
         """Register a service with Home Assistant."""
         try:
             url = f"{HA_URL}/services/{domain}/{service}"
+            import requests
             response = requests.post(url, headers=self.headers, json=service_data, timeout=10)
             response.raise_for_status()
             logger.info(f"Registered service {domain}.{service}")
@@ -448,15 +2231,18 @@ class HomeAssistantAPI:
             logger.error(f"Error registering service {domain}.{service}: {e}")
             return False
 
-    def import_statistics(self, entity_id: str, friendly_name: str, readings: List[Dict]) -> bool:
+    def import_statistics(self, entity_id: str, friendly_name: str, readings: List[Dict],
+                          cycle: Optional[FetchCycle] = None) -> bool:
         """
         Import historical statistics for energy/utility sensors using WebSocket API.
         This allows the Energy Dashboard to show historical data correctly.
+        If Home Assistant is unavailable, the import is queued for later delivery.
 
         Args:
             entity_id: The sensor entity ID
             friendly_name: Friendly name for the statistic
             readings: List of readings with 'date' and 'reading' keys
+            cycle: Fetch cycle whose deadline aborts the WebSocket connection
 
         Returns:
             True if successful, False otherwise
@@ -467,7 +2253,7 @@ class HomeAssistantAPI:
                 return False
 
             # Sort readings by date
-            sorted_readings = sorted(readings, key=lambda x: x.get('date', ''))
+            sorted_readings = sorted(readings, key=lambda x: x.get('date') or '')
 
             # Build statistics data
             stats = []
@@ -475,14 +2261,10 @@ class HomeAssistantAPI:
                 if not reading.get('date') or reading.get('reading') is None:
                     continue
 
-                # Convert date to timestamp with timezone
+                # Convert date to timestamp with timezone (UTC if not specified)
                 try:
-                    date_obj = datetime.fromisoformat(reading['date'].replace('Z', '+00:00'))
-                    # Ensure timezone info is present (use UTC if not specified)
-                    if date_obj.tzinfo is None:
-                        from datetime import timezone
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                except Exception as e:
+                    date_obj = parse_iso_timestamp(reading['date'])
+                except (ValueError, TypeError, AttributeError) as e:
                     logger.warning(f"Could not parse date: {reading['date']} - {e}")
                     continue
 
@@ -514,15 +2296,80 @@ class HomeAssistantAPI:
             logger.info(f"Importing {len(stats)} statistics for {statistic_id} (entity: {entity_id})")
             logger.info(f"Date range: {stats[0]['start']} to {stats[-1]['start']}")
 
-            # Import via WebSocket API
-            import websocket
-            import ssl
+            # Note: As of HA 2025.11, metadata uses mean_type instead of has_mean
+            # For external statistics, source should be a custom integration name
+            metadata = {
+                'has_mean': False,  # Still include for backwards compatibility
+                'has_sum': True,
+                'mean_type': 0,  # 0=no mean, 1=arithmetic, 2=circular (new API)
+                'name': friendly_name,
+                'source': 'waz_nieplitz',
+                'statistic_id': statistic_id,
+                'unit_of_measurement': 'm³',
+                'unit_class': None  # Required as of HA 2025.11
+            }
+
+        except Exception as e:
+            logger.error(f"Error importing statistics for {entity_id}: {e}")
+            return False
+
+        key = f"statistics:{entity_id}"
+        try:
+            if self._send_statistics(metadata, stats, cycle):
+                logger.info(f"Successfully imported statistics for {entity_id}")
+                if self.outbound:
+                    # The full import supersedes any queued chunks
+                    self.outbound.discard(key)
+                return True
+            return False
+
+        except FetchDeadlineExceeded:
+            raise
 
+        except HomeAssistantUnavailable as e:
+            if self.outbound:
+                self.outbound.put(key, 'statistics', {
+                    'entity_id': entity_id,
+                    'metadata': metadata,
+                    'stats': stats[e.delivered:]
+                })
+                logger.warning(f"Home Assistant unavailable ({e}), queued {len(stats) - e.delivered} "
+                               f"statistics for {entity_id}")
+            else:
+                logger.error(f"Error importing statistics for {entity_id}: {e}")
+            return False
+
+        except Exception as e:
+            logger.error(f"Error importing statistics for {entity_id}: {e}")
+            return False
+
+    def _send_statistics(self, metadata: Dict, stats: List[Dict], cycle: Optional[FetchCycle] = None) -> bool:
+        """
+        Send statistics over the WebSocket API in chunks of STATISTICS_CHUNK_SIZE.
+        With a cycle, the connection is aborted when the cycle's deadline passes.
+
+        Returns:
+            True if Home Assistant accepted all chunks, False if it rejected one
+
+        Raises:
+            HomeAssistantUnavailable: If the connection failed; delivered counts the accepted statistics
+            FetchDeadlineExceeded: If the cycle's deadline passed, aborting the connection
+        """
+        import websocket
+
+        delivered = 0
+        timeout = cycle.request_timeout(30) if cycle else 30
+        try:
             # Connect to Home Assistant WebSocket
             ws_url = f"ws://supervisor/core/websocket"
-            ws = websocket.create_connection(ws_url, timeout=30)
+            ws = websocket.create_connection(ws_url, timeout=timeout)
+        except Exception as e:
+            if cycle:
+                cycle.check()
+            raise HomeAssistantUnavailable(str(e))
 
-            try:
+        try:
+            with cycle.cancellable(ws.abort) if cycle else nullcontext():
                 # Receive auth_required message
                 result = json.loads(ws.recv())
                 if result['type'] != 'auth_required':
@@ -539,45 +2386,102 @@ class HomeAssistantAPI:
                 if result['type'] != 'auth_ok':
                     raise Exception(f"Authentication failed: {result}")
 
-                # Send import_statistics command
-                # Note: As of HA 2025.11, metadata uses mean_type instead of has_mean
-                # For external statistics, source should be a custom integration name
-                command = {
-                    'id': 1,
-                    'type': 'recorder/import_statistics',
-                    'metadata': {
-                        'has_mean': False,  # Still include for backwards compatibility
-                        'has_sum': True,
-                        'mean_type': 0,  # 0=no mean, 1=arithmetic, 2=circular (new API)
-                        'name': friendly_name,
-                        'source': 'waz_nieplitz',
-                        'statistic_id': statistic_id,
-                        'unit_of_measurement': 'm³',
-                        'unit_class': None  # Required as of HA 2025.11
-                    },
-                    'stats': stats
-                }
+                for message_id, offset in enumerate(range(0, len(stats), STATISTICS_CHUNK_SIZE), start=1):
+                    chunk = stats[offset:offset + STATISTICS_CHUNK_SIZE]
 
-                logger.info(f"WebSocket command: {command}")
-                ws.send(json.dumps(command))
+                    # Send import_statistics command
+                    command = {
+                        'id': message_id,
+                        'type': 'recorder/import_statistics',
+                        'metadata': metadata,
+                        'stats': chunk
+                    }
 
-                # Receive response
-                result = json.loads(ws.recv())
-                logger.info(f"WebSocket response: {result}")
+                    logger.debug(f"WebSocket command: {command}")
+                    ws.send(json.dumps(command))
 
-                if result.get('success'):
-                    logger.info(f"Successfully imported statistics for {entity_id}")
-                    return True
-                else:
-                    logger.error(f"Failed to import statistics: {result}")
-                    return False
+                    # Receive response
+                    result = json.loads(ws.recv())
+                    logger.info(f"WebSocket response: {result}")
 
-            finally:
-                ws.close()
+                    if not result.get('success'):
+                        logger.error(f"Failed to import statistics: {result}")
+                        return False
+                    delivered += len(chunk)
 
-        except Exception as e:
-            logger.error(f"Error importing statistics for {entity_id}: {e}")
-            return False
+                return True
+
+        except (OSError, websocket.WebSocketException) as e:
+            # The deadline aborts the socket; that is not an outage of Home Assistant
+            if cycle:
+                cycle.check()
+            raise HomeAssistantUnavailable(str(e), delivered)
+
+        except Exception:
+            if cycle:
+                cycle.check()
+            raise
+
+        finally:
+            ws.close()
+
+    def start_drainer(self):
+        """Start the background thread replaying queued updates."""
+        if self.outbound is None or self._drainer is not None:
+            return
+        self._drainer = threading.Thread(target=self._drain_loop, name='outbound-drainer', daemon=True)
+        self._drainer.start()
+
+    def _drain_loop(self):
+        """Replay queued updates in batches, backing off while Home Assistant is unavailable."""
+        backoff = OUTBOUND_RETRY_MIN
+        while True:
+            self.outbound.wakeup.wait()
+            self.outbound.wakeup.clear()
+
+            while self.outbound.depth:
+                if self.drain_batch():
+                    backoff = OUTBOUND_RETRY_MIN
+                    continue
+
+                logger.info(f"Home Assistant unavailable, retrying {self.outbound.depth} "
+                            f"queued update(s) in {backoff}s")
+                # A new update wakes the drainer early, which also probes Home Assistant
+                self.outbound.wakeup.wait(backoff)
+                self.outbound.wakeup.clear()
+                backoff = min(backoff * 2, OUTBOUND_RETRY_MAX)
+
+    def drain_batch(self) -> bool:
+        """
+        Deliver up to OUTBOUND_BATCH_SIZE queued updates, oldest first.
+
+        Returns:
+            False if Home Assistant was unavailable, True otherwise
+        """
+        for key, item in self.outbound.batch(OUTBOUND_BATCH_SIZE):
+            payload = item['payload']
+            entity_id = payload['entity_id']
+            try:
+                if item['kind'] == 'state':
+                    self._post_state(entity_id, payload['data'])
+                    self._set_pushed(entity_id, self._payload_digest(payload['data']))
+                    delivered = True
+                else:
+                    delivered = self._send_statistics(payload['metadata'], payload['stats'])
+            except HomeAssistantUnavailable as e:
+                if item['kind'] == 'statistics' and e.delivered:
+                    self.outbound.retry(key, item, dict(payload, stats=payload['stats'][e.delivered:]))
+                else:
+                    self.outbound.retry(key, item)
+                return False
+            except Exception as e:
+                logger.error(f"Dropping queued {item['kind']} update of {entity_id}: {e}")
+                delivered = False
+
+            self.outbound.complete(key, item, delivered)
+            if delivered:
+                logger.info(f"Delivered queued {item['kind']} update of {entity_id}")
+        return True
 
 
 def load_config() -> Dict:
@@ -594,30 +2498,65 @@ def load_config() -> Dict:
             'main_meter_number': os.environ.get('MAIN_METER_NUMBER', ''),
             'main_meter_name': os.environ.get('MAIN_METER_NAME', 'Main'),
             'garden_meter_number': os.environ.get('GARDEN_METER_NUMBER', ''),
-            'garden_meter_name': os.environ.get('GARDEN_METER_NAME', 'Garden')
+            'garden_meter_name': os.environ.get('GARDEN_METER_NAME', 'Garden'),
+            'meters': json.loads(os.environ.get('METERS', '[]')),
+            'coordination_path': os.environ.get('COORDINATION_PATH', '')
         }
 
 
-def identify_meter_type(meter_number: str, config: Dict) -> str:
+def _entity_suffix(value: str) -> str:
+    """Turn a meter name or number into an entity id suffix (lowercase, digits, underscores)."""
+    return re.sub(r'[^a-z0-9]+', '_', value.lower()).strip('_')
+
+
+def build_meter_registry(config: Dict) -> Dict[str, Dict]:
     """
-    Identify if a meter is the main or garden meter based on configuration.
+    Build the meter registry from configuration.
+
+    The legacy main_meter_number and garden_meter_number options register the
+    'main' and 'garden' sensors; every entry of the 'meters' list
+    ({number, name, entity_suffix}) registers one more sensor.
 
     Args:
-        meter_number: The meter number to identify
-        config: Configuration dict with main_meter_number and garden_meter_number
+        config: Configuration dict
 
     Returns:
-        'main', 'garden', or 'unknown'
+        Dict mapping meter number to its sensor definition with keys
+        'meter_number', 'name', 'entity_suffix' and 'entity_id'
     """
-    main_meter_number = config.get('main_meter_number', '').strip()
-    garden_meter_number = config.get('garden_meter_number', '').strip()
+    candidates = [
+        (config.get('main_meter_number', ''), config.get('main_meter_name', 'Main'), 'main'),
+        (config.get('garden_meter_number', ''), config.get('garden_meter_name', 'Garden'), 'garden'),
+    ]
+    for meter in config.get('meters') or []:
+        number = str(meter.get('number', '')).strip()
+        candidates.append((number, meter.get('name') or f"Meter {number}",
+                           meter.get('entity_suffix') or number))
+
+    registry = {}
+    used_suffixes = set()
+    for number, name, suffix in candidates:
+        number = str(number).strip()
+        if not number:
+            continue
+        if number in registry:
+            logger.warning(f"Meter {number} is configured more than once, using the first definition")
+            continue
+
+        suffix = _entity_suffix(suffix) or _entity_suffix(number)
+        if suffix in used_suffixes:
+            logger.warning(f"Entity suffix '{suffix}' is already used, using '{suffix}_{number}' for meter {number}")
+            suffix = f"{suffix}_{_entity_suffix(number)}"
+        used_suffixes.add(suffix)
+
+        registry[number] = {
+            'meter_number': number,
+            'name': name,
+            'entity_suffix': suffix,
+            'entity_id': f"sensor.waz_nieplitz_water_{suffix}"
+        }
 
-    if main_meter_number and meter_number == main_meter_number:
-        return 'main'
-    elif garden_meter_number and meter_number == garden_meter_number:
-        return 'garden'
-    else:
-        return 'unknown'
+    return registry
 
 
 def check_manual_trigger() -> bool:
@@ -635,56 +2574,484 @@ def clear_manual_trigger():
         logger.error(f"Error clearing manual trigger: {e}")
 
 
+def account_jitter(account: str, interval: float, fraction: float) -> float:
+    """
+    Deterministic per-account delay for a fetch, spreading accounts evenly over the interval.
+
+    Args:
+        account: Portal username the delay is derived from
+        interval: Interval the delay is a part of, in seconds
+        fraction: Largest delay as a fraction of the interval (0 disables jitter)
+
+    Returns:
+        Delay in seconds, between 0 and fraction * interval
+    """
+    digest = hashlib.sha256(account.strip().lower().encode('utf-8')).digest()
+    position = int.from_bytes(digest[:8], 'big') / 2 ** 64
+    return position * fraction * interval
+
+
+class FetchScheduler:
+    """
+    Chooses when to fetch next from the yearly pattern of portal readings.
+
+    Readings appear about once a year near the anniversary of a meter's last
+    reading (its Ablesetag, or Stichtag if there is none). The scheduler
+    expects the next reading on the portal one year after the latest one plus
+    the learned delay between a reading's date and the fetch that first saw
+    it, within window_days widened by how much past anniversaries drifted.
+    Inside that window it polls every dense_interval; outside it waits until
+    the window opens, at most max_interval. Intervals never go below
+    MIN_FETCH_INTERVAL.
+    """
+
+    def __init__(self, dense_interval: float = DEFAULT_FETCH_DENSE_INTERVAL,
+                 max_interval: float = DEFAULT_FETCH_MAX_INTERVAL,
+                 window_days: int = DEFAULT_FETCH_WINDOW_DAYS,
+                 fallback_interval: float = 2592000,
+                 filepath: str = FETCH_SCHEDULE_FILE):
+        """Initialize the scheduler and load what it learned before."""
+        self.dense_interval = max(dense_interval, MIN_FETCH_INTERVAL)
+        self.max_interval = max(max_interval, self.dense_interval)
+        self.window_days = window_days
+        self.fallback_interval = fallback_interval
+        self.filepath = filepath
+        self._state = self._load()
+
+    def _load(self) -> Dict:
+        """Load first-seen times of readings and learned publication delays."""
+        try:
+            if os.path.exists(self.filepath):
+                with open(self.filepath, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading fetch schedule: {e}")
+        return {'first_seen': {}, 'delays': []}
+
+    def reload(self):
+        """Re-read the learned state, e.g. after another instance has been fetching."""
+        self._state = self._load()
+
+    def _save(self):
+        """Save the learned state."""
+        try:
+            tmp_path = f"{self.filepath}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.filepath)
+        except Exception as e:
+            logger.error(f"Error saving fetch schedule: {e}")
+
+    @staticmethod
+    def _base_date(reading: Dict) -> Optional[datetime]:
+        """Date a reading was taken: Ablesetag, else Stichtag, else its primary date."""
+        for key in ('reading_date', 'reference_date', 'date'):
+            if reading.get(key):
+                return parse_portal_date(reading[key][:10])
+        return None
+
+    @staticmethod
+    def _add_years(value: datetime, years: int) -> datetime:
+        """Same day the given number of years later (Feb 29 becomes Feb 28)."""
+        try:
+            return value.replace(year=value.year + years)
+        except ValueError:
+            return value.replace(year=value.year + years, day=28)
+
+    def observe(self, portal_readings: Dict[str, List[Dict]], now: datetime) -> int:
+        """
+        Record readings seen for the first time and learn how long they took to appear.
+
+        Returns:
+            Number of new readings
+        """
+        first_seen = self._state['first_seen']
+        # Readings present on the very first observation were published at an unknown time
+        learning = bool(first_seen)
+        new = 0
+        for meter_number, readings in portal_readings.items():
+            for reading in readings:
+                base = self._base_date(reading)
+                key = f"{meter_number}|{reading.get('date')}"
+                if base is None or key in first_seen:
+                    continue
+                first_seen[key] = now.isoformat()
+                new += 1
+                delay = (now - base).days
+                if learning and 0 <= delay <= 180:
+                    self._state['delays'] = (self._state['delays'] + [delay])[-FETCH_DELAY_HISTORY:]
+                    logger.info(f"New portal reading for meter {meter_number} appeared {delay} day(s) after its date")
+
+        if new:
+            self._save()
+        return new
+
+    def windows(self, portal_readings: Dict[str, List[Dict]], now: datetime) -> List[Tuple[datetime, datetime]]:
+        """Expected (start, end) of the next reading window per meter."""
+        delays = sorted(self._state['delays'])
+        delay = delays[len(delays) // 2] if delays else DEFAULT_PUBLICATION_DELAY_DAYS
+
+        windows = []
+        for readings in portal_readings.values():
+            dates = sorted(d for d in (self._base_date(r) for r in readings) if d is not None)
+            if not dates:
+                continue
+
+            # How far past readings drifted from the anniversary of the previous one
+            drift = max((abs((b - self._add_years(a, 1)).days) for a, b in zip(dates, dates[1:])
+                         if (b - a).days > 180), default=0)
+            margin = timedelta(days=self.window_days + min(drift, 60))
+
+            # Expected publication: one year after the latest reading plus the publication delay
+            expected = self._add_years(dates[-1], 1) + timedelta(days=delay)
+            # Skip windows that closed without a reading, e.g. a missed year
+            while expected + margin < now:
+                expected = self._add_years(expected, 1)
+            windows.append((expected - margin, expected + margin))
+        return windows
+
+    def next_interval(self, portal_readings: Dict[str, List[Dict]], now: datetime, jitter: float = 0.0) -> float:
+        """
+        Seconds until the next scheduled fetch.
+
+        Args:
+            jitter: Per-account delay as a fraction of the interval (see account_jitter). It is
+                applied before the limits, so a fetch waiting for a window still happens when the
+                window opens and no interval exceeds max_interval
+        """
+        windows = self.windows(portal_readings, now)
+        until_window = None
+        if not windows:
+            interval = self.fallback_interval
+        elif any(start <= now <= end for start, end in windows):
+            interval = self.dense_interval
+        else:
+            until_window = min((start - now).total_seconds() for start, _ in windows if start > now)
+            interval = until_window
+        interval = max(interval, MIN_FETCH_INTERVAL)
+        interval += interval * jitter
+        if until_window is not None:
+            interval = min(interval, max(until_window, MIN_FETCH_INTERVAL))
+        return min(interval, self.max_interval)
+
+
+def shared_data_paths(coordination_path: Optional[str] = None) -> Dict[str, str]:
+    """
+    Paths of the data all instances share: historical readings, portal readings,
+    the learned fetch schedule and the command spool.
+
+    Without a coordination path they stay in /data.
+    """
+    paths = {
+        'historical': HISTORICAL_READINGS_FILE,
+        'portal_readings': PORTAL_READINGS_FILE,
+        'fetch_schedule': FETCH_SCHEDULE_FILE,
+        'command_dir': HISTORICAL_COMMAND_DIR,
+        'command_file': HISTORICAL_COMMAND_FILE
+    }
+    if coordination_path:
+        paths = {key: os.path.join(coordination_path, os.path.basename(path)) for key, path in paths.items()}
+    return paths
+
+
+class LeaderLease:
+    """
+    Lease electing the one instance that fetches, among instances sharing a path.
+
+    The lease file names the holder and when its lease expires. It is only
+    read and written under flock() on a separate lock file, so two instances
+    never both see an expired lease and take it. The leader renews every
+    duration / 3 and its lease runs for 2 * duration / 3, so a standby polling
+    at the same rate takes over at most duration seconds after the leader's
+    last heartbeat. A leader that cannot renew in time stops acting as leader
+    when its lease runs out, even before another instance has taken over.
+    Requires a file system with working flock() (local disks, NFSv4, CephFS).
+    """
+
+    def __init__(self, path: str, node_id: str, duration: float = DEFAULT_LEASE_DURATION):
+        """
+        Initialize the lease.
+
+        Args:
+            path: Directory shared by all instances
+            node_id: Name of this instance, unique among the instances
+            duration: Longest time from the leader's last heartbeat to a takeover
+        """
+        self.path = path
+        self.node_id = node_id
+        self.duration = duration
+        self.interval = duration / 3
+        self._expires = 0.0
+        # Lease as last read or written: the current leader as far as this instance knows
+        self.lease: Optional[Dict] = None
+        # Lease of the previous leader when this instance took over
+        self.previous: Optional[Dict] = None
+        self.stats = {'acquired': 0, 'renewed': 0, 'lost': 0}
+        # Called as on_change(is_leader) when this instance becomes leader or standby
+        self.on_change: Optional[Callable[[bool], None]] = None
+        # Leadership as last reported, so a lease that ran out between renewals is reported too
+        self._was_leader = False
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def lease_path(self) -> str:
+        return os.path.join(self.path, LEASE_FILE)
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this instance holds an unexpired lease."""
+        return time.time() < self._expires
+
+    def _read(self) -> Optional[Dict]:
+        try:
+            with open(self.lease_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading leader lease: {e}")
+            return None
+
+    def _write(self, lease: Dict):
+        """Replace the lease file atomically. Caller holds the lock file."""
+        tmp_path = f"{self.lease_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(lease, f)
+        os.replace(tmp_path, self.lease_path)
+
+    def renew(self, info: Optional[Dict] = None) -> bool:
+        """
+        Take or renew the lease if it is free, expired or already ours.
+
+        Args:
+            info: Extra fields published with the lease (e.g. next_fetch)
+
+        Returns:
+            True if this instance is the leader
+        """
+        import fcntl
+
+        was_leader = self._was_leader
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, LEASE_LOCK_FILE), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                now = time.time()
+                current = self._read()
+                if current and current.get('holder') != self.node_id and current.get('expires', 0) > now:
+                    self.lease = current
+                    self._expires = 0.0
+                else:
+                    ours = bool(current) and current.get('holder') == self.node_id
+                    lease = {
+                        'holder': self.node_id,
+                        'acquired': current['acquired'] if ours else now,
+                        'heartbeat': now,
+                        'expires': now + self.duration * 2 / 3,
+                        **(info or {})
+                    }
+                    self._write(lease)
+                    if not ours:
+                        self.previous = current
+                    self.lease = lease
+                    self._expires = lease['expires']
+        except Exception as e:
+            logger.error(f"Error renewing leader lease: {e}")
+
+        leader = self.is_leader
+        self._was_leader = leader
+        if leader and not was_leader:
+            self.stats['acquired'] += 1
+            logger.info(f"Elected active instance ({self.node_id})")
+        elif was_leader and not leader:
+            self.stats['lost'] += 1
+            logger.warning(f"Lost leader lease, now standby (leader: {(self.lease or {}).get('holder')})")
+        elif leader:
+            self.stats['renewed'] += 1
+        if leader != was_leader and self.on_change:
+            try:
+                self.on_change(leader)
+            except Exception as e:
+                logger.error(f"Error in leadership change callback: {e}")
+        return leader
+
+    def start(self, info: Optional[Callable[[], Dict]] = None):
+        """Renew (or try to take) the lease every interval in a background thread."""
+        def heartbeat():
+            while not self._stop.wait(self.interval):
+                self.renew(info() if info else None)
+
+        self.renew(info() if info else None)
+        if not self.is_leader:
+            logger.info(f"Standby instance ({self.node_id}), active instance: {(self.lease or {}).get('holder')}")
+        self._thread = threading.Thread(target=heartbeat, name='leader-lease', daemon=True)
+        self._thread.start()
+
+    def release(self):
+        """Stop renewing and give up the lease, so a standby can take over at once."""
+        import fcntl
+
+        self._stop.set()
+        if not self.is_leader:
+            return
+        try:
+            with open(os.path.join(self.path, LEASE_LOCK_FILE), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                current = self._read()
+                if current and current.get('holder') == self.node_id:
+                    # Keep the record (e.g. next_fetch) for the successor, just expire it
+                    current['expires'] = time.time()
+                    self._write(current)
+            self._expires = 0.0
+            logger.info("Released leader lease")
+        except Exception as e:
+            logger.error(f"Error releasing leader lease: {e}")
+
+
+class FetchHistory:
+    """
+    Ring buffer of compact records of the most recent fetch cycles.
+
+    Records are added in memory and saved at most every save_interval
+    seconds (call save_if_due() periodically and save() on shutdown), so
+    the history survives restarts without a write per cycle.
+    """
+
+    def __init__(self, filepath: str = FETCH_HISTORY_FILE, size: int = DEFAULT_FETCH_HISTORY_SIZE,
+                 save_interval: float = FETCH_HISTORY_SAVE_INTERVAL):
+        """Initialize the history, loading saved records."""
+        self.filepath = filepath
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._entries = deque(self._load(), maxlen=size)
+        self._dirty = False
+        self._saved = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        """Most records kept."""
+        return self._entries.maxlen
+
+    def _load(self) -> List[Dict]:
+        """Load saved records, oldest first."""
+        try:
+            if os.path.exists(self.filepath):
+                with open(self.filepath, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading fetch history: {e}")
+        return []
+
+    @staticmethod
+    def entry(report: Dict) -> Dict:
+        """Compact record of a FetchCycle report, with durations summed per phase."""
+        phases = {}
+        for phase in report['completed_phases']:
+            phases[phase['phase']] = round(phases.get(phase['phase'], 0) + phase['seconds'], 3)
+        interrupted = report.get('interrupted_phase')
+        return {
+            'trigger': report['trigger'],
+            'started': report['started'],
+            'seconds': report['seconds'],
+            'outcome': report['outcome'],
+            'phases': phases,
+            'interrupted_phase': interrupted['phase'] if interrupted else None,
+            'bytes': report['bytes'],
+            'rows': report['rows'],
+            'meters_updated': len(report['meters_completed'])
+        }
+
+    def record(self, report: Dict):
+        """Add a cycle's report to the history."""
+        with self._lock:
+            self._entries.append(self.entry(report))
+            self._dirty = True
+        self.save_if_due()
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict]:
+        """Records, newest first; at most limit of them if limit is positive."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit and limit > 0 else entries
+
+    def save_if_due(self):
+        """Save if records were added and save_interval has passed since the last save."""
+        if self._dirty and time.monotonic() - self._saved >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Save the records now, if any were added since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = list(self._entries)
+            self._dirty = False
+            self._saved = time.monotonic()
+        try:
+            tmp_path = f"{self.filepath}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.filepath)
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error saving fetch history: {e}")
+
+
 def fetch_and_update_meters(client: WAZNieplitzClient, ha_api: HomeAssistantAPI,
                             config: Dict,
-                            historical_manager: Optional[HistoricalReadingsManager] = None) -> bool:
+                            historical_manager: Optional[HistoricalReadingsManager] = None,
+                            meter_registry: Optional[Dict[str, Dict]] = None,
+                            trigger: str = 'scheduled') -> bool:
     """
     Fetch meter readings and update Home Assistant sensors.
-    Only creates sensors for meters configured in main_meter_number or garden_meter_number.
+    Only creates sensors for meters registered in the meter registry.
+    Progress is published to the web interface as fetch_phase, fetch_complete
+    and fetch_error events.
+    The whole cycle is bounded by fetch_cycle_timeout; its report (outcome,
+    completed phases and meters) is kept in app_state['last_cycle'] and
+    added to app_state['fetch_history'].
     Returns True if successful, False otherwise.
     """
+    cycle = FetchCycle(config.get('fetch_cycle_timeout', DEFAULT_FETCH_CYCLE_TIMEOUT), trigger)
+    cycle.start()
+    outcome = 'failed'
     try:
         # Login to portal
-        if not client.login():
+        cycle.enter('login')
+        if not client.login(cycle):
             logger.error("Failed to login to portal")
+            events.publish('fetch_error', {'message': 'Failed to login to portal'})
             return False
 
         # Fetch meter readings
-        meters = client.get_meter_readings()
+        cycle.enter('parse')
+        meters = client.get_meter_readings(cycle)
 
         if not meters:
             logger.warning("No meter readings found")
+            events.publish('fetch_error', {'message': 'No meter readings found'})
             return False
 
-        # Get configured meter numbers
-        main_meter_number = config.get('main_meter_number', '').strip()
-        garden_meter_number = config.get('garden_meter_number', '').strip()
-        main_meter_name = config.get('main_meter_name', 'Main')
-        garden_meter_name = config.get('garden_meter_name', 'Garden')
+        if meter_registry is None:
+            meter_registry = build_meter_registry(config)
 
         # Track which configured meters were found
-        found_main = False
-        found_garden = False
+        found_meters = set()
 
         # Update Home Assistant sensors
         for meter in meters:
-            meter_type = identify_meter_type(meter['meter_number'], config)
+            definition = meter_registry.get(meter['meter_number'])
 
             # Skip unconfigured meters
-            if meter_type == 'unknown':
+            if definition is None:
                 logger.info(f"Skipping unconfigured meter: {meter['meter_number']}")
                 continue
 
-            if meter_type == 'main':
-                entity_id = 'sensor.waz_nieplitz_water_main'
-                friendly_name = main_meter_name
-                found_main = True
-            elif meter_type == 'garden':
-                entity_id = 'sensor.waz_nieplitz_water_garden'
-                friendly_name = garden_meter_name
-                found_garden = True
-            else:
-                continue  # Should not reach here, but skip just in case
+            entity_id = definition['entity_id']
+            friendly_name = definition['name']
+            found_meters.add(meter['meter_number'])
 
             # Prepare attributes
             attributes = {
@@ -715,36 +3082,28 @@ def fetch_and_update_meters(client: WAZNieplitzClient, ha_api: HomeAssistantAPI,
                 attributes['portal_readings_count'] = len(sorted_readings)
                 logger.info(f"Meter {meter['meter_number']}: {len(sorted_readings)} portal reading(s)")
 
+            # Take one snapshot of the historical readings for this meter, so the
+            # attributes, the sensor state and the statistics all use the same version
+            historical_readings = historical_manager.get_readings(meter['meter_number']) if historical_manager else ()
+
             # Add historical readings to attributes
-            if historical_manager:
-                historical_readings = historical_manager.get_readings(meter['meter_number'])
-                if historical_readings:
-                    attributes['historical_readings'] = historical_readings
-                    attributes['historical_count'] = len(historical_readings)
-                    logger.info(f"Meter {meter['meter_number']}: {len(historical_readings)} historical reading(s)")
+            if historical_readings:
+                attributes['historical_readings'] = historical_readings
+                attributes['historical_count'] = len(historical_readings)
+                logger.info(f"Meter {meter['meter_number']}: {len(historical_readings)} historical reading(s)")
 
             # Determine the most recent reading from ALL sources (portal + historical)
             # This ensures manual/historical readings can update the current sensor state
             current_reading = meter['reading']  # Start with portal reading
 
-            # Collect all readings with dates
-            all_readings_with_dates = []
-
-            # Add portal readings
-            if 'portal_readings' in meter and meter['portal_readings']:
-                all_readings_with_dates.extend(meter['portal_readings'])
-
-            # Add historical readings
-            if historical_manager:
-                historical_readings = historical_manager.get_readings(meter['meter_number'])
-                if historical_readings:
-                    all_readings_with_dates.extend(historical_readings)
+            # Collect all readings with dates (portal + historical)
+            all_readings = list(meter.get('portal_readings') or []) + list(historical_readings)
 
             # Find most recent reading
-            if all_readings_with_dates:
+            if all_readings:
                 sorted_all = sorted(
-                    all_readings_with_dates,
-                    key=lambda x: x.get('date', ''),
+                    all_readings,
+                    key=lambda x: x.get('date') or '',
                     reverse=True
                 )
                 if sorted_all and sorted_all[0].get('reading') is not None:
@@ -752,99 +3111,537 @@ def fetch_and_update_meters(client: WAZNieplitzClient, ha_api: HomeAssistantAPI,
                     logger.info(f"Using most recent reading from {sorted_all[0].get('reading_type', 'unknown')}: {current_reading} (date: {sorted_all[0].get('date')})")
 
             # Update sensor
+            cycle.enter('sensor_push', meter['meter_number'])
             logger.info(f"Updating {entity_id} with state={current_reading} (type: {type(current_reading).__name__})")
-            ha_api.update_sensor(entity_id, current_reading, attributes)
+            ha_api.update_sensor(entity_id, current_reading, attributes, cycle=cycle)
 
             # Import statistics for Energy Dashboard historical graphs
-            all_readings = []
-
-            # Add portal readings
-            if 'portal_readings' in meter and meter['portal_readings']:
-                all_readings.extend(meter['portal_readings'])
-
-            # Add historical readings
-            if historical_manager:
-                historical_readings = historical_manager.get_readings(meter['meter_number'])
-                if historical_readings:
-                    all_readings.extend(historical_readings)
-
             # Import statistics if we have readings
             if all_readings:
+                cycle.enter('statistics', meter['meter_number'])
                 logger.info(f"Importing {len(all_readings)} statistics for {entity_id}")
-                ha_api.import_statistics(entity_id, friendly_name, all_readings)
+                ha_api.import_statistics(entity_id, friendly_name, all_readings, cycle)
 
-        # Warn if configured meters were not found
-        if main_meter_number and not found_main:
-            logger.warning(f"Configured main meter '{main_meter_number}' not found in portal readings")
-        if garden_meter_number and not found_garden:
-            logger.warning(f"Configured garden meter '{garden_meter_number}' not found in portal readings")
+            cycle.meter_done(meter['meter_number'])
 
+        # Warn if configured meters were not found
+        for meter_number, definition in meter_registry.items():
+            if meter_number not in found_meters:
+                logger.warning(f"Configured meter '{meter_number}' ({definition['name']}) not found in portal readings")
+
+        save_portal_readings({meter['meter_number']: meter.get('portal_readings') or [] for meter in meters},
+                             app_state['portal_readings_file'])
+        if app_state.get('aggregates') is not None:
+            for meter in meters:
+                app_state['aggregates'].set_portal_readings(meter['meter_number'], meter.get('portal_readings') or [])
+
+        app_state['last_fetch'] = datetime.now().isoformat()
+        events.publish('fetch_complete', {
+            'last_fetch': app_state['last_fetch'],
+            'meters_updated': sorted(found_meters)
+        })
+        outcome = 'success'
         return True
 
+    except FetchDeadlineExceeded as e:
+        outcome = 'timeout'
+        logger.error(f"{e}; meters completed: {', '.join(cycle.meters_completed) or 'none'}")
+        events.publish('fetch_error', {'message': str(e), 'meters_completed': cycle.meters_completed})
+        return False
+
     except Exception as e:
         logger.error(f"Error during fetch and update: {e}")
+        events.publish('fetch_error', {'message': str(e)})
         return False
 
+    finally:
+        cycle.finish(outcome)
+        app_state['last_cycle'] = cycle.report()
+        if app_state.get('fetch_history') is not None:
+            app_state['fetch_history'].record(app_state['last_cycle'])
 
-def process_historical_command(historical_manager: HistoricalReadingsManager):
-    """Process historical reading commands from file."""
-    command_file = "/data/historical_command.json"
 
-    try:
-        if not os.path.exists(command_file):
-            return
+def _command_list(data) -> List[Dict]:
+    """Commands of a parsed command file: one command, a list, or {"commands": [...]}."""
+    if isinstance(data, dict):
+        data = data.get('commands', [data])
+    if not isinstance(data, list) or not all(isinstance(command, dict) for command in data):
+        raise ValueError("Expected a command object, a list of commands or {\"commands\": [...]}")
+    return data
 
-        with open(command_file, 'r') as f:
-            command = json.load(f)
 
-        action = command.get('action')
+def _read_command_file(path: str) -> List[Dict]:
+    """Read the commands of a spool file."""
+    with open(path, 'r') as f:
+        return _command_list(json.load(f))
 
-        if action == 'add':
-            meter_number = command.get('meter_number')
-            date = command.get('date')
-            reading = command.get('reading')
-            consumption = command.get('consumption')
-            reading_type = command.get('reading_type', 'Manual Entry')
 
-            if meter_number and date and reading is not None:
-                success = historical_manager.add_reading(
-                    meter_number, date, reading, consumption, reading_type
-                )
-                logger.info(f"Historical reading add {'succeeded' if success else 'failed'}")
-            else:
-                logger.error("Missing required fields for add command")
+def _dead_letter(path: str, failed_dir: str, commands: List[Dict], errors: List[str]):
+    """Move failed commands with their errors to the dead-letter directory."""
+    os.makedirs(failed_dir, exist_ok=True)
+    name = os.path.basename(path)
+    target = os.path.join(failed_dir, name)
+    if os.path.exists(target):
+        target = os.path.join(failed_dir, f"{time.time_ns()}-{name}")
+
+    with open(target, 'w') as f:
+        json.dump({'commands': commands, 'errors': errors}, f, indent=2)
+    os.remove(path)
+    logger.warning(f"Moved {len(commands)} failed historical command(s) to {target}")
+
+
+def process_historical_commands(historical_manager: HistoricalReadingsManager,
+                                spool_dir: str = HISTORICAL_COMMAND_DIR,
+                                legacy_file: str = HISTORICAL_COMMAND_FILE) -> int:
+    """
+    Apply all pending historical reading command files as one batch.
 
-        elif action == 'delete':
-            meter_number = command.get('meter_number')
-            date = command.get('date')
+    Producers write a file to spool_dir under a temporary name and rename it to
+    *.json when complete. Files are processed oldest first and removed once
+    applied; commands that fail are moved with their errors to spool_dir/failed.
+    The single legacy_file is still accepted and processed first.
 
-            if meter_number and date:
-                success = historical_manager.delete_reading(meter_number, date)
-                logger.info(f"Historical reading delete {'succeeded' if success else 'failed'}")
+    Returns:
+        Number of commands applied
+    """
+    paths = []
+    if os.path.exists(legacy_file):
+        paths.append(legacy_file)
+    try:
+        spooled = [entry for entry in os.scandir(spool_dir) if entry.is_file() and entry.name.endswith('.json')]
+        paths.extend(entry.path for entry in sorted(spooled, key=lambda e: (e.stat().st_mtime_ns, e.name)))
+    except FileNotFoundError:
+        pass
+
+    if not paths:
+        return 0
+
+    failed_dir = os.path.join(spool_dir, 'failed')
+    batch = []
+    origins = []
+    for path in paths:
+        try:
+            commands = _read_command_file(path)
+        except Exception as e:
+            logger.error(f"Error reading historical command file {path}: {e}")
+            try:
+                os.makedirs(failed_dir, exist_ok=True)
+                os.replace(path, os.path.join(failed_dir, f"{time.time_ns()}-{os.path.basename(path)}"))
+            except OSError as move_error:
+                logger.error(f"Could not move {path} to {failed_dir}: {move_error}")
+            continue
+        batch.extend(commands)
+        origins.append((path, commands))
+
+    results = historical_manager.apply_batch(batch)
+    logger.info(f"Processed {len(batch)} historical command(s) from {len(origins)} file(s), "
+                f"{results.count(None)} applied")
+
+    offset = 0
+    for path, commands in origins:
+        errors = results[offset:offset + len(commands)]
+        offset += len(commands)
+        try:
+            failed = [(command, error) for command, error in zip(commands, errors) if error is not None]
+            if failed:
+                for command, error in failed:
+                    logger.error(f"Historical command {command} failed: {error}")
+                _dead_letter(path, failed_dir, [c for c, _ in failed], [e for _, e in failed])
             else:
-                logger.error("Missing required fields for delete command")
+                os.remove(path)
+        except OSError as e:
+            logger.error(f"Error removing historical command file {path}: {e}")
 
-        # Remove command file after processing
-        os.remove(command_file)
-        logger.info("Historical command processed and file removed")
+    return results.count(None)
 
+
+def load_portal_readings(filepath: str = PORTAL_READINGS_FILE) -> Dict[str, List[Dict]]:
+    """Load the portal readings saved by the last successful fetch."""
+    try:
+        if os.path.exists(filepath):
+            with open(filepath, 'r') as f:
+                return json.load(f)
     except Exception as e:
-        logger.error(f"Error processing historical command: {e}")
-        # Try to remove file even on error
-        try:
-            if os.path.exists(command_file):
-                os.remove(command_file)
-        except:
-            pass
+        logger.error(f"Error loading portal readings: {e}")
+    return {}
+
+
+def save_portal_readings(portal_readings: Dict[str, List[Dict]], filepath: str = PORTAL_READINGS_FILE) -> bool:
+    """Save portal readings per meter, so they can be exported without a fetch."""
+    try:
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(portal_readings, f)
+        os.replace(tmp_path, filepath)
+        return True
+    except Exception as e:
+        logger.error(f"Error saving portal readings: {e}")
+        return False
+
+
+def iter_timeline(meter_number: str, portal_readings, historical_readings,
+                  start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Yield the merged portal and manual readings of one meter in date order.
+
+    Args:
+        meter_number: Meter the readings belong to
+        portal_readings: Portal readings of the meter
+        historical_readings: Manual readings of the meter, sorted by date
+        start: First day to include (YYYY-MM-DD), or None
+        end: Last day to include (YYYY-MM-DD), or None
+    """
+    def tagged(readings, source):
+        for reading in readings:
+            if reading.get('date'):
+                yield {
+                    'meter_number': meter_number,
+                    'date': reading['date'],
+                    'reading': reading.get('reading'),
+                    'consumption': reading.get('consumption'),
+                    'reading_type': reading.get('reading_type'),
+                    'source': source
+                }
+
+    portal = sorted((r for r in portal_readings if r.get('date')), key=lambda x: x['date'])
+    for row in heapq.merge(tagged(portal, 'portal'), tagged(historical_readings, 'manual'),
+                           key=lambda x: x['date']):
+        day = row['date'][:10]
+        if start and day < start:
+            continue
+        if end and day > end:
+            break
+        yield row
+
+
+def iter_export(rows, fmt: str = 'csv'):
+    """
+    Encode rows as CSV or NDJSON text, yielding chunks of about EXPORT_CHUNK_SIZE characters.
+
+    Args:
+        rows: Iterable of reading dicts with the EXPORT_FIELDS keys
+        fmt: 'csv' or 'ndjson'
+    """
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, EXPORT_FIELDS, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write('\n')
+
+    for row in rows:
+        write(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of text chunks as it is produced."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_rows(meter_numbers: List[str], historical_manager: HistoricalReadingsManager,
+                portal_readings: Dict[str, List[Dict]], start: Optional[str] = None, end: Optional[str] = None):
+    """Chain the merged timelines of the given meters."""
+    return itertools.chain.from_iterable(
+        iter_timeline(meter_number, portal_readings.get(meter_number, []),
+                      historical_manager.get_readings(meter_number), start, end)
+        for meter_number in meter_numbers
+    )
+
+
+def export_meter_numbers(historical_manager: HistoricalReadingsManager, portal_readings: Dict[str, List[Dict]],
+                         meter_registry: Optional[Dict[str, Dict]] = None) -> List[str]:
+    """Every meter with readings or a sensor, sorted."""
+    return sorted(set(meter_registry or {}) | set(historical_manager.get_summary()) | set(portal_readings))
+
+
+def export_command(argv: List[str]) -> int:
+    """Command line export: python3 run.py export [--format csv|ndjson] [--meter N] [--from D] [--to D]."""
+    parser = argparse.ArgumentParser(prog='run.py export',
+                                     description='Export merged portal and manual readings')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--meter', action='append', help='Meter number (repeatable, default: all)')
+    parser.add_argument('--from', dest='start', help='First day to export (YYYY-MM-DD or DD.MM.YYYY)')
+    parser.add_argument('--to', dest='end', help='Last day to export (YYYY-MM-DD or DD.MM.YYYY)')
+    parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+    parser.add_argument('--output', default='-', help='Output file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    try:
+        start = parse_manual_date(args.start).date().isoformat() if args.start else None
+        end = parse_manual_date(args.end).date().isoformat() if args.end else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    paths = shared_data_paths(load_config().get('coordination_path'))
+    historical_manager = HistoricalReadingsManager(paths['historical'], migrate_legacy=False)
+    portal_readings = load_portal_readings(paths['portal_readings'])
+    meter_numbers = args.meter or export_meter_numbers(historical_manager, portal_readings)
+
+    chunks = iter_export(export_rows(meter_numbers, historical_manager, portal_readings, start, end), args.format)
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for data in (gzip_chunks(chunks) if args.gzip else (c.encode('utf-8') for c in chunks)):
+            output.write(data)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    return 0
+
+
+def _open_import_file(path: str):
+    """Open a file to import as text; '-' is stdin, *.gz is decompressed."""
+    if path == '-':
+        return nullcontext(sys.stdin)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_import_commands(f, fmt: str, include_portal: bool = False) -> List[Dict]:
+    """
+    Read readings to import as historical add commands.
+
+    Args:
+        f: Text file to read
+        fmt: 'csv' or 'ndjson' (as written by export, portal rows skipped unless
+            include_portal), or 'json' (historical command file format)
+        include_portal: Also import rows whose source is the portal
+
+    Returns:
+        Commands for HistoricalReadingsManager.apply_batch()
+    """
+    if fmt == 'json':
+        return [dict(command, action=command.get('action', 'add')) for command in _command_list(json.load(f))]
+
+    rows = csv.DictReader(f) if fmt == 'csv' else (json.loads(line) for line in f if line.strip())
+    commands = []
+    for row in rows:
+        if row.get('source') == 'portal' and not include_portal:
+            continue
+        consumption = row.get('consumption')
+        commands.append({
+            'action': 'add',
+            'meter_number': str(row.get('meter_number') or ''),
+            'date': (row.get('date') or '')[:10],
+            'reading': float(row['reading']) if row.get('reading') not in (None, '') else None,
+            'consumption': float(consumption) if consumption not in (None, '') else None,
+            'reading_type': row.get('reading_type') or 'Manual Entry'
+        })
+    return commands
+
+
+def import_command(argv: List[str]) -> int:
+    """Command line import: python3 run.py import FILE [--format csv|ndjson|json] [--include-portal]."""
+    parser = argparse.ArgumentParser(prog='run.py import',
+                                     description='Import readings into the historical store with a single write')
+    parser.add_argument('file', help='File to import: an export (CSV or NDJSON, may be gzipped), '
+                                     'a historical command file, or - for stdin')
+    parser.add_argument('--format', choices=['csv', 'ndjson', 'json'],
+                        help='Input format (default: from the file name, csv for stdin)')
+    parser.add_argument('--include-portal', action='store_true',
+                        help='Also import rows exported from the portal as manual readings')
+    args = parser.parse_args(argv)
+
+    name = args.file[:-len('.gz')] if args.file.endswith('.gz') else args.file
+    fmt = args.format or ('ndjson' if name.endswith(('.ndjson', '.jsonl')) else
+                          'json' if name.endswith('.json') else 'csv')
+    try:
+        with _open_import_file(args.file) as f:
+            commands = read_import_commands(f, fmt, args.include_portal)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not read {args.file}: {e}", file=sys.stderr)
+        return 1
+
+    paths = shared_data_paths(load_config().get('coordination_path'))
+    historical_manager = HistoricalReadingsManager(paths['historical'])
+    results = historical_manager.apply_batch(commands)
+    for command, error in zip(commands, results):
+        if error is not None:
+            print(f"Skipped {command}: {error}", file=sys.stderr)
+
+    applied = results.count(None)
+    meters = len({command['meter_number'] for command, error in zip(commands, results) if error is None})
+    print(f"Imported {applied} of {len(commands)} reading(s) for {meters} meter(s)")
+    return 0 if applied == len(commands) else 1
+
+
+def reimport_stats_command(argv: List[str]) -> int:
+    """Command line statistics re-import: python3 run.py reimport-stats [--meter N]."""
+    parser = argparse.ArgumentParser(prog='run.py reimport-stats',
+                                     description='Send the statistics of all stored readings to Home Assistant again')
+    parser.add_argument('--meter', action='append', help='Meter number (repeatable, default: all configured)')
+    args = parser.parse_args(argv)
+
+    if not SUPERVISOR_TOKEN:
+        print("SUPERVISOR_TOKEN is not set; run this inside the add-on container", file=sys.stderr)
+        return 1
+
+    config = load_config()
+    meter_registry = build_meter_registry(config)
+    paths = shared_data_paths(config.get('coordination_path'))
+    historical_manager = HistoricalReadingsManager(paths['historical'], migrate_legacy=False)
+    portal_readings = load_portal_readings(paths['portal_readings'])
+    # Without an outbound queue, a failed import is reported instead of queued
+    ha_api = HomeAssistantAPI()
+
+    failed = 0
+    meter_numbers = args.meter or list(meter_registry)
+    for meter_number in meter_numbers:
+        definition = meter_registry.get(meter_number)
+        if definition is None:
+            print(f"Meter {meter_number} is not configured", file=sys.stderr)
+            failed += 1
+            continue
+
+        readings = list(portal_readings.get(meter_number, [])) + list(historical_manager.get_readings(meter_number))
+        if not readings:
+            print(f"{definition['entity_id']}: no readings")
+            continue
+        if ha_api.import_statistics(definition['entity_id'], definition['name'], readings):
+            print(f"{definition['entity_id']}: {len(readings)} reading(s) imported")
+        else:
+            print(f"{definition['entity_id']}: import failed", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+
+def compact_command(argv: List[str]) -> int:
+    """Command line compaction: python3 run.py compact."""
+    parser = argparse.ArgumentParser(prog='run.py compact',
+                                     description='Migrate and rewrite the historical store from its shards')
+    parser.parse_args(argv)
+
+    paths = shared_data_paths(load_config().get('coordination_path'))
+    historical_manager = HistoricalReadingsManager(paths['historical'])
+    result = historical_manager.compact()
+    print(f"Compacted {result['readings']} reading(s) of {result['meters']} meter(s): "
+          f"{result['dropped']} duplicate or undated entries dropped, "
+          f"{result['removed_files']} temporary file(s) removed")
+    return 0
+
+
+def verify_command(argv: List[str]) -> int:
+    """Command line consistency check: python3 run.py verify."""
+    parser = argparse.ArgumentParser(prog='run.py verify',
+                                     description='Check the historical store without changing it')
+    parser.parse_args(argv)
+
+    paths = shared_data_paths(load_config().get('coordination_path'))
+    historical_manager = HistoricalReadingsManager(paths['historical'], migrate_legacy=False)
+    problems = historical_manager.verify()
+    if os.path.exists(paths['historical']):
+        print(f"Note: {paths['historical']} has not been migrated yet (run compact)")
+    for problem in problems:
+        print(problem)
+
+    summary = historical_manager.get_summary()
+    print(f"{sum(m['count'] for m in summary.values())} reading(s) of {len(summary)} meter(s), "
+          f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+# Maintenance commands run without the web server or the fetch loop: python3 run.py COMMAND --help
+COMMANDS = {
+    'export': export_command,
+    'import': import_command,
+    'reimport-stats': reimport_stats_command,
+    'compact': compact_command,
+    'verify': verify_command
+}
+
+
+def route(rule: str, **options):
+    """Register a view function to be added to the Flask app by create_app()."""
+    def decorator(func):
+        _routes.append((rule, func, options))
+        return func
+    return decorator
+
+
+def load_index_asset() -> Optional[Dict]:
+    """
+    Load index.html and precompress it for serving.
+
+    Returns:
+        Dict with 'body', 'gzip_body' and their 'etag' / 'gzip_etag', or None if the file is missing
+    """
+    try:
+        with open(INDEX_HTML_FILE, 'rb') as f:
+            body = f.read()
+    except OSError as e:
+        logger.error(f"Could not load web interface from {INDEX_HTML_FILE}: {e}")
+        return None
+
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+    logger.info(f"Web interface loaded: {len(body)} bytes, {len(gzip_body)} bytes gzipped")
+    return {
+        'body': body,
+        'etag': digest,
+        'gzip_body': gzip_body,
+        'gzip_etag': f"{digest}-gz"
+    }
+
+
+def compress_response(response):
+    """Gzip JSON responses above GZIP_MIN_SIZE when the client accepts it."""
+    from flask import request
+
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings.quality('gzip') <= 0:
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def create_app():
+    """Create the Flask app on first use, so Flask is only imported when serving."""
+    global app
+    if app is None:
+        from flask import Flask
+
+        app = Flask(__name__)
+        app.logger.setLevel(logging.ERROR)  # Suppress Flask logging
+        for rule, view_func, options in _routes:
+            app.add_url_rule(rule, view_func=view_func, **options)
+        app.after_request(compress_response)
+        app_state['index_asset'] = load_index_asset()
+    return app
 
 
 # Flask routes
-@app.route('/')
+@route('/')
 def index():
-    """Serve the main page."""
-    try:
-        return send_file('/index.html')
-    except:
+    """Serve the main page (precompressed, revalidated via ETag)."""
+    from flask import Response, request
+
+    asset = app_state.get('index_asset')
+    if asset is None:
         return """
         <!DOCTYPE html>
         <html><body style="font-family: sans-serif; padding: 20px;">
@@ -853,30 +3650,92 @@ def index():
         </body></html>
         """, 404
 
+    use_gzip = request.accept_encodings.quality('gzip') > 0
+    etag = asset['gzip_etag'] if use_gzip else asset['etag']
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset['gzip_body'] if use_gzip else asset['body'], mimetype='text/html')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+
+    response.set_etag(etag)
+    # Always revalidate: the page changes with add-on updates, and a 304 costs only headers
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
 
-@app.route('/fetch', methods=['POST'])
+def standby_rejection():
+    """409 response to a change requested from a standby instance, None on the active instance."""
+    from flask import jsonify
+
+    lease = app_state.get('lease')
+    if lease is None or lease.is_leader:
+        return None
+    return jsonify({
+        'success': False,
+        'message': f"This is a standby instance, use the active one ({(lease.lease or {}).get('holder', 'unknown')})"
+    }), 409
+
+
+@route('/fetch', methods=['POST'])
 def fetch():
-    """Trigger manual fetch."""
+    """
+    Trigger manual fetch.
+
+    The fetch runs in the background and reports progress on /events;
+    pass ?wait=1 to block until it has finished.
+    """
+    from flask import jsonify, request
+
+    rejection = standby_rejection()
+    if rejection:
+        return rejection
+
     try:
-        if app_state['fetch_callback']:
-            # Trigger manual fetch
-            success = app_state['fetch_callback']()
+        callback = app_state['fetch_callback']
+        if not callback:
+            return jsonify({
+                'success': False,
+                'message': 'Fetch callback not initialized'
+            }), 500
+
+        # Only one fetch at a time, so slow fetches occupy at most one web worker
+        if not fetch_lock.acquire(blocking=False):
+            return jsonify({
+                'success': False,
+                'message': 'A fetch is already in progress'
+            }), 409
+
+        if request.args.get('wait'):
+            try:
+                success = callback(trigger='web')
+            finally:
+                fetch_lock.release()
+
             if success:
-                app_state['last_fetch'] = datetime.now().isoformat()
                 return jsonify({
                     'success': True,
                     'message': 'Readings fetched successfully'
                 })
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': 'Failed to fetch readings. Check add-on logs for details.'
-                }), 500
-        else:
             return jsonify({
                 'success': False,
-                'message': 'Fetch callback not initialized'
+                'message': 'Failed to fetch readings. Check add-on logs for details.'
             }), 500
+
+        def run_fetch():
+            try:
+                callback(trigger='web')
+            finally:
+                fetch_lock.release()
+
+        threading.Thread(target=run_fetch, name='web-fetch', daemon=True).start()
+        return jsonify({
+            'success': True,
+            'message': 'Fetch started'
+        }), 202
     except Exception as e:
         logger.error(f"Error in fetch route: {e}")
         return jsonify({
@@ -885,17 +3744,147 @@ def fetch():
         }), 500
 
 
-@app.route('/status')
+@route('/fetch/history')
+def get_fetch_history():
+    """Records of recent fetch cycles, newest first (?limit=N)."""
+    from flask import jsonify, request
+
+    history = app_state.get('fetch_history')
+    if history is None:
+        return jsonify({'size': 0, 'entries': []})
+
+    try:
+        limit = int(request.args.get('limit', 0))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'limit must be a number'
+        }), 400
+    if limit < 0:
+        return jsonify({
+            'success': False,
+            'message': 'limit must not be negative'
+        }), 400
+
+    return jsonify({'size': history.size, 'entries': history.entries(limit)})
+
+
+@route('/events')
+def event_stream():
+    """Stream fetch progress and historical changes as server-sent events."""
+    from flask import Response, jsonify, request
+
+    # Each stream holds a web worker, so keep at least half of them for other requests
+    server = app_state.get('web_server')
+    max_streams = max(1, server.workers // 2) if server is not None else 1
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+
+    # Checked and registered under the broker's lock, so concurrent requests cannot exceed the cap
+    subscriber = events.subscribe(last_event_id, max_subscribers=max_streams)
+    if subscriber is None:
+        return jsonify({
+            'success': False,
+            'message': 'Too many event streams'
+        }), 503
+
+    def generate():
+        yield f"retry: {EVENT_RETRY_MS}\n\n"
+        # Streams end after a while; the browser reconnects with Last-Event-ID
+        closes_at = time.monotonic() + EVENT_STREAM_LIFETIME
+        while time.monotonic() < closes_at:
+            try:
+                event_id, event, data = subscriber.get(timeout=EVENT_HEARTBEAT)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(lambda: events.unsubscribe(subscriber))
+    return response
+
+
+@route('/status')
 def status():
     """Get current status."""
-    return jsonify({
-        'last_fetch': app_state.get('last_fetch')
-    })
+    from flask import jsonify
+
+    result = {
+        'fetching': fetch_lock.locked(),
+        'last_fetch': app_state.get('last_fetch'),
+        'next_fetch': datetime.fromtimestamp(app_state['next_fetch']).isoformat()
+        if app_state.get('next_fetch') else None
+    }
+
+    historical_manager = app_state.get('historical_manager')
+    if historical_manager is not None:
+        result['historical'] = {
+            'edits': historical_manager.stats['edits'],
+            'writes': historical_manager.stats['writes'],
+            'pending': historical_manager.pending_edits,
+            'meters': len(historical_manager.get_summary()),
+            'resident': historical_manager.resident_meters,
+            'loads': historical_manager.stats['loads'],
+            'evictions': historical_manager.stats['evictions']
+        }
+
+    result['portal'] = {
+        key: round(value, 3) if isinstance(value, float) else value
+        for key, value in portal_rate_limiter.stats.items()
+    }
+
+    if app_state.get('last_cycle'):
+        result['last_cycle'] = app_state['last_cycle']
+
+    lease = app_state.get('lease')
+    if lease is not None:
+        leader = lease.lease or {}
+        result['coordination'] = {
+            'role': 'active' if lease.is_leader else 'standby',
+            'node': lease.node_id,
+            'leader': leader.get('holder'),
+            'lease_expires': datetime.fromtimestamp(leader['expires']).isoformat() if leader.get('expires') else None,
+            **lease.stats
+        }
+        if not lease.is_leader:
+            # The active instance's schedule, as published with its lease
+            result['last_fetch'] = leader.get('last_fetch')
+            result['next_fetch'] = datetime.fromtimestamp(leader['next_fetch']).isoformat() \
+                if leader.get('next_fetch') else None
+
+    ha_api = app_state.get('ha_api')
+    if ha_api is not None:
+        result['sensors'] = dict(ha_api.stats)
+        if ha_api.outbound is not None:
+            oldest_age = ha_api.outbound.oldest_age
+            result['outbound'] = {
+                'depth': ha_api.outbound.depth,
+                'oldest_age': round(oldest_age) if oldest_age is not None else None,
+                **ha_api.outbound.stats
+            }
+
+    server = app_state.get('web_server')
+    if server is not None:
+        result['web'] = {
+            'workers': server.workers,
+            'queued': server.pending.qsize(),
+            'rejected': server.rejected
+        }
+
+    return jsonify(result)
 
 
-@app.route('/config')
+@route('/config')
 def get_config():
     """Get configuration for meter numbers and names."""
+    from flask import jsonify
+
     try:
         config = app_state.get('config')
 
@@ -904,14 +3893,19 @@ def get_config():
             logger.warning("Config not in app_state, loading directly")
             config = load_config()
 
+        meter_registry = app_state.get('meter_registry')
+        if meter_registry is None:
+            meter_registry = build_meter_registry(config)
+
         result = {
             'main_meter_number': config.get('main_meter_number', '').strip(),
             'main_meter_name': config.get('main_meter_name', 'Main'),
             'garden_meter_number': config.get('garden_meter_number', '').strip(),
-            'garden_meter_name': config.get('garden_meter_name', 'Garden')
+            'garden_meter_name': config.get('garden_meter_name', 'Garden'),
+            'meters': list(meter_registry.values())
         }
 
-        logger.info(f"Config route returning: main={result['main_meter_number']}, garden={result['garden_meter_number']}")
+        logger.info(f"Config route returning {len(result['meters'])} meter(s): {', '.join(meter_registry)}")
         return jsonify(result)
     except Exception as e:
         logger.error(f"Error in config route: {e}")
@@ -920,13 +3914,20 @@ def get_config():
             'main_meter_number': '',
             'main_meter_name': 'Main',
             'garden_meter_number': '',
-            'garden_meter_name': 'Garden'
+            'garden_meter_name': 'Garden',
+            'meters': []
         }), 500
 
 
-@app.route('/historical/add', methods=['POST'])
+@route('/historical/add', methods=['POST'])
 def add_historical():
     """Add a historical reading."""
+    from flask import jsonify, request
+
+    rejection = standby_rejection()
+    if rejection:
+        return rejection
+
     try:
         data = request.get_json()
         meter_number = data.get('meter_number')
@@ -956,9 +3957,14 @@ def add_historical():
         )
 
         if success:
+            iso_date = parse_manual_date(date).isoformat()
+            entry = next((r for r in historical_manager.get_readings(meter_number)
+                          if r['date'] == iso_date), None)
             return jsonify({
                 'success': True,
-                'message': 'Historical reading added successfully'
+                'message': 'Historical reading added successfully',
+                'meter_number': meter_number,
+                'entry': entry
             })
         else:
             return jsonify({
@@ -974,9 +3980,15 @@ def add_historical():
         }), 500
 
 
-@app.route('/historical/delete', methods=['POST'])
+@route('/historical/delete', methods=['POST'])
 def delete_historical():
     """Delete a historical reading."""
+    from flask import jsonify, request
+
+    rejection = standby_rejection()
+    if rejection:
+        return rejection
+
     try:
         data = request.get_json()
         meter_number = data.get('meter_number')
@@ -1000,7 +4012,9 @@ def delete_historical():
         if success:
             return jsonify({
                 'success': True,
-                'message': 'Historical reading deleted successfully'
+                'message': 'Historical reading deleted successfully',
+                'meter_number': meter_number,
+                'entry': {'date': parse_manual_date(date).isoformat()}
             })
         else:
             return jsonify({
@@ -1016,11 +4030,44 @@ def delete_historical():
         }), 500
 
 
-@app.route('/historical/list')
+@route('/historical/list')
 def list_historical():
-    """List all historical readings."""
+    """
+    List historical readings.
+
+    Without arguments all readings of all meters are returned. ?summary=1
+    returns only the count and date range per meter; ?meter=N returns one
+    page of that meter's readings in date order (&offset=0&limit=100).
+    """
+    from flask import jsonify, request
+
     try:
         historical_manager = app_state.get('historical_manager')
+        meter_number = request.args.get('meter')
+
+        if request.args.get('summary'):
+            return jsonify({
+                'meters': dict(historical_manager.get_summary()) if historical_manager else {}
+            })
+
+        if meter_number:
+            try:
+                offset = max(0, int(request.args.get('offset', 0)))
+                limit = min(max(1, int(request.args.get('limit', HISTORICAL_PAGE_SIZE))), HISTORICAL_PAGE_SIZE_MAX)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'offset and limit must be numbers'
+                }), 400
+
+            readings = historical_manager.get_readings(meter_number) if historical_manager else ()
+            return jsonify({
+                'meter_number': meter_number,
+                'total': len(readings),
+                'offset': offset,
+                'readings': readings[offset:offset + limit]
+            })
+
         if not historical_manager:
             return jsonify({
                 'readings': {}
@@ -1038,25 +4085,197 @@ def list_historical():
         }), 500
 
 
+@route('/stats')
+def stats():
+    """
+    Consumption and reading counts per meter, by year and month.
+
+    ?meter=N limits the answer to one meter, &year=YYYY and &month=M to one bucket.
+    """
+    from flask import jsonify, request
+
+    aggregates = app_state.get('aggregates')
+    if aggregates is None:
+        return jsonify({'meters': {}})
+
+    meter_number = request.args.get('meter')
+    year = request.args.get('year')
+    month = request.args.get('month')
+    if not meter_number:
+        return jsonify({'meters': {m: aggregates.get(m) for m in aggregates.meters()}})
+
+    if (year is not None and not re.fullmatch(r'\d{4}', year)) or \
+            (month is not None and (year is None or not month.isdigit() or not 1 <= int(month) <= 12)):
+        return jsonify({
+            'success': False,
+            'message': 'year must be YYYY, month 1-12 and only given with a year'
+        }), 400
+    if month is not None:
+        month = f"{int(month):02d}"
+
+    bucket = aggregates.get(meter_number, year, month)
+    if bucket is None:
+        return jsonify({
+            'success': False,
+            'message': f"No readings for meter {meter_number}" + (f" in {year}" if year else '')
+                       + (f"-{month}" if month else '')
+        }), 404
+    return jsonify({'meter_number': meter_number, 'year': year, 'month': month, **bucket})
+
+
+@route('/export')
+def export():
+    """Stream merged portal and manual readings as CSV or NDJSON."""
+    from flask import Response, jsonify, request
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            'success': False,
+            'message': 'format must be csv or ndjson'
+        }), 400
+
+    try:
+        start = parse_manual_date(request.args['from']).date().isoformat() if request.args.get('from') else None
+        end = parse_manual_date(request.args['to']).date().isoformat() if request.args.get('to') else None
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+    historical_manager = app_state.get('historical_manager')
+    if not historical_manager:
+        return jsonify({
+            'success': False,
+            'message': 'Historical manager not initialized'
+        }), 500
+
+    portal_readings = load_portal_readings(app_state['portal_readings_file'])
+    meter_numbers = request.args.getlist('meter') or export_meter_numbers(
+        historical_manager, portal_readings, app_state.get('meter_registry'))
+
+    chunks = iter_export(export_rows(meter_numbers, historical_manager, portal_readings, start, end), fmt)
+    headers = {
+        'Content-Disposition': f'attachment; filename="waz_nieplitz_readings.{fmt}"',
+        'Vary': 'Accept-Encoding'
+    }
+    if request.accept_encodings.quality('gzip') > 0:
+        headers['Content-Encoding'] = 'gzip'
+        body = gzip_chunks(chunks)
+    else:
+        body = (chunk.encode('utf-8') for chunk in chunks)
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+class BoundedPoolMixIn:
+    """
+    socketserver mix-in that handles connections on a fixed pool of worker threads.
+
+    Accepted connections wait in a bounded queue. When the queue is full, or a
+    connection waited longer than the request timeout, the client gets a 503
+    instead of a new thread being spawned.
+    """
+
+    multithread = True
+    workers = DEFAULT_WEB_WORKERS
+    queue_size = DEFAULT_WEB_QUEUE_SIZE
+    request_timeout = DEFAULT_WEB_REQUEST_TIMEOUT
+
+    REJECT_BODY = b'{"success": false, "message": "Server busy, please retry"}'
+    REJECT_RESPONSE = (
+        b"HTTP/1.0 503 Service Unavailable\r\n"
+        b"Content-Type: application/json\r\n"
+        b"Content-Length: " + str(len(REJECT_BODY)).encode() + b"\r\n"
+        b"Retry-After: 1\r\n"
+        b"Connection: close\r\n\r\n" + REJECT_BODY
+    )
+
+    def start_workers(self):
+        """Start the worker threads."""
+        self.pending = queue.Queue(maxsize=self.queue_size)
+        self.rejected = 0
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"web-worker-{i + 1}", daemon=True).start()
+
+    def process_request(self, request, client_address):
+        """Queue an accepted connection for the worker pool, or reject it if the queue is full."""
+        try:
+            self.pending.put_nowait((request, client_address, time.monotonic()))
+        except queue.Full:
+            self._reject(request)
+
+    def _reject(self, request):
+        """Answer a connection with 503 and close it."""
+        self.rejected += 1
+        try:
+            request.settimeout(1)
+            request.sendall(self.REJECT_RESPONSE)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def _work(self):
+        """Worker loop: serve queued connections one at a time."""
+        while True:
+            request, client_address, queued_at = self.pending.get()
+            if time.monotonic() - queued_at > self.request_timeout:
+                self._reject(request)
+                continue
+            try:
+                request.settimeout(self.request_timeout)
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+
+def make_bounded_server(host: str, port: int, wsgi_app, workers: int, queue_size: int,
+                        request_timeout: int):
+    """Create a werkzeug WSGI server that serves requests on a bounded worker pool."""
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        # One request per connection: idle keep-alive connections would pin pool workers
+        protocol_version = "HTTP/1.0"
+
+    class BoundedWSGIServer(BoundedPoolMixIn, BaseWSGIServer):
+        pass
+
+    server = BoundedWSGIServer(host, port, wsgi_app, handler=RequestHandler)
+    server.workers = workers
+    server.queue_size = queue_size
+    server.request_timeout = request_timeout
+    server.start_workers()
+    return server
+
+
 def run_web_server():
     """Run the Flask web server."""
     try:
-        logger.info(f"Starting web server on port {INGRESS_PORT}")
-        # Disable Flask's default logging completely
-        import logging as flask_logging
-        import sys
-        import os
+        config = app_state.get('config') or {}
+        workers = config.get('web_workers', DEFAULT_WEB_WORKERS)
+        queue_size = config.get('web_queue_size', DEFAULT_WEB_QUEUE_SIZE)
+        request_timeout = config.get('web_request_timeout', DEFAULT_WEB_REQUEST_TIMEOUT)
+        logger.info(f"Starting web server on port {INGRESS_PORT} "
+                    f"({workers} workers, queue of {queue_size}, {request_timeout}s timeout)")
 
         # Disable werkzeug logging
-        flask_log = flask_logging.getLogger('werkzeug')
-        flask_log.setLevel(flask_logging.ERROR)
+        flask_log = logging.getLogger('werkzeug')
+        flask_log.setLevel(logging.ERROR)
         flask_log.disabled = True
 
-        # Disable Flask's CLI output by redirecting to devnull during startup
-        cli = sys.modules['flask.cli']
-        cli.show_server_banner = lambda *x: None
-
-        app.run(host='0.0.0.0', port=INGRESS_PORT, debug=False, use_reloader=False, threaded=True)
+        # The server binds its socket on creation, so readiness can be
+        # signalled before the first request is served
+        server = make_bounded_server('0.0.0.0', INGRESS_PORT, create_app(),
+                                     workers, queue_size, request_timeout)
+        app_state['web_server'] = server
+        app_state['web_ready'].set()
+        server.serve_forever()
     except Exception as e:
         logger.error(f"Web server error: {e}")
 
@@ -1076,72 +4295,205 @@ def main():
         logger.error("Username and password must be configured")
         sys.exit(1)
 
-    logger.info(f"Update interval: {update_interval} seconds ({update_interval / 86400:.1f} days)")
+    if config.get('adaptive_schedule', True):
+        logger.info("Adaptive fetch schedule enabled, polling more often when a new reading is expected")
+    else:
+        logger.info(f"Update interval: {update_interval} seconds ({update_interval / 86400:.1f} days)")
+    coordination_path = config.get('coordination_path')
+    paths = shared_data_paths(coordination_path)
+    app_state['portal_readings_file'] = paths['portal_readings']
     logger.info(f"Manual fetch trigger: Create file '{MANUAL_FETCH_TRIGGER}' to trigger immediate update")
-    logger.info(f"Historical readings file: {HISTORICAL_READINGS_FILE}")
-
-    # Initialize clients
-    client = WAZNieplitzClient(username, password)
-    ha_api = HomeAssistantAPI()
-    historical_manager = HistoricalReadingsManager()
-
-    # Set up fetch callback for web interface
-    def fetch_callback():
-        """Callback for web interface manual fetch."""
-        return fetch_and_update_meters(client, ha_api, config, historical_manager)
-
-    app_state['fetch_callback'] = fetch_callback
+    logger.info(f"Historical readings directory: {os.path.splitext(paths['historical'])[0]}")
+
+    meter_registry = build_meter_registry(config)
+    if not meter_registry:
+        logger.warning("No meters configured, no sensors will be created")
+    for definition in meter_registry.values():
+        logger.info(f"Meter {definition['meter_number']} ({definition['name']}) -> {definition['entity_id']}")
+
+    # With a coordination path, the store is only written once this instance is elected
+    historical_manager = HistoricalReadingsManager(
+        paths['historical'],
+        flush_interval=config.get('historical_flush_interval', DEFAULT_HISTORICAL_FLUSH_INTERVAL),
+        flush_threshold=config.get('historical_flush_threshold', DEFAULT_HISTORICAL_FLUSH_THRESHOLD),
+        max_resident_meters=config.get('historical_max_resident_meters', DEFAULT_HISTORICAL_MAX_RESIDENT_METERS),
+        idle_timeout=config.get('historical_idle_timeout', DEFAULT_HISTORICAL_IDLE_TIMEOUT),
+        read_only=bool(coordination_path)
+    )
+    # Persist pending historical edits on exit; SIGTERM (add-on stop) exits via SystemExit
+    atexit.register(historical_manager.close)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app_state['historical_manager'] = historical_manager
     app_state['config'] = config
+    app_state['meter_registry'] = meter_registry
+    aggregates = AggregateIndex()
+    aggregates.build(historical_manager, load_portal_readings(paths['portal_readings']))
+    app_state['aggregates'] = aggregates
+
+    def on_historical_change(action: str, meter_number: str, entry: Dict):
+        """Tell the web interface; the aggregates read the manual totals from the manifest."""
+        events.publish('historical', {'action': action, 'meter_number': meter_number, 'entry': entry})
+
+    historical_manager.on_change = on_historical_change
 
-    # Start web server in background thread
+    def portal_readings_mtime() -> Optional[float]:
+        try:
+            return os.path.getmtime(paths['portal_readings'])
+        except OSError:
+            return None
+
+    aggregates_mtime = portal_readings_mtime()
+
+    def follow_shared_data():
+        """Reload data another instance wrote; the portal aggregates only if the portal readings changed."""
+        nonlocal aggregates_mtime
+        historical_manager.reload()
+        mtime = portal_readings_mtime()
+        if mtime != aggregates_mtime:
+            aggregates_mtime = mtime
+            aggregates.build(historical_manager, load_portal_readings(paths['portal_readings']))
+
+    # Start web server in background thread before the scraping stack is loaded
     web_thread = threading.Thread(target=run_web_server, daemon=True)
     web_thread.start()
-    logger.info("Web interface started")
+    if app_state['web_ready'].wait(WEB_READY_TIMEOUT):
+        logger.info("Web interface started")
+    else:
+        logger.warning(f"Web interface not ready after {WEB_READY_TIMEOUT} seconds, continuing")
 
-    # Perform initial fetch
-    logger.info("Performing initial meter reading fetch...")
-    fetch_and_update_meters(client, ha_api, config, historical_manager)
+    # Initialize clients
+    portal_rate_limiter.configure(
+        config.get('portal_requests_per_minute', DEFAULT_PORTAL_REQUESTS_PER_MINUTE) / 60,
+        config.get('portal_burst', DEFAULT_PORTAL_BURST)
+    )
+    parse_pool = create_parse_pool(config.get('parse_workers', DEFAULT_PARSE_WORKERS))
+    if parse_pool is not None:
+        atexit.register(parse_pool.shutdown, cancel_futures=True)
+    client = WAZNieplitzClient(username, password, streaming=config.get('streaming_parse', True),
+                               parse_pool=parse_pool)
+    ha_api = HomeAssistantAPI(
+        refresh_interval=config.get('state_refresh_interval', DEFAULT_STATE_REFRESH_INTERVAL),
+        outbound=OutboundQueue(),
+        pushed_file=PUSHED_STATES_FILE
+    )
+    ha_api.start_drainer()
+    app_state['ha_api'] = ha_api
+
+    fetch_history = FetchHistory(size=config.get('fetch_history_size', DEFAULT_FETCH_HISTORY_SIZE))
+    atexit.register(fetch_history.save)
+    app_state['fetch_history'] = fetch_history
+
+    scheduler = None
+    if config.get('adaptive_schedule', True):
+        scheduler = FetchScheduler(
+            dense_interval=config.get('fetch_dense_interval', DEFAULT_FETCH_DENSE_INTERVAL),
+            max_interval=config.get('fetch_max_interval', DEFAULT_FETCH_MAX_INTERVAL),
+            window_days=config.get('fetch_window_days', DEFAULT_FETCH_WINDOW_DAYS),
+            fallback_interval=update_interval,
+            filepath=paths['fetch_schedule']
+        )
 
-    # Calculate how many check intervals equal one update interval
-    checks_per_update = update_interval // CHECK_INTERVAL
-    check_counter = 0
+    jitter = config.get('fetch_jitter', DEFAULT_FETCH_JITTER)
+    # Set before fetch_and_schedule is published to the web interface
+    lease = None
+
+    def schedule_next_fetch():
+        """Plan the next scheduled fetch after a successful one."""
+        if scheduler is not None:
+            portal_readings = load_portal_readings(app_state['portal_readings_file'])
+            now = datetime.now()
+            scheduler.observe(portal_readings, now)
+            # The scheduler keeps the jittered interval within max_interval and the reading windows
+            interval = scheduler.next_interval(portal_readings, now, account_jitter(username, 1, jitter))
+        else:
+            interval = update_interval + account_jitter(username, update_interval, jitter)
+        app_state['next_fetch'] = time.time() + interval
+        logger.info(f"Next scheduled fetch in {interval / 86400:.1f} days "
+                    f"({datetime.fromtimestamp(app_state['next_fetch']).isoformat(timespec='minutes')})")
+
+    def fetch_and_schedule(trigger: str = 'scheduled') -> bool:
+        """Fetch and update meters, then plan the next scheduled fetch. Caller holds fetch_lock."""
+        if lease is not None and not lease.is_leader:
+            logger.info("Not fetching, this is a standby instance")
+            return False
+        success = fetch_and_update_meters(client, ha_api, config, historical_manager, meter_registry, trigger)
+        if success:
+            schedule_next_fetch()
+        return success
 
-    last_update_time = time.time()
+    # Set up fetch callback for web interface
+    app_state['fetch_callback'] = fetch_and_schedule
+
+    # Schedule the initial fetch, delayed per account so installations restarting together
+    # (e.g. after a power cut) do not all log in to the portal at the same moment
+    initial_delay = account_jitter(username, INITIAL_FETCH_JITTER_MAX, 1 if jitter > 0 else 0)
+    app_state['next_fetch'] = time.time() + initial_delay
+    logger.info(f"Performing initial meter reading fetch in {initial_delay:.0f} seconds...")
+
+    if coordination_path:
+        lease = LeaderLease(coordination_path, f"{socket.gethostname()}:{os.getpid()}",
+                            config.get('lease_duration', DEFAULT_LEASE_DURATION))
+
+        def on_leadership_change(is_leader: bool):
+            """Take over the shared state when elected, stop writing it when the lease is lost."""
+            if not is_leader:
+                historical_manager.set_read_only(True)
+                return
+            follow_shared_data()
+            historical_manager.set_read_only(False)
+            if scheduler is not None:
+                scheduler.reload()
+            # Continue the previous leader's schedule instead of fetching again right away
+            previous_next_fetch = (lease.previous or {}).get('next_fetch')
+            if previous_next_fetch:
+                app_state['next_fetch'] = previous_next_fetch
+                app_state['last_fetch'] = lease.previous.get('last_fetch')
+            events.publish('leadership', {'node': lease.node_id})
+
+        lease.on_change = on_leadership_change
+        lease.start(lambda: {'next_fetch': app_state['next_fetch'], 'last_fetch': app_state['last_fetch']})
+        atexit.register(lease.release)
+        app_state['lease'] = lease
 
     while True:
         try:
+            if lease is not None and not lease.is_leader:
+                # Standby: serve the web interface from the shared data the leader writes
+                follow_shared_data()
+                if check_manual_trigger():
+                    logger.info("Manual fetch ignored, this is a standby instance")
+                    clear_manual_trigger()
+                time.sleep(lease.interval)
+                continue
+
+            fetch_history.save_if_due()
+
             # Check for historical reading commands
-            process_historical_command(historical_manager)
+            process_historical_commands(historical_manager, paths['command_dir'], paths['command_file'])
 
             # Check for manual trigger
             if check_manual_trigger():
                 logger.info("Manual fetch triggered! Fetching readings immediately...")
                 clear_manual_trigger()
-                if fetch_and_update_meters(client, ha_api, config, historical_manager):
+                with fetch_lock:
+                    success = fetch_and_schedule('manual_file')
+                if success:
                     logger.info("Manual fetch completed successfully")
-                    app_state['last_fetch'] = datetime.now().isoformat()
-                    last_update_time = time.time()
-                    check_counter = 0  # Reset counter after manual fetch
                 else:
                     logger.error("Manual fetch failed")
 
             # Check if it's time for scheduled update
-            elif check_counter >= checks_per_update:
+            elif time.time() >= app_state['next_fetch']:
                 logger.info("Scheduled update triggered")
-                if fetch_and_update_meters(client, ha_api, config, historical_manager):
+                with fetch_lock:
+                    success = fetch_and_schedule()
+                if success:
                     logger.info("Scheduled update completed successfully")
-                    app_state['last_fetch'] = datetime.now().isoformat()
-                    last_update_time = time.time()
-                    check_counter = 0
                 else:
-                    logger.error("Scheduled update failed, will retry in 5 minutes")
-                    time.sleep(300)
-                    continue
+                    logger.error(f"Scheduled update failed, will retry in {FETCH_RETRY_INTERVAL // 60} minutes")
+                    app_state['next_fetch'] = time.time() + FETCH_RETRY_INTERVAL
 
-            # Sleep and increment counter
-            check_counter += 1
-            time.sleep(CHECK_INTERVAL)
+            time.sleep(min(CHECK_INTERVAL, max(1, app_state['next_fetch'] - time.time())))
 
         except KeyboardInterrupt:
             logger.info("Shutting down...")
@@ -1153,4 +4505,6 @@ def main():
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
     main()
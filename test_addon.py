@@ -7,10 +7,14 @@ Run this standalone to test the add-on without Home Assistant
 import json
 import logging
 import os
+import shutil
 import sys
 import tempfile
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List
+from unittest import mock
 
 # Add the current directory to path to import run.py modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -23,7 +27,12 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Import from run.py
-from run import WAZNieplitzClient, HistoricalReadingsManager
+import run
+from run import (
+    AggregateIndex, WAZNieplitzClient, HistoricalReadingsManager, HomeAssistantAPI, HomeAssistantUnavailable, OutboundQueue,
+    FetchCycle, FetchDeadlineExceeded, FetchHistory, FetchScheduler, LeaderLease, TokenBucket, account_jitter, build_meters, create_parse_pool, fetch_and_update_meters, gzip_chunks, iter_export, iter_readings_rows, iter_timeline, parse_readings_page, process_historical_commands, soup_readings_rows,
+    build_meter_registry, parse_iso_timestamp, parse_manual_date, parse_portal_date
+)
 
 
 class MockHomeAssistantAPI:
@@ -182,6 +191,7 @@ def test_historical_readings():
         # Cleanup
         if os.path.exists(temp_file):
             os.remove(temp_file)
+        shutil.rmtree(os.path.splitext(temp_file)[0], ignore_errors=True)
 
 
 def test_sensor_updates(meters: List[Dict], historical_manager: HistoricalReadingsManager):
@@ -328,10 +338,2086 @@ def test_command_file_processing():
     finally:
         if os.path.exists(temp_file):
             os.remove(temp_file)
+        shutil.rmtree(os.path.splitext(temp_file)[0], ignore_errors=True)
         if os.path.exists(command_file):
             os.remove(command_file)
 
 
+def test_date_parsing():
+    """Test the portal and manual date parsers."""
+    print("\n" + "="*80)
+    print("TEST 6: Date Parsing")
+    print("="*80)
+
+    failures = 0
+
+    print("\n1. Portal dates (Ablesetag / Stichtag)...")
+    portal_cases = [
+        ("31.12.2023", datetime(2023, 12, 31)),
+        ("1.2.2020", datetime(2020, 2, 1)),
+        ("2023-12-31", datetime(2023, 12, 31)),
+        ("05/03/2021", datetime(2021, 3, 5)),  # dateutil fallback, day first
+        ("", None),
+        ("n/a", None),
+    ]
+    for raw, expected in portal_cases:
+        result = parse_portal_date(raw)
+        if result == expected:
+            print(f"  ✓ '{raw}' -> {result}")
+        else:
+            print(f"  ✗ '{raw}' -> {result} (expected {expected})")
+            failures += 1
+
+    print("\n2. Manual dates (YYYY-MM-DD / DD.MM.YYYY only)...")
+    for raw, expected in [("2020-12-31", datetime(2020, 12, 31)), ("31.12.2020", datetime(2020, 12, 31))]:
+        result = parse_manual_date(raw)
+        if result == expected:
+            print(f"  ✓ '{raw}' -> {result}")
+        else:
+            print(f"  ✗ '{raw}' -> {result} (expected {expected})")
+            failures += 1
+    for raw in ["12/31/2020", "31.02.2020"]:
+        try:
+            parse_manual_date(raw)
+            print(f"  ✗ '{raw}' was accepted")
+            failures += 1
+        except ValueError:
+            print(f"  ✓ '{raw}' rejected")
+
+    print("\n3. Stored ISO dates become timezone-aware...")
+    result = parse_iso_timestamp("2020-12-31T00:00:00")
+    if result.tzinfo is not None:
+        print(f"  ✓ {result.isoformat()}")
+    else:
+        print(f"  ✗ {result} has no timezone")
+        failures += 1
+
+    assert failures == 0, f"{failures} date parsing check(s) failed"
+    print("\n✓ Date parsing tests completed!")
+
+
+def test_meter_registry():
+    """Test building the meter registry from configuration."""
+    print("\n" + "="*80)
+    print("TEST 7: Meter Registry")
+    print("="*80)
+
+    config = {
+        'main_meter_number': '15093668',
+        'main_meter_name': 'Main',
+        'garden_meter_number': ' 2181453194 ',
+        'garden_meter_name': 'Garden',
+        'meters': [
+            {'number': '30012345', 'name': 'Guest House', 'entity_suffix': 'guest_house'},
+            {'number': '30012346'},
+            {'number': '15093668', 'name': 'Duplicate'},
+        ]
+    }
+    registry = build_meter_registry(config)
+
+    expected = {
+        '15093668': 'sensor.waz_nieplitz_water_main',
+        '2181453194': 'sensor.waz_nieplitz_water_garden',
+        '30012345': 'sensor.waz_nieplitz_water_guest_house',
+        '30012346': 'sensor.waz_nieplitz_water_30012346',
+    }
+
+    failures = 0
+    for meter_number, entity_id in expected.items():
+        definition = registry.get(meter_number)
+        if definition and definition['entity_id'] == entity_id:
+            print(f"  ✓ {meter_number} -> {entity_id} ({definition['name']})")
+        else:
+            print(f"  ✗ {meter_number} -> {definition} (expected {entity_id})")
+            failures += 1
+
+    if len(registry) == len(expected):
+        print("  ✓ Duplicate meter number ignored")
+    else:
+        print(f"  ✗ Registry has {len(registry)} meter(s), expected {len(expected)}")
+        failures += 1
+
+    assert failures == 0, f"{failures} meter registry check(s) failed"
+    print("\n✓ Meter registry tests completed!")
+
+
+def test_concurrent_historical_access():
+    """Test that readers get stable snapshots while writers modify historical readings."""
+    print("\n" + "="*80)
+    print("TEST 8: Concurrent Historical Access")
+    print("="*80)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager = HistoricalReadingsManager(filepath=os.path.join(temp_dir, 'historical_readings.json'))
+        failures = 0
+
+        print("\n1. Snapshots are not affected by later writes...")
+        manager.add_reading("15093668", "2019-12-31", 50)
+        snapshot = manager.get_readings("15093668")
+        all_snapshot = manager.get_all_readings()
+        manager.add_reading("15093668", "2020-12-31", 100)
+        manager.delete_reading("15093668", "2019-12-31")
+        if len(snapshot) == 1 and snapshot[0]['reading'] == 50 and len(all_snapshot["15093668"]) == 1:
+            print("  ✓ Old snapshot unchanged")
+        else:
+            print(f"  ✗ Old snapshot changed: {snapshot}")
+            failures += 1
+
+        print("\n2. Concurrent writers and readers...")
+        errors = []
+        stop = threading.Event()
+
+        def writer(meter_number):
+            for year in range(1990, 2010):
+                if not manager.add_reading(meter_number, f"{year}-12-31", year):
+                    errors.append(f"add {meter_number} {year}")
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    for readings in manager.get_all_readings().values():
+                        dates = [r['date'] for r in readings]
+                        if dates != sorted(dates):
+                            errors.append("unsorted snapshot")
+                    json.dumps(manager.readings)
+                except Exception as e:
+                    errors.append(f"reader: {e}")
+
+        readers = [threading.Thread(target=reader) for _ in range(3)]
+        writers = [threading.Thread(target=writer, args=(str(n),)) for n in range(4)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        counts = [len(manager.get_readings(str(n))) for n in range(4)]
+        if not errors and counts == [20] * 4:
+            print(f"  ✓ 4 writers x 20 readings, readers saw only consistent snapshots")
+        else:
+            print(f"  ✗ Errors: {errors[:5]}, counts: {counts}")
+            failures += 1
+
+        reloaded = HistoricalReadingsManager(filepath=manager.filepath)
+        if reloaded.get_all_readings() == manager.get_all_readings():
+            print("  ✓ Saved file matches the final snapshot")
+        else:
+            print("  ✗ Saved file differs from the final snapshot")
+            failures += 1
+
+    assert failures == 0, f"{failures} concurrent access check(s) failed"
+    print("\n✓ Concurrent historical access tests completed!")
+
+
+def test_group_commit():
+    """Test write-behind group commit of historical edits."""
+    print("\n" + "="*80)
+    print("TEST 9: Group Commit of Historical Edits")
+    print("="*80)
+
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'historical_readings.json')
+
+        print("\n1. Edits within the flush window are coalesced...")
+        manager = HistoricalReadingsManager(filepath=filepath, flush_interval=0.5, flush_threshold=1000)
+        for year in range(1950, 2000):
+            manager.add_reading("15093668", f"{year}-12-31", year)
+        if manager.stats['writes'] == 0 and manager.pending_edits == 50:
+            print("  ✓ 50 edits acknowledged in memory, no write yet")
+        else:
+            print(f"  ✗ Unexpected state: {manager.stats}, pending {manager.pending_edits}")
+            failures += 1
+
+        time.sleep(1.0)
+        if (manager.stats['edits'], manager.stats['writes']) == (50, 1) and \
+                os.path.exists(os.path.join(manager.storage_dir, '15093668.json')):
+            print("  ✓ One write after the flush window")
+        else:
+            print(f"  ✗ Unexpected stats after flush window: {manager.stats}")
+            failures += 1
+        manager.close()
+
+        print("\n2. Count threshold triggers a commit before the window ends...")
+        manager = HistoricalReadingsManager(filepath=filepath, flush_interval=60, flush_threshold=10)
+        for year in range(2000, 2010):
+            manager.add_reading("2181453194", f"{year}-12-31", year)
+        time.sleep(0.3)
+        if manager.stats['writes'] == 1 and manager.pending_edits == 0:
+            print("  ✓ Threshold of 10 edits flushed immediately")
+        else:
+            print(f"  ✗ Unexpected stats: {manager.stats}, pending {manager.pending_edits}")
+            failures += 1
+
+        print("\n3. Explicit flush and flush on close...")
+        manager.add_reading("2181453194", "2010-12-31", 2010)
+        if manager.flush() and manager.pending_edits == 0:
+            print("  ✓ flush() wrote pending edit")
+        else:
+            print("  ✗ flush() did not write")
+            failures += 1
+        manager.delete_reading("2181453194", "2000-12-31")
+        manager.close()
+
+        reloaded = HistoricalReadingsManager(filepath=filepath)
+        counts = (len(reloaded.get_readings("15093668")), len(reloaded.get_readings("2181453194")))
+        if counts == (50, 10):
+            print("  ✓ close() persisted the last edit")
+        else:
+            print(f"  ✗ Reloaded counts {counts}, expected (50, 10)")
+            failures += 1
+
+        print("\n4. A failed commit is retried with backoff, not at once...")
+        manager = HistoricalReadingsManager(filepath=filepath, flush_interval=0.1, flush_threshold=1)
+        with mock.patch.object(manager, '_save_shards', return_value=False) as save_shards:
+            manager.add_reading("2181453194", "2011-12-31", 2011)
+            time.sleep(1.0)
+            attempts = save_shards.call_count
+        time.sleep(2.0)
+        if 2 <= attempts <= 5 and manager.pending_edits == 0 and manager.stats['writes'] == 1:
+            print(f"  ✓ {attempts} attempts in 1s at the threshold, written once the disk recovered")
+        else:
+            print(f"  ✗ {attempts} attempts, pending {manager.pending_edits}, stats {manager.stats}")
+            failures += 1
+        manager.close()
+
+    assert failures == 0, f"{failures} group commit check(s) failed"
+    print("\n✓ Group commit tests completed!")
+
+
+def test_sharded_storage():
+    """Test per-meter sharded historical storage with lazy loading."""
+    print("\n" + "="*80)
+    print("TEST 10: Sharded Historical Storage")
+    print("="*80)
+
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, 'historical_readings.json')
+        legacy = {
+            str(15093668 + m): [
+                {"date": f"{year}-12-31T00:00:00", "reading": float(year), "consumption": None,
+                 "reading_type": "Manual Entry", "manual": True}
+                for year in range(2000, 2010)
+            ]
+            for m in range(5)
+        }
+        with open(filepath, 'w') as f:
+            json.dump(legacy, f)
+
+        print("\n1. Legacy single-file store is migrated to shards...")
+        manager = HistoricalReadingsManager(filepath=filepath)
+        shards = sorted(os.listdir(manager.storage_dir))
+        if (os.path.exists(f"{filepath}.migrated") and not os.path.exists(filepath)
+                and len(shards) == 6 and 'manifest.json' in shards):
+            print(f"  ✓ 5 meter shards and a manifest written, legacy file renamed")
+        else:
+            print(f"  ✗ Unexpected storage layout: {shards}")
+            failures += 1
+
+        print("\n2. Only the manifest is loaded at startup...")
+        manager = HistoricalReadingsManager(filepath=filepath, max_resident_meters=2)
+        summary = manager.get_summary()
+        entry = summary["15093670"]
+        if (manager.resident_meters == 0 and entry['count'] == 10 and entry['first_date'] == '2000-12-31T00:00:00'
+                and entry['last_date'] == '2009-12-31T00:00:00' and entry['totals']['readings'] == 10):
+            print("  ✓ No readings resident, manifest has counts, date ranges and consumption totals")
+        else:
+            print(f"  ✗ {manager.resident_meters} meter(s) resident, summary: {summary.get('15093670')}")
+            failures += 1
+
+        readings = manager.get_readings("15093670")
+        if len(readings) == 10 and manager.resident_meters == 1 and manager.stats['loads'] == 1:
+            print("  ✓ First access loaded one shard")
+        else:
+            print(f"  ✗ Unexpected state after access: {manager.stats}")
+            failures += 1
+
+        print("\n3. Edits rewrite only the edited shard...")
+        other_shard = os.path.join(manager.storage_dir, '15093668.json')
+        before = os.path.getmtime(other_shard)
+        time.sleep(0.01)
+        manager.add_reading("15093670", "2010-12-31", 2010)
+        if os.path.getmtime(other_shard) == before and manager.get_summary()["15093670"]['count'] == 11:
+            print("  ✓ Other shards untouched, manifest updated")
+        else:
+            print("  ✗ Unrelated shard was rewritten or manifest not updated")
+            failures += 1
+
+        print("\n4. Idle meters are evicted and reloaded on demand...")
+        for meter_number in ("15093668", "15093669", "15093671"):
+            manager.get_readings(meter_number)
+        manager.evict_idle()
+        if manager.resident_meters == 2 and manager.stats['evictions'] == 2:
+            print("  ✓ Least recently used meters evicted down to 2 resident")
+        else:
+            print(f"  ✗ {manager.resident_meters} meter(s) resident, stats {manager.stats}")
+            failures += 1
+
+        if len(manager.get_readings("15093670")) == 11:
+            print("  ✓ Evicted meter reloaded with its latest edit")
+        else:
+            print("  ✗ Evicted meter lost its edit")
+            failures += 1
+
+        print("\n5. Deleting the last reading removes the shard...")
+        manager.add_reading("99999999", "2020-01-01", 1)
+        manager.delete_reading("99999999", "2020-01-01")
+        if not os.path.exists(manager._shard_path("99999999")) and "99999999" not in manager.get_summary():
+            print("  ✓ Empty meter removed from disk and manifest")
+        else:
+            print("  ✗ Empty meter still stored")
+            failures += 1
+
+        reloaded = HistoricalReadingsManager(filepath=filepath)
+        if reloaded.get_all_readings() == manager.get_all_readings():
+            print("  ✓ Reloaded store matches")
+        else:
+            print("  ✗ Reloaded store differs")
+            failures += 1
+
+    assert failures == 0, f"{failures} sharded storage check(s) failed"
+    print("\n✓ Sharded storage tests completed!")
+
+
+def test_state_push_skipping():
+    """Test that unchanged sensor states are not pushed to Home Assistant again."""
+    print("\n" + "="*80)
+    print("TEST 11: Skipping Unchanged State Pushes")
+    print("="*80)
+
+    failures = 0
+    ha_state = {}
+
+    def fake_post(url, headers=None, json=None, timeout=None):
+        ha_state[url] = json['state']
+        return mock.Mock(status_code=200, raise_for_status=lambda: None)
+
+    def fake_get(url, headers=None, timeout=None):
+        if url not in ha_state:
+            return mock.Mock(status_code=404)
+        return mock.Mock(status_code=200, json=lambda: {'state': ha_state[url]})
+
+    with mock.patch('requests.post', side_effect=fake_post) as post, \
+            mock.patch('requests.get', side_effect=fake_get):
+        ha_api = HomeAssistantAPI(refresh_interval=3600)
+        attributes = {'meter_number': '15093668', 'unit_of_measurement': 'm³'}
+
+        print("\n1. Identical payloads are pushed once...")
+        for _ in range(3):
+            ha_api.update_sensor('sensor.waz_nieplitz_water_main', 123.5, dict(attributes))
+        if post.call_count == 1 and ha_api.stats == {'pushed': 1, 'skipped': 2}:
+            print("  ✓ 1 push, 2 skipped")
+        else:
+            print(f"  ✗ {post.call_count} push(es), stats {ha_api.stats}")
+            failures += 1
+
+        print("\n2. Changed state or attributes are pushed...")
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 124.0, dict(attributes))
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 124.0, dict(attributes, historical_count=1))
+        if post.call_count == 3:
+            print("  ✓ Both changes pushed")
+        else:
+            print(f"  ✗ {post.call_count} push(es), expected 3")
+            failures += 1
+
+        print("\n3. Home Assistant restart forces a push...")
+        ha_state.clear()
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 124.0, dict(attributes, historical_count=1))
+        if post.call_count == 4:
+            print("  ✓ Missing state pushed again")
+        else:
+            print(f"  ✗ {post.call_count} push(es), expected 4")
+            failures += 1
+
+        print("\n4. Refresh interval and force push unchanged states...")
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 124.0, dict(attributes, historical_count=1), force=True)
+        ha_api.refresh_interval = 0
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 124.0, dict(attributes, historical_count=1))
+        if post.call_count == 6:
+            print("  ✓ Forced and expired pushes sent")
+        else:
+            print(f"  ✗ {post.call_count} push(es), expected 6")
+            failures += 1
+
+        print("\n5. Pushed states are remembered across restarts...")
+        temp_dir = tempfile.mkdtemp()
+        pushed_file = os.path.join(temp_dir, "pushed_states.json")
+        HomeAssistantAPI(pushed_file=pushed_file).update_sensor('sensor.waz_nieplitz_water_main', 125.0,
+                                                                dict(attributes))
+        restarted = HomeAssistantAPI(pushed_file=pushed_file)
+        restarted.update_sensor('sensor.waz_nieplitz_water_main', 125.0, dict(attributes))
+        if post.call_count == 7 and restarted.stats == {'pushed': 0, 'skipped': 1}:
+            print("  ✓ Unchanged state skipped after a restart")
+        else:
+            print(f"  ✗ {post.call_count} push(es), stats after restart {restarted.stats}")
+            failures += 1
+        shutil.rmtree(temp_dir)
+
+        print("\n6. The presence check and the push share one cycle-capped timeout...")
+        cycle = mock.Mock()
+        cycle.request_timeout.return_value = 4.0
+        ha_api.refresh_interval = 3600
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 126.0, dict(attributes), cycle=cycle)
+        if cycle.request_timeout.call_count == 1 and post.call_args.kwargs['timeout'] == 4.0:
+            print("  ✓ Timeout computed once and used for the push")
+        else:
+            print(f"  ✗ request_timeout called {cycle.request_timeout.call_count} time(s), "
+                  f"push timeout {post.call_args.kwargs['timeout']}")
+            failures += 1
+
+    print("\n7. By default an unchanged state outlives the shortest fetch interval...")
+    if run.DEFAULT_STATE_REFRESH_INTERVAL > run.MIN_FETCH_INTERVAL:
+        print(f"  ✓ Refresh after {run.DEFAULT_STATE_REFRESH_INTERVAL}s, fetches at least {run.MIN_FETCH_INTERVAL}s apart")
+    else:
+        print(f"  ✗ Refresh interval {run.DEFAULT_STATE_REFRESH_INTERVAL}s pushes on every scheduled fetch")
+        failures += 1
+
+    assert failures == 0, f"{failures} state push check(s) failed"
+    print("\n✓ State push skipping tests completed!")
+
+
+def test_outbound_queue():
+    """Test queueing of Home Assistant updates while Home Assistant is unavailable."""
+    print("\n" + "="*80)
+    print("TEST 12: Outbound Queue")
+    print("="*80)
+
+    import requests
+
+    failures = 0
+    ha_up = {'value': False}
+    delivered = []
+
+    def fake_post(url, headers=None, json=None, timeout=None):
+        if not ha_up['value']:
+            raise requests.ConnectionError("Connection refused")
+        delivered.append((url.rsplit('/', 1)[-1], json['state']))
+        return mock.Mock(status_code=200, raise_for_status=lambda: None)
+
+    def fake_send_statistics(metadata, stats, cycle=None):
+        if not ha_up['value']:
+            raise HomeAssistantUnavailable("Connection refused", delivered=2)
+        delivered.append((metadata['statistic_id'], len(stats)))
+        return True
+
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            mock.patch('requests.post', side_effect=fake_post):
+        queue_file = os.path.join(temp_dir, 'outbound_queue.json')
+        ha_api = HomeAssistantAPI(outbound=OutboundQueue(queue_file))
+        ha_api._send_statistics = fake_send_statistics
+
+        print("\n1. Updates are queued and coalesced while Home Assistant is down...")
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 100.0, {})
+        ha_api.update_sensor('sensor.waz_nieplitz_water_main', 101.0, {})
+        ha_api.update_sensor('sensor.waz_nieplitz_water_garden', 5.0, {})
+        readings = [{'date': f"{year}-12-31T00:00:00", 'reading': float(year)} for year in range(2015, 2020)]
+        ha_api.import_statistics('sensor.waz_nieplitz_water_main', 'Main', readings)
+        queue = ha_api.outbound
+        if queue.depth == 3 and queue.stats['coalesced'] == 1:
+            print("  ✓ 4 updates queued as 3 items")
+        else:
+            print(f"  ✗ Depth {queue.depth}, stats {queue.stats}")
+            failures += 1
+
+        statistics = queue._items['statistics:sensor.waz_nieplitz_water_main']['payload']['stats']
+        if len(statistics) == 3:
+            print("  ✓ Statistics accepted before the failure are not queued")
+        else:
+            print(f"  ✗ {len(statistics)} statistics queued, expected 3")
+            failures += 1
+
+        print("\n2. Queue survives a restart...")
+        ha_api = HomeAssistantAPI(outbound=OutboundQueue(queue_file))
+        ha_api._send_statistics = fake_send_statistics
+        if ha_api.outbound.depth == 3 and ha_api.outbound.oldest_age is not None:
+            print("  ✓ 3 items reloaded from file")
+        else:
+            print(f"  ✗ {ha_api.outbound.depth} items reloaded")
+            failures += 1
+
+        print("\n3. Draining replays the latest updates once Home Assistant is back...")
+        if not ha_api.drain_batch() and ha_api.outbound.depth == 3:
+            print("  ✓ Batch stops while Home Assistant is down")
+        else:
+            print("  ✗ Batch did not stop on unavailable Home Assistant")
+            failures += 1
+
+        ha_up['value'] = True
+        if ha_api.drain_batch() and ha_api.outbound.depth == 0 and sorted(delivered) == [
+                ('sensor.waz_nieplitz_water_garden', '5.0'),
+                ('sensor.waz_nieplitz_water_main', '101.0'),
+                ('waz_nieplitz:water_main', 3)]:
+            print("  ✓ Latest state per entity and remaining statistics delivered")
+        else:
+            print(f"  ✗ Delivered {delivered}, depth {ha_api.outbound.depth}")
+            failures += 1
+
+    assert failures == 0, f"{failures} outbound queue check(s) failed"
+    print("\n✓ Outbound queue tests completed!")
+
+
+def test_portal_rate_limiter():
+    """Test the token bucket shared by portal requests."""
+    print("\n" + "="*80)
+    print("TEST 13: Portal Rate Limiter")
+    print("="*80)
+
+    failures = 0
+
+    print("\n1. Burst passes immediately, further requests wait...")
+    bucket = TokenBucket(rate=20, burst=3)
+    waits = [bucket.acquire() for _ in range(5)]
+    if waits[:3] == [0.0, 0.0, 0.0] and all(0.04 < w < 0.06 for w in waits[3:]):
+        print(f"  ✓ Waits: {', '.join(f'{w:.2f}s' for w in waits)}")
+    else:
+        print(f"  ✗ Unexpected waits: {waits}")
+        failures += 1
+
+    if bucket.stats['requests'] == 5 and bucket.stats['waited'] == 2:
+        print(f"  ✓ Wait metrics recorded: {bucket.stats['wait_seconds']:.2f}s total")
+    else:
+        print(f"  ✗ Unexpected stats: {bucket.stats}")
+        failures += 1
+
+    print("\n2. Concurrent callers share the rate...")
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(11)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    if 0.18 < elapsed < 0.4:
+        print(f"  ✓ 11 requests from 11 threads took {elapsed:.2f}s at 50/s")
+    else:
+        print(f"  ✗ 11 requests took {elapsed:.2f}s, expected about 0.2s")
+        failures += 1
+
+    print("\n3. Throttling responses pause the portal client...")
+    bucket = TokenBucket(rate=1000, burst=5)
+    client = WAZNieplitzClient("test", "test", rate_limiter=bucket)
+    throttled = mock.Mock(status_code=429, headers={'Retry-After': '1'})
+    with mock.patch.object(client.session, 'request', return_value=throttled) as request:
+        client._request('GET', 'https://example.invalid/')
+        client._request('GET', 'https://example.invalid/')
+    waited = bucket.stats['max_wait']
+    if request.call_count == 2 and 0.9 < waited < 1.1:
+        print(f"  ✓ Next request waited {waited:.2f}s after Retry-After: 1")
+    else:
+        print(f"  ✗ Next request waited {waited}")
+        failures += 1
+
+    print("\n4. A long Retry-After is capped...")
+    bucket = TokenBucket(rate=1, burst=1)
+    client = WAZNieplitzClient("test", "test", rate_limiter=bucket)
+    throttled = mock.Mock(status_code=503, headers={'Retry-After': '3600'})
+    with mock.patch.object(client.session, 'request', return_value=throttled):
+        client._request('GET', 'https://example.invalid/')
+    pause = -bucket._tokens / bucket.rate
+    if run.PORTAL_THROTTLE_PAUSE_MAX - 1 < pause <= run.PORTAL_THROTTLE_PAUSE_MAX + 1:
+        print(f"  ✓ Retry-After: 3600 paused portal requests for {pause:.0f}s")
+    else:
+        print(f"  ✗ Paused for {pause:.0f}s")
+        failures += 1
+
+    print("\n5. A rate limit wait past the cycle deadline fails at once...")
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.pause(5)
+    client = WAZNieplitzClient("test", "test", rate_limiter=bucket)
+    cycle = FetchCycle(timeout=1)
+    cycle.start()
+    started = time.monotonic()
+    try:
+        with mock.patch.object(client.session, 'request') as request:
+            client._request('GET', 'https://example.invalid/', cycle)
+        print("  ✗ No exception raised")
+        failures += 1
+    except FetchDeadlineExceeded:
+        elapsed = time.monotonic() - started
+        if elapsed < 0.1 and not request.called and bucket.stats['requests'] == 0:
+            print(f"  ✓ FetchDeadlineExceeded after {elapsed:.3f}s, no token taken, no request sent")
+        else:
+            print(f"  ✗ Raised after {elapsed:.2f}s, request sent: {request.called}, stats {bucket.stats}")
+            failures += 1
+    finally:
+        cycle.finish('timeout')
+
+    assert failures == 0, f"{failures} rate limiter check(s) failed"
+    print("\n✓ Portal rate limiter tests completed!")
+
+
+def test_export():
+    """Test the streaming export of merged readings."""
+    print("\n" + "="*80)
+    print("TEST 14: Streaming Export")
+    print("="*80)
+
+    import csv
+    import gzip
+    import io
+    import random
+
+    failures = 0
+    portal = [
+        {'date': '2024-12-31T00:00:00', 'reading': 300.0, 'consumption': 100.0, 'reading_type': 'Jahresablesung'},
+        {'date': '2022-12-31T00:00:00', 'reading': 100.0, 'consumption': 90.0, 'reading_type': 'Jahresablesung'},
+        {'date': None, 'reading': 0.0, 'consumption': None, 'reading_type': 'Unknown'}
+    ]
+    manual = (
+        {'date': '2021-12-31T00:00:00', 'reading': 10.0, 'consumption': None, 'reading_type': 'Manual Entry'},
+        {'date': '2023-12-31T00:00:00', 'reading': 200.0, 'consumption': None, 'reading_type': 'Manual Entry'},
+    )
+
+    print("\n1. Portal and manual readings are merged in date order...")
+    rows = list(iter_timeline('15093668', portal, manual))
+    dates = [(row['date'][:4], row['source']) for row in rows]
+    if dates == [('2021', 'manual'), ('2022', 'portal'), ('2023', 'manual'), ('2024', 'portal')]:
+        print("  ✓ 4 readings merged, undated portal row skipped")
+    else:
+        print(f"  ✗ Unexpected timeline: {dates}")
+        failures += 1
+
+    rows = list(iter_timeline('15093668', portal, manual, start='2022-01-01', end='2023-12-31'))
+    if [row['date'][:4] for row in rows] == ['2022', '2023']:
+        print("  ✓ Date range applied")
+    else:
+        print(f"  ✗ Unexpected range: {rows}")
+        failures += 1
+
+    print("\n2. CSV and NDJSON encoding...")
+    text = ''.join(iter_export(iter_timeline('15093668', portal, manual), 'csv'))
+    parsed = list(csv.DictReader(io.StringIO(text)))
+    if len(parsed) == 4 and parsed[1]['reading'] == '100.0' and parsed[1]['source'] == 'portal':
+        print("  ✓ CSV has a header and 4 rows")
+    else:
+        print(f"  ✗ Unexpected CSV: {text!r}")
+        failures += 1
+
+    lines = ''.join(iter_export(iter_timeline('15093668', portal, manual), 'ndjson')).splitlines()
+    if len(lines) == 4 and json.loads(lines[-1])['reading'] == 300.0:
+        print("  ✓ NDJSON has one object per line")
+    else:
+        print(f"  ✗ Unexpected NDJSON: {lines}")
+        failures += 1
+
+    print("\n3. Gzip is applied while streaming...")
+    rng = random.Random(42)
+    many = ({'meter_number': '1', 'date': f"2000-01-01T00:00:{i % 60:02d}", 'reading': rng.random()}
+            for i in range(5000))
+    compressed = list(gzip_chunks(iter_export(many, 'ndjson')))
+    lines = gzip.decompress(b''.join(compressed)).decode('utf-8').splitlines()
+    if len(compressed) > 2 and len(lines) == 5000:
+        print(f"  ✓ 5000 rows streamed as {len(compressed)} gzip chunks")
+    else:
+        print(f"  ✗ {len(compressed)} chunk(s), {len(lines)} line(s)")
+        failures += 1
+
+    assert failures == 0, f"{failures} export check(s) failed"
+    print("\n✓ Export tests completed!")
+
+
+def test_command_spool():
+    """Test the spool directory for historical reading commands."""
+    print("\n" + "="*80)
+    print("TEST 15: Command Spool Directory")
+    print("="*80)
+
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        spool_dir = os.path.join(temp_dir, 'historical_commands')
+        legacy_file = os.path.join(temp_dir, 'historical_command.json')
+        os.makedirs(spool_dir)
+        manager = HistoricalReadingsManager(filepath=os.path.join(temp_dir, 'historical_readings.json'))
+
+        def spool(name, data):
+            tmp_path = os.path.join(spool_dir, f".{name}.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, os.path.join(spool_dir, name))
+            time.sleep(0.01)
+
+        print("\n1. All pending files are applied as one batch...")
+        with open(legacy_file, 'w') as f:
+            json.dump({"action": "add", "meter_number": "15093668", "date": "2015-12-31", "reading": 5}, f)
+        spool('backfill.json', {"commands": [
+            {"action": "add", "meter_number": "15093668", "date": f"{year}-12-31", "reading": year - 2000}
+            for year in range(2016, 2020)
+        ]})
+        spool('correction.json', [
+            {"action": "add", "meter_number": "15093668", "date": "2019-12-31", "reading": 20},
+            {"action": "delete", "meter_number": "15093668", "date": "2016-12-31"}
+        ])
+        writes = manager.stats['writes']
+        applied = process_historical_commands(manager, spool_dir, legacy_file)
+        readings = {r['date'][:4]: r['reading'] for r in manager.get_readings("15093668")}
+        if applied == 7 and readings == {'2015': 5.0, '2017': 17.0, '2018': 18.0, '2019': 20.0}:
+            print("  ✓ 7 commands from 3 files applied in order")
+        else:
+            print(f"  ✗ {applied} applied, readings {readings}")
+            failures += 1
+
+        if manager.stats['writes'] == writes + 1:
+            print("  ✓ Batch persisted with a single write")
+        else:
+            print(f"  ✗ {manager.stats['writes'] - writes} writes for the batch")
+            failures += 1
+
+        if not os.path.exists(legacy_file) and os.listdir(spool_dir) == []:
+            print("  ✓ Processed files removed")
+        else:
+            print(f"  ✗ Files left: {os.listdir(spool_dir)}")
+            failures += 1
+
+        print("\n2. Failures go to the dead-letter directory...")
+        spool('mixed.json', [
+            {"action": "add", "meter_number": "15093668", "date": "2020-12-31", "reading": 21},
+            {"action": "add", "meter_number": "15093668", "date": "31/12/2021", "reading": 22},
+            {"action": "rename", "meter_number": "15093668"}
+        ])
+        with open(os.path.join(spool_dir, 'broken.json'), 'w') as f:
+            f.write('{"action": "add", ')
+        applied = process_historical_commands(manager, spool_dir, legacy_file)
+        failed_dir = os.path.join(spool_dir, 'failed')
+        dead = sorted(os.listdir(failed_dir))
+        with open(os.path.join(failed_dir, 'mixed.json')) as f:
+            dead_letter = json.load(f)
+        if applied == 1 and len(dead) == 2 and len(dead_letter['commands']) == 2 and len(dead_letter['errors']) == 2:
+            print("  ✓ Valid command applied, 2 failed commands and the unreadable file dead-lettered")
+        else:
+            print(f"  ✗ {applied} applied, dead letters {dead}")
+            failures += 1
+
+    assert failures == 0, f"{failures} command spool check(s) failed"
+    print("\n✓ Command spool tests completed!")
+
+
+def test_adaptive_schedule():
+    """Test the adaptive fetch scheduler."""
+    print("\n" + "="*80)
+    print("TEST 16: Adaptive Fetch Schedule")
+    print("="*80)
+
+    failures = 0
+    day = 86400
+
+    def portal(reading_dates):
+        return {"15093668": [{'date': f"{d}T00:00:00", 'reading_date': f"{d}T00:00:00",
+                              'reference_date': f"{d[:4]}-12-31T00:00:00"} for d in reading_dates]}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print("\n1. Sparse outside and dense inside the expected window...")
+        scheduler = FetchScheduler(filepath=os.path.join(temp_dir, 'schedule.json'))
+        readings = portal(["2023-12-28", "2024-12-30"])
+        sparse = scheduler.next_interval(readings, datetime(2025, 6, 1))
+        dense = scheduler.next_interval(readings, datetime(2026, 1, 8))
+        approaching = scheduler.next_interval(readings, datetime(2025, 12, 1))
+        if sparse == 120 * day and dense == 2 * day and 33 * day <= approaching <= 35 * day:
+            print(f"  ✓ {sparse / day:.0f} days in June, {approaching / day:.1f} days before the window, "
+                  f"{dense / day:.0f} days inside it")
+        else:
+            print(f"  ✗ Intervals {sparse / day:.1f}, {approaching / day:.1f}, {dense / day:.1f} days")
+            failures += 1
+
+        if scheduler.next_interval({}, datetime(2025, 6, 1)) == 30 * day:
+            print("  ✓ Falls back to the update interval without readings")
+        else:
+            print("  ✗ Unexpected interval without readings")
+            failures += 1
+
+        print("\n2. One simulated year against a fixed 30-day interval...")
+        # Readings are taken around Dec 30 and appear on the portal 10 days later
+        taken = ["2022-12-29", "2023-12-31", "2024-12-30", "2025-12-30"]
+        scheduler = FetchScheduler(filepath=os.path.join(temp_dir, 'simulation.json'))
+
+        def simulate(next_interval):
+            now = datetime(2025, 1, 20)
+            fetches, found = 0, None
+            while now < datetime(2026, 1, 20):
+                visible = portal([d for d in taken if datetime.fromisoformat(d) + timedelta(days=10) <= now])
+                fetches += 1
+                if found is None and len(visible["15093668"]) == 4:
+                    found = now
+                now += timedelta(seconds=next_interval(visible, now))
+            return fetches, (found - datetime(2026, 1, 9)).days if found else None
+
+        def adaptive(visible, now):
+            scheduler.observe(visible, now)
+            return scheduler.next_interval(visible, now)
+
+        fixed_fetches, fixed_delay = simulate(lambda visible, now: 30 * day)
+        adaptive_fetches, adaptive_delay = simulate(adaptive)
+        if adaptive_fetches < fixed_fetches and adaptive_delay is not None and adaptive_delay <= 2:
+            print(f"  ✓ {adaptive_fetches} fetches (fixed: {fixed_fetches}), new reading seen after "
+                  f"{adaptive_delay} day(s) (fixed: {fixed_delay})")
+        else:
+            print(f"  ✗ {adaptive_fetches} fetches (fixed: {fixed_fetches}), delay {adaptive_delay} (fixed: {fixed_delay})")
+            failures += 1
+
+        print("\n3. Publication delay is learned...")
+        if scheduler._state['delays'] and 10 <= scheduler._state['delays'][-1] <= 12:
+            print(f"  ✓ Learned delay of {scheduler._state['delays'][-1]} days")
+        else:
+            print(f"  ✗ Learned delays: {scheduler._state['delays']}")
+            failures += 1
+
+    assert failures == 0, f"{failures} adaptive schedule check(s) failed"
+    print("\n✓ Adaptive schedule tests completed!")
+
+
+def test_fetch_jitter():
+    """Test the deterministic per-account fetch jitter."""
+    print("\n" + "="*80)
+    print("TEST 17: Per-Account Fetch Jitter")
+    print("="*80)
+
+    failures = 0
+    interval = 2592000
+
+    print("\n1. Jitter is deterministic and bounded...")
+    delays = [account_jitter(f"kunde{n:04d}", interval, 0.1) for n in range(1000)]
+    if (account_jitter("Kunde0001 ", interval, 0.1) == delays[1]
+            and all(0 <= d <= 0.1 * interval for d in delays)
+            and account_jitter("kunde0001", interval, 0) == 0):
+        print("  ✓ Same account, same delay; all delays within 10% of the interval")
+    else:
+        print("  ✗ Jitter not deterministic or out of bounds")
+        failures += 1
+
+    print("\n2. Accounts spread evenly over the jitter range...")
+    buckets = [0] * 10
+    for delay in delays:
+        buckets[min(int(delay / (0.01 * interval)), 9)] += 1
+    if all(70 <= count <= 130 for count in buckets):
+        print(f"  ✓ 1000 accounts per 10% of the range: {buckets}")
+    else:
+        print(f"  ✗ Uneven spread: {buckets}")
+        failures += 1
+
+    print("\n3. Jittered adaptive intervals stay within max_interval and the reading windows...")
+    day = 86400
+    readings = {"15093668": [{'date': f"{d}T00:00:00", 'reading_date': f"{d}T00:00:00"}
+                             for d in ("2023-12-28", "2024-12-30")]}
+    violations = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scheduler = FetchScheduler(filepath=os.path.join(temp_dir, 'schedule.json'))
+        for n in range(50):
+            fraction = account_jitter(f"kunde{n:04d}", 1, 0.5)
+            for offset in range(0, 400, 3):
+                now = datetime(2025, 1, 10) + timedelta(days=offset)
+                interval = scheduler.next_interval(readings, now, fraction)
+                windows = scheduler.windows(readings, now)
+                inside = any(start <= now <= end for start, end in windows)
+                opens = min((start for start, _ in windows if start > now), default=None)
+                if interval > scheduler.max_interval:
+                    violations.append((n, offset, 'max_interval'))
+                elif inside and interval > scheduler.dense_interval * 1.5:
+                    violations.append((n, offset, 'dense'))
+                elif not inside and opens and now + timedelta(seconds=interval) > max(opens, now + timedelta(days=1)):
+                    violations.append((n, offset, 'window start'))
+    if not violations:
+        print("  ✓ 50 accounts with fetch_jitter 0.5: no interval past max_interval or over a window start")
+    else:
+        print(f"  ✗ {len(violations)} violation(s), e.g. {violations[:3]}")
+        failures += 1
+
+    assert failures == 0, f"{failures} fetch jitter check(s) failed"
+    print("\n✓ Fetch jitter tests completed!")
+
+
+def test_fetch_cycle_deadline():
+    """Test the deadline and cancellation of a fetch cycle."""
+    print("\n" + "="*80)
+    print("TEST 18: Fetch Cycle Deadline")
+    print("="*80)
+
+    import socket
+
+    failures = 0
+
+    print("\n1. A slow-dripping portal response is cancelled at the deadline...")
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    port = server.getsockname()[1]
+    stop = threading.Event()
+
+    def drip():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\n")
+        try:
+            while not stop.is_set():
+                conn.sendall(b"x")
+                time.sleep(0.2)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    threading.Thread(target=drip, daemon=True).start()
+    client = WAZNieplitzClient("test", "test", rate_limiter=TokenBucket(rate=1000, burst=5))
+    cycle = FetchCycle(timeout=1)
+    cycle.start()
+    start = time.monotonic()
+    try:
+        client._request('GET', f"http://127.0.0.1:{port}/ablesungen", cycle, timeout=30)
+        print("  ✗ Request completed despite the deadline")
+        failures += 1
+    except FetchDeadlineExceeded:
+        elapsed = time.monotonic() - start
+        if elapsed < 1.5:
+            print(f"  ✓ Cancelled after {elapsed:.2f}s (per-read timeout 30s)")
+        else:
+            print(f"  ✗ Cancelled only after {elapsed:.2f}s")
+            failures += 1
+    finally:
+        stop.set()
+        cycle.finish('timeout')
+        server.close()
+
+    print("\n2. A cycle running past its deadline stops between phases and reports progress...")
+    meters = [{
+        'meter_number': number, 'reading': 100.0, 'consumption': None, 'reading_type': 'Test',
+        'reading_date': None, 'reference_date': None, 'portal_readings': []
+    } for number in ('1001', '1002', '1003')]
+    portal = mock.Mock()
+    portal.login.return_value = True
+    portal.get_meter_readings.return_value = meters
+    ha_api = mock.Mock()
+    ha_api.update_sensor.side_effect = lambda *args, **kwargs: time.sleep(0.3) or True
+    config = {'fetch_cycle_timeout': 0.5, 'meters': [{'number': m['meter_number']} for m in meters]}
+
+    success = fetch_and_update_meters(portal, ha_api, config, meter_registry=build_meter_registry(config))
+    report = run.app_state['last_cycle']
+    phases = [p['phase'] for p in report['completed_phases']]
+    if (not success and report['outcome'] == 'timeout' and report['meters_completed'] == ['1001', '1002']
+            and phases == ['login', 'parse', 'sensor_push', 'sensor_push']):
+        print(f"  ✓ Stopped before meter 1003, report lists {len(phases)} completed phases")
+    else:
+        print(f"  ✗ success={success}, report {report}")
+        failures += 1
+
+    print("\n3. A stalled statistics import times out instead of being queued as an outage...")
+    import websocket
+    aborted = threading.Event()
+
+    class StalledWebSocket:
+        def recv(self):
+            aborted.wait(10)
+            raise websocket.WebSocketConnectionClosedException("Connection aborted")
+
+        def abort(self):
+            aborted.set()
+
+        def send(self, data):
+            pass
+
+        def close(self):
+            pass
+
+    outbound = mock.Mock()
+    ha_api = HomeAssistantAPI(outbound=outbound)
+    ha_api._post_state = mock.Mock()
+    meter = dict(meters[0], portal_readings=[{'date': '2024-12-31T00:00:00', 'reading': 100.0}])
+    portal.get_meter_readings.return_value = [meter]
+    config = {'fetch_cycle_timeout': 1, 'meters': [{'number': '1001'}]}
+    start = time.monotonic()
+    with mock.patch('websocket.create_connection', return_value=StalledWebSocket()):
+        success = fetch_and_update_meters(portal, ha_api, config, meter_registry=build_meter_registry(config))
+    elapsed = time.monotonic() - start
+    report = run.app_state['last_cycle']
+    if (not success and report['outcome'] == 'timeout' and report['meters_completed'] == []
+            and (report['interrupted_phase'] or {}).get('phase') == 'statistics'
+            and not outbound.put.called and elapsed < 2):
+        print(f"  ✓ Aborted after {elapsed:.2f}s, reported as a timeout in the statistics phase")
+    else:
+        print(f"  ✗ success={success}, queued={outbound.put.called}, report {report}")
+        failures += 1
+
+    assert failures == 0, f"{failures} fetch cycle check(s) failed"
+    print("\n✓ Fetch cycle deadline tests completed!")
+
+
+def readings_page(rows: int, padding: int = 0) -> bytes:
+    """Build a readings page like the portal's, with padding outside the table."""
+    items = []
+    for i in range(rows):
+        meter = ('15093668', '15093669', '30012345')[i % 3]
+        year = 2024 - i // 3
+        items.append(
+            '<tr class="item">'
+            f'<td class="zaehler"><span class="label">Zähler</span> {meter}</td>'
+            f'<td class="ablesetag"><span class="label">Ablesetag</span> 31.12.{year}</td>'
+            f'<td class="stichtag"><span class="label">Stichtag</span> 31.12.{year}</td>'
+            f'<td class="stand"><span class="label">Stand</span> {1000 - i},5 m³</td>'
+            f'<td class="verbrauch"><span class="label">Verbrauch (m³)</span> {40 + i % 7}</td>'
+            '<td class="ablesart"><span class="label">Ableseart</span> Kundenangabe</td>'
+            '</tr>'
+        )
+    filler = '<div class="news"><p>' + 'Lorem ipsum dolor sit amet. ' * 40 + '</p></div>'
+    page = (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Ablesungen</title>'
+        f'<script>var data = "{"x" * padding}";</script></head><body>'
+        + filler * (padding // 2000)
+        + '<table class="listview other"><tr class="item"><td class="zaehler">99999999</td></tr></table>'
+        + '<table class="listview ablesungen"><tr class="head"><th>Zähler</th></tr>'
+        + ''.join(items)
+        + '</table>'
+        + filler * (padding // 2000)
+        + '</body></html>'
+    )
+    return page.encode('utf-8')
+
+
+def serve_page(body: bytes):
+    """Serve body on a local HTTP server; the caller shuts it down."""
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_streaming_parse():
+    """Test the incremental parse of the readings page."""
+    print("\n" + "="*80)
+    print("TEST 19: Streaming Readings Parse")
+    print("="*80)
+
+    failures = 0
+
+    print("\n1. Streaming parse matches the BeautifulSoup parse...")
+    page = readings_page(rows=60, padding=200000)
+    expected = build_meters(soup_readings_rows(page))
+    chunks = (page[i:i + 7] for i in range(0, len(page), 7))
+    meters = build_meters(iter_readings_rows(chunks))
+    if meters == expected and len(meters) == 3 and all(len(m['portal_readings']) == 20 for m in meters):
+        print(f"  ✓ {len(meters)} meters with 20 readings each, fed in 7-byte chunks")
+    else:
+        print(f"  ✗ Streaming result differs: {[(m['meter_number'], len(m['portal_readings'])) for m in meters]}")
+        failures += 1
+    if meters and meters[0]['reading'] == 1000 and meters[0]['reading_date'] == datetime(2024, 12, 31):
+        print("  ✓ Current reading taken from the most recent row")
+    else:
+        print(f"  ✗ Unexpected current reading: {meters[0] if meters else None}")
+        failures += 1
+
+    print("\n2. Peak memory does not grow with the page...")
+    import tracemalloc
+    peaks = {}
+    for padding in (200000, 2000000):
+        big_page = readings_page(rows=60, padding=padding)
+        tracemalloc.start()
+        build_meters(iter_readings_rows(big_page[i:i + 16384] for i in range(0, len(big_page), 16384)))
+        peaks[len(big_page)] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del big_page
+    (small, small_peak), (large, large_peak) = sorted(peaks.items())
+    if large_peak < small_peak * 1.5 and large_peak < small // 2:
+        print(f"  ✓ Peak {small_peak // 1024} KiB for a {small // 1024} KiB page, "
+              f"{large_peak // 1024} KiB for a {large // 1024} KiB page")
+    else:
+        print(f"  ✗ Peak grew from {small_peak // 1024} KiB to {large_peak // 1024} KiB")
+        failures += 1
+
+    print("\n3. A page without the readings table yields no meters...")
+    page_without_table = b'<html><body><table class="listview"><tr class="item"></tr></table></body></html>'
+    if build_meters(iter_readings_rows([page_without_table])) == [] == build_meters(soup_readings_rows(page_without_table)):
+        print("  ✓ Both parsers report no meters")
+    else:
+        print("  ✗ Meters found on a page without the readings table")
+        failures += 1
+
+    print("\n4. The client streams the readings page from the portal...")
+    body = readings_page(rows=9, padding=100000)
+
+    server = serve_page(body)
+    client = WAZNieplitzClient("test", "test", rate_limiter=TokenBucket(rate=1000, burst=5))
+    cycle = FetchCycle(timeout=10)
+    cycle.start()
+    try:
+        with mock.patch.object(run, 'READINGS_URL', f"http://127.0.0.1:{server.server_port}/ablesungen"):
+            meters = client.get_meter_readings(cycle)
+    finally:
+        cycle.finish('success')
+        server.shutdown()
+        server.server_close()
+    if [m['meter_number'] for m in meters] == ['15093668', '15093669', '30012345']:
+        print(f"  ✓ Parsed {len(meters)} meters from a {len(body) // 1024} KiB page")
+    else:
+        print(f"  ✗ Unexpected meters: {meters}")
+        failures += 1
+
+    print("\n5. A </table> inside a script or style does not end anything, however the page is split...")
+    script = (b'<script>if (t) { document.write("</table></td>"); }</script>'
+              b'<STYLE>td:after { content: "</table>"; }</STYLE>')
+    page = readings_page(rows=6).replace(b'<body>', b'<body>' + script, 1)
+    expected = build_meters(soup_readings_rows(page))
+    start = page.index(script)
+    splits = [[page[:i], page[i:]] for i in range(start, start + len(script) + 1)]
+    splits += [[page[i:i + size] for i in range(0, len(page), size)] for size in range(1, 10)]
+    mismatches = sum(1 for chunks in splits if build_meters(iter_readings_rows(chunks)) != expected)
+    if expected and mismatches == 0:
+        print(f"  ✓ Same meters as BeautifulSoup for {len(splits)} ways of splitting the page")
+    else:
+        print(f"  ✗ {mismatches} of {len(splits)} splits parsed differently")
+        failures += 1
+
+    assert failures == 0, f"{failures} streaming parse check(s) failed"
+    print("\n✓ Streaming parse tests completed!")
+
+
+def test_parse_pool():
+    """Test parsing readings pages in a process pool."""
+    print("\n" + "="*80)
+    print("TEST 20: Parse Pool")
+    print("="*80)
+
+    import concurrent.futures
+
+    failures = 0
+
+    print("\n1. Pages parsed in a worker process match the in-thread parse...")
+    body = readings_page(rows=30, padding=50000)
+    server = serve_page(body)
+    pool = create_parse_pool(1)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/ablesungen"
+        limiter = TokenBucket(rate=1000, burst=5)
+        with mock.patch.object(run, 'READINGS_URL', url):
+            pooled = WAZNieplitzClient("test", "test", rate_limiter=limiter, parse_pool=pool).get_meter_readings()
+            in_thread = WAZNieplitzClient("test", "test", rate_limiter=limiter).get_meter_readings()
+        missing = build_meters(run._pooled_readings_rows(pool.submit(parse_readings_page, b'<html></html>')))
+    finally:
+        pool.shutdown()
+        server.shutdown()
+        server.server_close()
+    if pooled == in_thread and len(pooled) == 3:
+        print(f"  ✓ {len(pooled)} meters, identical to the in-thread parse")
+    else:
+        print(f"  ✗ Pooled parse differs: {pooled}")
+        failures += 1
+    if missing == []:
+        print("  ✓ A page without the readings table yields no meters")
+    else:
+        print(f"  ✗ Meters found on a page without the readings table: {missing}")
+        failures += 1
+
+    print("\n2. A parse outlasting the fetch cycle raises FetchDeadlineExceeded...")
+    future = mock.Mock()
+    future.result.side_effect = concurrent.futures.TimeoutError()
+    cycle = FetchCycle(timeout=5)
+    cycle.start()
+    try:
+        list(run._pooled_readings_rows(future, cycle))
+        print("  ✗ No exception raised")
+        failures += 1
+    except FetchDeadlineExceeded:
+        if future.cancel.called:
+            print("  ✓ Deadline exceeded, pending parse cancelled")
+        else:
+            print("  ✗ Pending parse not cancelled")
+            failures += 1
+    finally:
+        cycle.finish('timeout')
+
+    print("\n3. Pool size...")
+    if create_parse_pool(0) is None:
+        print("  ✓ parse_workers 0 parses in the fetching thread")
+    else:
+        print("  ✗ A pool was created for parse_workers 0")
+        failures += 1
+    pool = create_parse_pool(-1)
+    if pool._max_workers == run.available_cpus():
+        print(f"  ✓ parse_workers -1 starts one worker per core ({pool._max_workers})")
+    else:
+        print(f"  ✗ {pool._max_workers} workers for {run.available_cpus()} cores")
+        failures += 1
+    start_method = pool._mp_context.get_start_method()
+    if start_method != 'fork':
+        print(f"  ✓ Workers started with {start_method}, not forked from the threaded add-on")
+    else:
+        print("  ✗ Workers are forked while other threads run")
+        failures += 1
+    pool.shutdown()
+
+    assert failures == 0, f"{failures} parse pool check(s) failed"
+    print("\n✓ Parse pool tests completed!")
+
+
+def test_leader_election():
+    """Test the leader lease shared by several instances."""
+    print("\n" + "="*80)
+    print("TEST 21: Leader Election")
+    print("="*80)
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+
+    print("\n1. One of three instances is elected...")
+    nodes = [LeaderLease(temp_dir, f"node-{i}", duration=0.6) for i in range(3)]
+    elected = [node.renew({'next_fetch': 1234.0}) for node in nodes]
+    if elected == [True, False, False] and nodes[2].lease['holder'] == 'node-0':
+        print("  ✓ node-0 active, the others see it as leader")
+    else:
+        print(f"  ✗ Elected: {elected}")
+        failures += 1
+
+    print("\n2. Never more than one active instance while heartbeats run...")
+    for node in nodes:
+        node.start(lambda: {'next_fetch': 1234.0})
+    overlaps = 0
+    end = time.monotonic() + 1.5
+    while time.monotonic() < end:
+        if sum(node.is_leader for node in nodes) > 1:
+            overlaps += 1
+        time.sleep(0.01)
+    if overlaps == 0 and nodes[0].is_leader and nodes[0].stats['renewed'] >= 3:
+        print(f"  ✓ node-0 renewed {nodes[0].stats['renewed']} times, no overlap")
+    else:
+        print(f"  ✗ {overlaps} samples with several leaders, node-0 stats {nodes[0].stats}")
+        failures += 1
+
+    print("\n3. A standby takes over within one lease period when the leader dies...")
+    nodes[0]._stop.set()  # Heartbeats stop as if the process had died
+    died = time.monotonic()
+    while not any(node.is_leader for node in nodes[1:]) and time.monotonic() - died < 3:
+        time.sleep(0.01)
+    takeover = time.monotonic() - died
+    successor = next((node for node in nodes[1:] if node.is_leader), None)
+    if successor and takeover <= 0.6 + 0.1 and not nodes[0].is_leader:
+        print(f"  ✓ {successor.node_id} took over after {takeover:.2f}s (lease 0.6s)")
+    else:
+        print(f"  ✗ No takeover within the lease period ({takeover:.2f}s)")
+        failures += 1
+    if successor and (successor.previous or {}).get('next_fetch') == 1234.0:
+        print("  ✓ Successor sees the previous leader's schedule")
+    else:
+        print(f"  ✗ Previous lease not kept: {successor.previous if successor else None}")
+        failures += 1
+    if not nodes[0].renew():
+        print("  ✓ The old leader stays standby after coming back")
+    else:
+        print("  ✗ The old leader took the lease back")
+        failures += 1
+
+    print("\n4. Releasing the lease hands over at once...")
+    changes = []
+    standby = next(node for node in nodes[1:] if node is not successor)
+    standby.on_change = changes.append
+    successor.release()
+    if standby.renew() and changes == [True] and (standby.previous or {}).get('holder') == successor.node_id:
+        print(f"  ✓ {standby.node_id} elected right after release")
+    else:
+        print(f"  ✗ Not elected after release: changes {changes}")
+        failures += 1
+    for node in nodes:
+        node._stop.set()
+
+    print("\n5. A standby serves the shared data read-only...")
+    writer = HistoricalReadingsManager(os.path.join(temp_dir, "historical_readings.json"))
+    reader = HistoricalReadingsManager(os.path.join(temp_dir, "historical_readings.json"))
+    writer.add_reading("1001", "2020-12-31", 100.0, 10.0)
+    if reader.get_readings("1001") == () and reader.reload() and len(reader.get_readings("1001")) == 1:
+        print("  ✓ Standby sees the leader's historical reading after reload")
+    else:
+        print(f"  ✗ Standby readings: {reader.get_readings('1001')}")
+        failures += 1
+
+    standby_lease = LeaderLease(temp_dir, "standby", duration=60)
+    standby_lease.lease = {'holder': 'node-1'}
+    client = run.create_app().test_client()
+    with mock.patch.dict(run.app_state, {'lease': standby_lease, 'historical_manager': reader}):
+        add = client.post('/historical/add', json={'meter_number': '1001', 'date': '2021-12-31', 'reading': 110})
+        status = client.get('/status').get_json()
+    if add.status_code == 409 and 'node-1' in add.get_json()['message'] and len(reader.get_readings("1001")) == 1:
+        print("  ✓ Changes rejected with 409, naming the active instance")
+    else:
+        print(f"  ✗ /historical/add answered {add.status_code}")
+        failures += 1
+    if status.get('coordination', {}).get('role') == 'standby' and status['coordination']['leader'] == 'node-1':
+        print("  ✓ /status reports the standby role and the leader")
+    else:
+        print(f"  ✗ /status coordination: {status.get('coordination')}")
+        failures += 1
+
+    print("\n6. A standby's store is read-only and a lost lease stops the flusher...")
+    legacy_dir = tempfile.mkdtemp()
+    legacy_store = os.path.join(legacy_dir, "historical_readings.json")
+    with open(legacy_store, 'w') as f:
+        json.dump({"1001": [{"date": "2019-12-31T00:00:00", "reading": 90.0, "consumption": None}]}, f)
+    standby_store = HistoricalReadingsManager(legacy_store, read_only=True)
+    if (not standby_store.add_reading("1001", "2020-12-31", 100.0) and os.path.exists(legacy_store)
+            and not os.path.exists(os.path.join(legacy_dir, "historical_readings"))):
+        print("  ✓ Standby neither migrates the legacy store nor accepts edits")
+    else:
+        print(f"  ✗ Storage of the standby: {sorted(os.listdir(legacy_dir))}")
+        failures += 1
+    standby_store.set_read_only(False)
+    if not os.path.exists(legacy_store) and len(standby_store.get_readings("1001")) == 1:
+        print("  ✓ Legacy store migrated once elected")
+    else:
+        print(f"  ✗ Storage after election: {sorted(os.listdir(legacy_dir))}")
+        failures += 1
+
+    demoted = HistoricalReadingsManager(legacy_store, flush_interval=60)
+    demoted.add_reading("1001", "2020-12-31", 100.0)
+    flusher = demoted._flusher
+    demoted.set_read_only(True)
+    on_disk = HistoricalReadingsManager(legacy_store, migrate_legacy=False).get_readings("1001")
+    if not flusher.is_alive() and demoted.pending_edits == 0 and len(on_disk) == 1 \
+            and len(demoted.get_readings("1001")) == 1:
+        print("  ✓ Flusher stopped, the unsaved edit dropped instead of written")
+    else:
+        print(f"  ✗ Flusher alive: {flusher.is_alive()}, pending {demoted.pending_edits}, on disk {len(on_disk)}")
+        failures += 1
+    shutil.rmtree(legacy_dir)
+
+    lapsed = LeaderLease(os.path.join(temp_dir, "lapsed"), "lapsed", duration=0.3)
+    changes = []
+    lapsed.on_change = changes.append
+    lapsed.renew()
+    time.sleep(0.25)
+    with mock.patch('os.makedirs', side_effect=OSError("share unavailable")):
+        lapsed.renew()
+    if changes == [True, False] and lapsed.stats['lost'] == 1:
+        print("  ✓ A lease that ran out before a failed renewal is reported as lost")
+    else:
+        print(f"  ✗ Changes {changes}, stats {lapsed.stats}")
+        failures += 1
+
+    shutil.rmtree(temp_dir)
+    assert failures == 0, f"{failures} leader election check(s) failed"
+    print("\n✓ Leader election tests completed!")
+
+
+def test_fetch_history():
+    """Test the ring buffer of fetch cycle records."""
+    print("\n" + "="*80)
+    print("TEST 22: Fetch History")
+    print("="*80)
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+    history_file = os.path.join(temp_dir, "fetch_history.json")
+
+    print("\n1. A fetch cycle counts portal bytes and rows...")
+    body = readings_page(rows=9)
+    server = serve_page(body)
+    cycle = FetchCycle(timeout=10, trigger='web')
+    cycle.start()
+    try:
+        with mock.patch.object(run, 'READINGS_URL', f"http://127.0.0.1:{server.server_port}/ablesungen"):
+            WAZNieplitzClient("test", "test", rate_limiter=TokenBucket(rate=1000, burst=5)).get_meter_readings(cycle)
+    finally:
+        cycle.finish('success')
+        server.shutdown()
+        server.server_close()
+    report = cycle.report()
+    if report['bytes'] == len(body) and report['rows'] == 9 and report['trigger'] == 'web':
+        print(f"  ✓ {report['bytes']} bytes, {report['rows']} rows, trigger {report['trigger']}")
+    else:
+        print(f"  ✗ Report: {report}")
+        failures += 1
+
+    print("\n2. Each cycle is recorded with trigger, phase durations and outcome...")
+    history = FetchHistory(history_file, size=3, save_interval=3600)
+    portal = mock.Mock()
+    portal.login.return_value = True
+    portal.get_meter_readings.return_value = [{
+        'meter_number': '1001', 'reading': 100.0, 'consumption': None, 'reading_type': 'Test',
+        'reading_date': None, 'reference_date': None, 'portal_readings': []
+    }]
+    config = {'meters': [{'number': '1001'}]}
+    with mock.patch.dict(run.app_state, {'fetch_history': history,
+                                         'portal_readings_file': os.path.join(temp_dir, "portal.json")}):
+        fetch_and_update_meters(portal, mock.Mock(), config, trigger='manual_file')
+        portal.login.return_value = False
+        fetch_and_update_meters(portal, mock.Mock(), config)
+    newest, oldest = history.entries()
+    if (oldest['trigger'] == 'manual_file' and oldest['outcome'] == 'success' and oldest['meters_updated'] == 1
+            and set(oldest['phases']) == {'login', 'parse', 'sensor_push'}
+            and newest['trigger'] == 'scheduled' and newest['outcome'] == 'failed'):
+        print(f"  ✓ Recorded {len(history.entries())} cycles, newest first, phases {sorted(oldest['phases'])}")
+    else:
+        print(f"  ✗ Entries: {history.entries()}")
+        failures += 1
+
+    print("\n3. The buffer is bounded and saved periodically...")
+    for _ in range(3):
+        history.record(report)
+    if len(history.entries()) == 3 and not os.path.exists(history_file):
+        print("  ✓ Oldest records dropped at size 3, nothing written before the save interval")
+    else:
+        print(f"  ✗ {len(history.entries())} entries, file exists: {os.path.exists(history_file)}")
+        failures += 1
+    history.save_interval = 0
+    history.save_if_due()
+    reloaded = FetchHistory(history_file, size=3)
+    if reloaded.entries() == history.entries():
+        print("  ✓ Records survive a restart")
+    else:
+        print(f"  ✗ Reloaded: {reloaded.entries()}")
+        failures += 1
+
+    print("\n4. /fetch/history serves the records...")
+    client = run.create_app().test_client()
+    with mock.patch.dict(run.app_state, {'fetch_history': history}):
+        response = client.get('/fetch/history?limit=2').get_json()
+        bad = client.get('/fetch/history?limit=x')
+        negative = client.get('/fetch/history?limit=-1')
+    if (response['size'] == 3 and len(response['entries']) == 2 and bad.status_code == 400
+            and negative.status_code == 400 and len(history.entries(-1)) == 3):
+        print("  ✓ Limited to 2 of 3 entries, invalid and negative limits rejected")
+    else:
+        print(f"  ✗ Response: {response}, invalid limit: {bad.status_code}, negative limit: {negative.status_code}")
+        failures += 1
+
+    shutil.rmtree(temp_dir)
+    assert failures == 0, f"{failures} fetch history check(s) failed"
+    print("\n✓ Fetch history tests completed!")
+
+
+def test_aggregates():
+    """Test the incrementally maintained yearly and monthly aggregates."""
+    print("\n" + "="*80)
+    print("TEST 23: Consumption Aggregates")
+    print("="*80)
+
+    import random
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+    manager = HistoricalReadingsManager(os.path.join(temp_dir, "historical_readings.json"))
+    portal = {'1001': [
+        {'date': '2023-12-31T00:00:00', 'reading': 500, 'consumption': 80},
+        {'date': '2024-12-31T00:00:00', 'reading': 590, 'consumption': 90}
+    ]}
+
+    print("\n1. Index built from manual and portal readings...")
+    manager.add_reading("1001", "2020-12-31", 260.0, 70.0)
+    manager.add_reading("1001", "2023-06-30", 460.0, 40.0)
+    index = AggregateIndex()
+    index.build(manager, portal)
+    year_2023 = index.get('1001', '2023')
+    if (year_2023 and year_2023['consumption'] == 120 and year_2023['readings'] == 2
+            and list(year_2023['months']) == ['06', '12'] and index.get('1001')['readings'] == 4):
+        print("  ✓ 2023: 120 m³ from 2 readings in June and December")
+    else:
+        print(f"  ✗ 2023 bucket: {year_2023}")
+        failures += 1
+
+    print("\n2. Incremental updates match a full rebuild...")
+    rng = random.Random(7)
+    mismatches = 0
+    for step in range(200):
+        date = f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        meter = rng.choice(['1001', '1002'])
+        if rng.random() < 0.3:
+            manager.delete_reading(meter, date)
+        elif rng.random() < 0.5:
+            portal[meter] = [{'date': f"{date}T00:00:00", 'reading': rng.randint(0, 900),
+                              'consumption': rng.choice([None, rng.randint(1, 99)])}] + portal.get(meter, [])[:5]
+            index.set_portal_readings(meter, portal[meter])
+        else:
+            manager.add_reading(meter, date, rng.randint(0, 900), rng.choice([None, rng.randint(1, 99)]))
+        rebuilt = AggregateIndex()
+        rebuilt.build(manager, portal)
+        manual = {m: entry['totals'] for m, entry in manager.get_summary().items()}
+        recomputed = {m: HistoricalReadingsManager._summarize(manager.get_readings(m))['totals'] for m in manual}
+        if manual != recomputed or any(index.get(m) != rebuilt.get(m) for m in ('1001', '1002')):
+            mismatches += 1
+    if mismatches == 0:
+        print("  ✓ 200 random adds, updates, deletes and portal refreshes, identical to a rebuild")
+    else:
+        print(f"  ✗ {mismatches} step(s) differ from a rebuild")
+        failures += 1
+
+    print("\n3. Missing consumption is derived from the neighbouring readings...")
+    derived = HistoricalReadingsManager(os.path.join(temp_dir, "derived.json"))
+    index = AggregateIndex(derived)
+    for year, reading in ((2020, 100.0), (2021, 150.0), (2022, 210.0)):
+        derived.add_reading("2001", f"{year}-12-31", reading)
+    years = {year: bucket['consumption'] for year, bucket in index.get('2001')['years'].items()}
+    derived.delete_reading("2001", "2021-12-31")
+    after_delete = index.get('2001', '2022')['consumption']
+    for year in (2020, 2022):
+        derived.delete_reading("2001", f"{year}-12-31")
+    index.set_portal_readings('2001', [{'date': '2020-12-31T00:00:00', 'reading': 5, 'consumption': 5}])
+    index.set_portal_readings('2001', [])
+    if (years == {'2020': 0.0, '2021': 50.0, '2022': 60.0} and after_delete == 110.0
+            and index.get('2001') is None and index.meters() == []):
+        print("  ✓ 100/150/210 m³ give 50 and 60 m³, 110 m³ after deleting 2021, no buckets once emptied")
+    else:
+        print(f"  ✗ Years {years}, after delete {after_delete}, left over {index.get('2001')}")
+        failures += 1
+
+    print("\n4. Startup reads no shards...")
+    reopened = HistoricalReadingsManager(os.path.join(temp_dir, "historical_readings.json"))
+    startup = AggregateIndex()
+    startup.build(reopened, portal)
+    if reopened.stats['loads'] == 0 and startup.get('1001') == rebuilt.get('1001'):
+        print("  ✓ Aggregates of a reopened store served without loading any readings")
+    else:
+        print(f"  ✗ {reopened.stats['loads']} shard(s) loaded")
+        failures += 1
+
+    print("\n5. A fetch updates the portal part of the index...")
+    portal_client = mock.Mock()
+    portal_client.login.return_value = True
+    portal_client.get_meter_readings.return_value = [{
+        'meter_number': '3001', 'reading': 700.0, 'consumption': 50, 'reading_type': 'Test',
+        'reading_date': None, 'reference_date': None,
+        'portal_readings': [{'date': '2024-12-31T00:00:00', 'reading': 700, 'consumption': 50}]
+    }]
+    with mock.patch.dict(run.app_state, {'aggregates': index,
+                                         'portal_readings_file': os.path.join(temp_dir, "portal.json")}):
+        fetch_and_update_meters(portal_client, mock.Mock(), {'meters': [{'number': '3001'}]})
+    if (index.get('3001', '2024') or {}).get('consumption') == 50:
+        print("  ✓ 2024 consumption of meter 3001 indexed after the fetch")
+    else:
+        print(f"  ✗ Meter 3001: {index.get('3001')}")
+        failures += 1
+
+    print("\n6. /stats serves the buckets...")
+    client = run.create_app().test_client()
+    with mock.patch.dict(run.app_state, {'aggregates': index}):
+        month = client.get('/stats?meter=3001&year=2024&month=12')
+        missing = client.get('/stats?meter=3001&year=2020')
+        invalid = client.get('/stats?meter=3001&month=12')
+        everything = client.get('/stats').get_json()
+    if (month.status_code == 200 and month.get_json()['consumption'] == 50 and missing.status_code == 404
+            and invalid.status_code == 400 and '3001' in everything['meters']):
+        print("  ✓ Month bucket served, missing year 404, month without year 400")
+    else:
+        print(f"  ✗ Responses: {month.status_code} {month.get_json()}, {missing.status_code}, {invalid.status_code}")
+        failures += 1
+
+    shutil.rmtree(temp_dir)
+    assert failures == 0, f"{failures} aggregate check(s) failed"
+    print("\n✓ Aggregate tests completed!")
+
+
+def test_historical_paging():
+    """Test the paged /historical/list used by the virtualized readings table."""
+    print("\n" + "="*80)
+    print("TEST 24: Historical List Paging")
+    print("="*80)
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+    manager = HistoricalReadingsManager(os.path.join(temp_dir, "historical_readings.json"))
+    for year in range(1900, 2150):
+        manager.add_reading("1001", f"{year}-12-31", float(year), 10.0)
+    manager.add_reading("1002", "2020-12-31", 50.0)
+    client = run.create_app().test_client()
+
+    with mock.patch.dict(run.app_state, {'historical_manager': manager}):
+        print("\n1. Summary without readings...")
+        summary = client.get('/historical/list?summary=1').get_json()
+        counts = {meter: info['count'] for meter, info in summary['meters'].items()}
+        if counts == {'1001': 250, '1002': 1}:
+            print("  ✓ Counts per meter: 1001 has 250, 1002 has 1")
+        else:
+            print(f"  ✗ Summary: {summary}")
+            failures += 1
+
+        print("\n2. Pages in date order...")
+        first = client.get('/historical/list?meter=1001').get_json()
+        second = client.get('/historical/list?meter=1001&offset=100&limit=100').get_json()
+        if (first['total'] == 250 and len(first['readings']) == run.HISTORICAL_PAGE_SIZE
+                and first['readings'][0]['date'].startswith('1900')
+                and second['offset'] == 100 and second['readings'][0]['date'].startswith('2000')):
+            print("  ✓ First page starts in 1900, second page at offset 100 in 2000")
+        else:
+            print(f"  ✗ Pages: {first['total']}, {len(first['readings'])}, {second['offset']}")
+            failures += 1
+
+        print("\n3. Page edges...")
+        last = client.get('/historical/list?meter=1001&offset=200&limit=100').get_json()
+        beyond = client.get('/historical/list?meter=1001&offset=900').get_json()
+        capped = client.get('/historical/list?meter=1001&limit=100000').get_json()
+        unknown = client.get('/historical/list?meter=9999').get_json()
+        if (len(last['readings']) == 50 and beyond['readings'] == [] and beyond['total'] == 250
+                and len(capped['readings']) == 250 and unknown['total'] == 0):
+            print("  ✓ Short last page, empty page past the end, unknown meter has 0 readings")
+        else:
+            print(f"  ✗ Edges: {len(last['readings'])}, {beyond}, {len(capped['readings'])}, {unknown}")
+            failures += 1
+
+        print("\n4. Invalid paging arguments...")
+        invalid = client.get('/historical/list?meter=1001&offset=abc')
+        if invalid.status_code == 400 and not invalid.get_json()['success']:
+            print("  ✓ Non-numeric offset rejected with 400")
+        else:
+            print(f"  ✗ Response: {invalid.status_code}")
+            failures += 1
+
+        print("\n5. Full list without arguments...")
+        full = client.get('/historical/list').get_json()
+        if len(full['readings']['1001']) == 250 and len(full['readings']['1002']) == 1:
+            print("  ✓ All readings of all meters")
+        else:
+            print(f"  ✗ Full list meters: {list(full['readings'])}")
+            failures += 1
+
+    shutil.rmtree(temp_dir)
+    assert failures == 0, f"{failures} historical paging check(s) failed"
+    print("\n✓ Historical paging tests completed!")
+
+
+def test_synthetic_data():
+    """Test parsing and storing generated data with edge cases at scale."""
+    print("\n" + "="*80)
+    print("TEST 25: Synthetic Data")
+    print("="*80)
+
+    from generate_synthetic import (
+        historical_store, portal_rows, readings_page as synthetic_page, write_historical_store
+    )
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+
+    print("\n1. Portal page with edge cases, both parsers...")
+    page = synthetic_page(4, 60, padding=50000, seed=3)
+    soup_meters = build_meters(soup_readings_rows(page))
+    stream_meters = build_meters(iter_readings_rows(page[i:i + 4096] for i in range(0, len(page), 4096)))
+    rows = portal_rows(4, 60, seed=3)
+    parsed = sum(len(m['portal_readings']) for m in stream_meters)
+    if soup_meters == stream_meters and len(stream_meters) == 4 and parsed == len(rows):
+        print(f"  ✓ Both parsers agree on {parsed} rows of 4 meters (duplicated dates kept)")
+    else:
+        print(f"  ✗ Parsed {parsed} of {len(rows)} rows, parsers agree: {soup_meters == stream_meters}")
+        failures += 1
+
+    print("\n2. Thousands separators and missing Ablesetag...")
+    separated = [r for r in rows if r['stand'].count('.')]
+    readings = [r for m in stream_meters for r in m['portal_readings']]
+    undated = [r for r in readings if r['reading_date'] is None]
+    if (separated and all(r['reading'] > 0 for r in readings)
+            and len(undated) == sum(1 for r in rows if not r['ablesetag'])
+            and all(r['date'] == r['reference_date'] for r in undated)):
+        print(f"  ✓ {len(separated)} readings like '{separated[0]['stand']}' parsed, "
+              f"{len(undated)} rows dated by Stichtag")
+    else:
+        print(f"  ✗ Zero readings: {sum(1 for r in readings if r['reading'] == 0)}, undated: {len(undated)}")
+        failures += 1
+
+    print("\n3. Large historical store...")
+    store = os.path.join(temp_dir, "historical_readings.json")
+    entries = write_historical_store(store, 2, 10000, seed=5)
+    dates = {meter: len({r['date'] for r in readings}) for meter, readings in historical_store(2, 10000, 5).items()}
+    manager = HistoricalReadingsManager(store)
+    counts = {meter: info['count'] for meter, info in manager.get_summary().items()}
+    if entries > 20000 and counts == dates and all(count == 10000 for count in counts.values()):
+        print(f"  ✓ {entries} entries with duplicated dates loaded as 2 x 10000 readings")
+    else:
+        print(f"  ✗ {entries} entries loaded as {counts}")
+        failures += 1
+
+    shutil.rmtree(temp_dir)
+    assert failures == 0, f"{failures} synthetic data check(s) failed"
+    print("\n✓ Synthetic data tests completed!")
+
+
+def test_maintenance_cli():
+    """Test the offline maintenance commands of run.py."""
+    print("\n" + "="*80)
+    print("TEST 26: Maintenance Commands")
+    print("="*80)
+
+    import subprocess
+    from generate_synthetic import write_historical_store
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+    other_dir = tempfile.mkdtemp()
+    store = os.path.join(temp_dir, "historical_readings.json")
+    storage = os.path.join(temp_dir, "historical_readings")
+    write_historical_store(store, 2, 2000, seed=1)
+
+    def command(name, *argv, path=temp_dir):
+        config = {'coordination_path': path, 'main_meter_number': '15093668'}
+        with mock.patch('run.load_config', return_value=config):
+            return run.COMMANDS[name](list(argv))
+
+    print("\n1. verify leaves a legacy store alone, compact migrates it...")
+    untouched = command('verify') == 0 and os.path.exists(store)
+    compacted = command('compact') == 0
+    if untouched and compacted and not os.path.exists(store) and command('verify') == 0:
+        print("  ✓ Legacy store migrated by compact and verified")
+    else:
+        print(f"  ✗ verify kept the store: {untouched}, compact succeeded: {compacted}")
+        failures += 1
+
+    print("\n2. verify finds damage, compact repairs it...")
+    shard = os.path.join(storage, "15093668.json")
+    with open(shard, 'r') as f:
+        readings = json.load(f)
+    with open(shard, 'w') as f:
+        json.dump(readings + readings[:3], f)
+    with open(os.path.join(storage, "manifest.json.tmp"), 'w') as f:
+        f.write('{')
+    with open(os.path.join(storage, "15093668.json.tmp"), 'w') as f:
+        f.write('[')
+    problems = HistoricalReadingsManager(store, migrate_legacy=False).verify()
+    with mock.patch.object(run.logger, 'error') as log_error:
+        result = HistoricalReadingsManager(store).compact()
+    repaired = command('verify') == 0
+    if len(problems) == 5 and repaired and not os.path.exists(os.path.join(storage, "manifest.json.tmp")):
+        print(f"  ✓ {len(problems)} problems found (leftover files, unsorted, duplicates, manifest) and repaired")
+    else:
+        print(f"  ✗ Problems: {problems}, repaired: {repaired}")
+        failures += 1
+    if result['removed_files'] == 2 and not log_error.called:
+        print("  ✓ Both leftover files removed before the rewrite reused their names")
+    else:
+        print(f"  ✗ Removed {result['removed_files']} file(s), errors: {log_error.call_args_list}")
+        failures += 1
+
+    print("\n3. Export and import round trip...")
+    export_file = os.path.join(temp_dir, "export.csv.gz")
+    command('export', '--gzip', '--output', export_file)
+    imported = command('import', export_file, path=other_dir)
+    counts = {m: info['count'] for m, info in
+              HistoricalReadingsManager(os.path.join(other_dir, "historical_readings.json")).get_summary().items()}
+    bad_file = os.path.join(temp_dir, "bad.json")
+    with open(bad_file, 'w') as f:
+        json.dump([{'meter_number': '1', 'date': 'yesterday', 'reading': 1}], f)
+    if imported == 0 and counts == {'15093668': 2000, '15093669': 2000} and command('import', bad_file) == 1:
+        print("  ✓ 4000 exported readings imported with one write, invalid command reported")
+    else:
+        print(f"  ✗ Import returned {imported}, counts {counts}")
+        failures += 1
+
+    print("\n4. reimport-stats uses the stored readings...")
+    with mock.patch('run.SUPERVISOR_TOKEN', 'token'), \
+            mock.patch.object(run.HomeAssistantAPI, 'import_statistics', return_value=True) as import_statistics:
+        result = command('reimport-stats')
+    if result == 0 and import_statistics.call_count == 1 and len(import_statistics.call_args[0][2]) == 2000:
+        print("  ✓ 2000 readings of the configured meter sent to Home Assistant")
+    else:
+        print(f"  ✗ Result {result}, calls {import_statistics.call_args_list}")
+        failures += 1
+
+    print("\n5. Reading commands leave a legacy store to the running add-on...")
+    legacy_dir = tempfile.mkdtemp()
+    legacy_store = os.path.join(legacy_dir, "historical_readings.json")
+    write_historical_store(legacy_store, 1, 10, seed=2)
+    exported = command('export', '--output', os.path.join(legacy_dir, "export.csv"), path=legacy_dir)
+    with mock.patch('run.SUPERVISOR_TOKEN', 'token'), \
+            mock.patch.object(run.HomeAssistantAPI, 'import_statistics', return_value=True):
+        reimported = command('reimport-stats', path=legacy_dir)
+    if (exported == 0 and reimported == 0 and os.path.exists(legacy_store)
+            and not os.path.exists(os.path.join(legacy_dir, "historical_readings"))):
+        print("  ✓ export and reimport-stats did not migrate the store")
+    else:
+        print(f"  ✗ Storage after export and reimport-stats: {sorted(os.listdir(legacy_dir))}")
+        failures += 1
+    shutil.rmtree(legacy_dir)
+
+    print("\n6. Commands do not start the web server or contact the portal...")
+    script = ("import sys, run; code = run.COMMANDS['verify']([]); "
+              "print(code, 'flask' in sys.modules, 'requests' in sys.modules)")
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=dict(os.environ, COORDINATION_PATH=temp_dir)).stdout.split('\n')[-2]
+    if output == '0 False False':
+        print("  ✓ verify ran without importing Flask or requests")
+    else:
+        print(f"  ✗ Output: {output!r}")
+        failures += 1
+
+    shutil.rmtree(temp_dir)
+    shutil.rmtree(other_dir)
+    assert failures == 0, f"{failures} maintenance command check(s) failed"
+    print("\n✓ Maintenance command tests completed!")
+
+
+def test_event_stream():
+    """Test the /events stream: replay after Last-Event-ID and the cap on open streams."""
+    print("\n" + "="*80)
+    print("TEST 27: Event Stream")
+    print("="*80)
+
+    failures = 0
+
+    print("\n1. The broker replays the events after Last-Event-ID...")
+    broker = run.EventBroker(replay_size=3)
+    for i in range(1, 5):
+        broker.publish('fetch_phase', {'phase': f"p{i}"})
+    resumed = broker.subscribe(last_event_id=2)
+    replayed = [resumed.get_nowait()[0] for _ in range(resumed.qsize())]
+    fresh = broker.subscribe()
+    if replayed == [3, 4] and fresh.empty():
+        print(f"  ✓ Resumed after event 2 with {replayed}, a new subscriber gets no replay")
+    else:
+        print(f"  ✗ Replayed {replayed}, new subscriber queue size {fresh.qsize()}")
+        failures += 1
+
+    print("\n2. The subscriber cap holds under concurrent subscribes...")
+    broker = run.EventBroker()
+    barrier = threading.Barrier(10)
+    accepted = []
+
+    def subscribe():
+        barrier.wait()
+        accepted.append(broker.subscribe(max_subscribers=2))
+
+    threads = [threading.Thread(target=subscribe) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    admitted = sum(1 for subscriber in accepted if subscriber is not None)
+    if admitted == 2 and broker.subscriber_count() == 2:
+        print("  ✓ 2 of 10 concurrent subscribers admitted")
+    else:
+        print(f"  ✗ {admitted} admitted, {broker.subscriber_count()} registered")
+        failures += 1
+
+    print("\n3. /events replays, refuses streams over the cap with 503 and releases on close...")
+    broker = run.EventBroker()
+    broker.publish('fetch_phase', {'phase': 'login'})
+    broker.publish('fetch_complete', {'last_fetch': None})
+    client = run.create_app().test_client()
+    with mock.patch.object(run, 'events', broker), \
+            mock.patch.dict(run.app_state, {'web_server': mock.Mock(workers=3)}):
+        stream = client.get('/events', headers={'Last-Event-ID': '1'}, buffered=False)
+        chunks = iter(stream.response)
+        first, second = next(chunks).decode(), next(chunks).decode()
+        refused = client.get('/events')
+        stream.close()
+        reopened = client.get('/events', buffered=False)
+        reopened_status = reopened.status_code
+        reopened.close()
+    if (stream.status_code == 200 and first.startswith('retry:')
+            and second.startswith('id: 2\nevent: fetch_complete')):
+        print("  ✓ Stream resumed with event 2 after Last-Event-ID 1")
+    else:
+        print(f"  ✗ Status {stream.status_code}, chunks {first!r}, {second!r}")
+        failures += 1
+    if refused.status_code == 503 and refused.get_json()['success'] is False:
+        print("  ✓ Second stream refused with 503 while 3 workers allow one")
+    else:
+        print(f"  ✗ Second stream: {refused.status_code}")
+        failures += 1
+    if reopened_status == 200 and broker.subscriber_count() == 0:
+        print("  ✓ Closing a stream frees its slot")
+    else:
+        print(f"  ✗ Reopened: {reopened_status}, {broker.subscriber_count()} subscriber(s) left")
+        failures += 1
+
+    print("\n4. /status reports a running fetch for clients without a stream...")
+    with run.fetch_lock:
+        fetching = client.get('/status').get_json()['fetching']
+    idle = client.get('/status').get_json()['fetching']
+    if fetching is True and idle is False:
+        print("  ✓ fetching is true only while a fetch holds the lock")
+    else:
+        print(f"  ✗ fetching: {fetching} while running, {idle} when idle")
+        failures += 1
+
+    assert failures == 0, f"{failures} event stream check(s) failed"
+    print("\n✓ Event stream tests completed!")
+
+
+def test_response_compression():
+    """Test gzip compression of JSON responses and ETag revalidation of the main page."""
+    print("\n" + "="*80)
+    print("TEST 28: Web Response Compression")
+    print("="*80)
+
+    import gzip
+
+    failures = 0
+    temp_dir = tempfile.mkdtemp()
+    history = FetchHistory(os.path.join(temp_dir, "fetch_history.json"), size=50)
+    cycle = FetchCycle(timeout=10)
+    cycle.start()
+    cycle.finish('success')
+    for _ in range(30):
+        history.record(cycle.report())
+    client = run.create_app().test_client()
+
+    print("\n1. Large JSON responses are gzipped for clients that accept it...")
+    with mock.patch.dict(run.app_state, {'fetch_history': history}):
+        compressed = client.get('/fetch/history', headers={'Accept-Encoding': 'gzip'})
+        plain = client.get('/fetch/history')
+        small = client.get('/fetch/history?limit=1', headers={'Accept-Encoding': 'gzip'})
+    body = compressed.get_data()
+    if (compressed.headers.get('Content-Encoding') == 'gzip' and 'Accept-Encoding' in compressed.headers['Vary']
+            and json.loads(gzip.decompress(body)) == plain.get_json() and len(body) < len(plain.get_data())):
+        print(f"  ✓ {len(plain.get_data())} bytes sent as {len(body)} gzipped bytes")
+    else:
+        print(f"  ✗ Headers: {dict(compressed.headers)}")
+        failures += 1
+
+    print("\n2. No compression without Accept-Encoding: gzip or below GZIP_MIN_SIZE...")
+    if 'Content-Encoding' not in plain.headers and plain.get_json()['size'] == 50:
+        print("  ✓ Plain JSON without Accept-Encoding")
+    else:
+        print(f"  ✗ Headers without Accept-Encoding: {dict(plain.headers)}")
+        failures += 1
+    if 'Content-Encoding' not in small.headers and len(small.get_data()) < run.GZIP_MIN_SIZE:
+        print(f"  ✓ {len(small.get_data())} byte response left uncompressed")
+    else:
+        print(f"  ✗ Headers of a small response: {dict(small.headers)}")
+        failures += 1
+
+    print("\n3. The main page is revalidated via ETag...")
+    with mock.patch.object(run, 'INDEX_HTML_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')):
+        asset = run.load_index_asset()
+    with mock.patch.dict(run.app_state, {'index_asset': asset}):
+        page = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        etag = page.headers.get('ETag', '').strip('"')
+        revalidated = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'})
+        identity = client.get('/', headers={'If-None-Match': f'"{etag}"'})
+    if (page.status_code == 200 and page.headers.get('Content-Encoding') == 'gzip'
+            and gzip.decompress(page.get_data()) == asset['body']):
+        print(f"  ✓ Page served gzipped with ETag {etag}")
+    else:
+        print(f"  ✗ Page: {page.status_code} {dict(page.headers)}")
+        failures += 1
+    if revalidated.status_code == 304 and revalidated.get_data() == b'':
+        print("  ✓ Matching If-None-Match answered with an empty 304")
+    else:
+        print(f"  ✗ Revalidation: {revalidated.status_code}, {len(revalidated.get_data())} bytes")
+        failures += 1
+    if identity.status_code == 200 and identity.get_data() == asset['body'] and 'Content-Encoding' not in identity.headers:
+        print("  ✓ A client without gzip gets the uncompressed page, not a 304 for the gzipped one")
+    else:
+        print(f"  ✗ Without gzip: {identity.status_code} {dict(identity.headers)}")
+        failures += 1
+
+    shutil.rmtree(temp_dir)
+    assert failures == 0, f"{failures} response compression check(s) failed"
+    print("\n✓ Response compression tests completed!")
+
+
+def test_bounded_web_pool():
+    """Test that the web server rejects connections beyond its workers and queue with 503."""
+    print("\n" + "="*80)
+    print("TEST 29: Bounded Web Worker Pool")
+    print("="*80)
+
+    import socket
+
+    failures = 0
+    entered = threading.Event()
+    release = threading.Event()
+
+    def slow_app(environ, start_response):
+        entered.set()
+        release.wait(10)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'done']
+
+    server = run.make_bounded_server('127.0.0.1', 0, slow_app, workers=1, queue_size=1, request_timeout=10)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def connect():
+        connection = socket.create_connection(('127.0.0.1', server.server_port), timeout=5)
+        connection.sendall(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+        return connection
+
+    def read_all(connection):
+        data = b''
+        while True:
+            chunk = connection.recv(4096)
+            if not chunk:
+                return data
+            data += chunk
+
+    print("\n1. With the worker busy and the queue full, a connection gets 503...")
+    busy = connect()
+    entered.wait(5)
+    queued = connect()
+    deadline = time.monotonic() + 5
+    while server.pending.qsize() < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    rejected = read_all(connect())
+    if rejected.startswith(b"HTTP/1.0 503") and b"Retry-After: 1" in rejected and server.rejected == 1:
+        print("  ✓ Third connection answered 503 with Retry-After while 1 worker and 1 queue slot are taken")
+    else:
+        print(f"  ✗ Response: {rejected[:60]!r}, rejected {server.rejected}")
+        failures += 1
+
+    print("\n2. Queued connections are served once the worker is free...")
+    release.set()
+    answers = [read_all(busy), read_all(queued)]
+    if all(a.startswith(b"HTTP/1.0 200") and a.endswith(b"done") for a in answers) and server.rejected == 1:
+        print("  ✓ Busy and queued connections both answered 200")
+    else:
+        print(f"  ✗ Answers: {[a[:30] for a in answers]}")
+        failures += 1
+
+    server.shutdown()
+    server.server_close()
+    assert failures == 0, f"{failures} web pool check(s) failed"
+    print("\n✓ Bounded web pool tests completed!")
+
+
+def test_app_factory():
+    """Test that create_app() registers every route and that importing run.py stays light."""
+    print("\n" + "="*80)
+    print("TEST 30: App Factory and Deferred Imports")
+    print("="*80)
+
+    import subprocess
+
+    failures = 0
+
+    print("\n1. Every route is registered by create_app()...")
+    expected = {
+        ('/', 'GET'), ('/fetch', 'POST'), ('/fetch/history', 'GET'), ('/events', 'GET'), ('/status', 'GET'),
+        ('/config', 'GET'), ('/historical/add', 'POST'), ('/historical/delete', 'POST'),
+        ('/historical/list', 'GET'), ('/stats', 'GET'), ('/export', 'GET')
+    }
+    app = run.create_app()
+    registered = {(rule.rule, method) for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+                  for method in rule.methods - {'HEAD', 'OPTIONS'}}
+    decorated = {rule for rule, _, _ in run._routes}
+    if registered == expected and decorated == {rule for rule, _ in expected} and run.create_app() is app:
+        print(f"  ✓ {len(registered)} routes registered, the app is created once")
+    else:
+        print(f"  ✗ Missing: {expected - registered}, unexpected: {registered - expected}")
+        failures += 1
+
+    print("\n2. import run loads neither Flask nor the portal and Home Assistant libraries...")
+    script = ("import sys, run; "
+              "print(sorted(m for m in ('flask', 'websocket', 'bs4') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip().split('\n')[-1]
+    if output == '[]':
+        print("  ✓ flask, websocket and bs4 are imported on first use")
+    else:
+        print(f"  ✗ Imported by import run: {output}")
+        failures += 1
+
+    assert failures == 0, f"{failures} app factory check(s) failed"
+    print("\n✓ App factory tests completed!")
+
+
 def run_all_tests(username: str, password: str, skip_portal: bool = False):
     """Run all tests."""
     print("\n" + "="*80)
@@ -363,6 +2449,81 @@ def run_all_tests(username: str, password: str, skip_portal: bool = False):
     # Test 5: Command File Processing
     test_command_file_processing()
 
+    # Test 6: Date Parsing
+    test_date_parsing()
+
+    # Test 7: Meter Registry
+    test_meter_registry()
+
+    # Test 8: Concurrent Historical Access
+    test_concurrent_historical_access()
+
+    # Test 9: Group Commit
+    test_group_commit()
+
+    # Test 10: Sharded Storage
+    test_sharded_storage()
+
+    # Test 11: State Push Skipping
+    test_state_push_skipping()
+
+    # Test 12: Outbound Queue
+    test_outbound_queue()
+
+    # Test 13: Portal Rate Limiter
+    test_portal_rate_limiter()
+
+    # Test 14: Streaming Export
+    test_export()
+
+    # Test 15: Command Spool
+    test_command_spool()
+
+    # Test 16: Adaptive Fetch Schedule
+    test_adaptive_schedule()
+
+    # Test 17: Fetch Jitter
+    test_fetch_jitter()
+
+    # Test 18: Fetch Cycle Deadline
+    test_fetch_cycle_deadline()
+
+    # Test 19: Streaming Readings Parse
+    test_streaming_parse()
+
+    # Test 20: Parse Pool
+    test_parse_pool()
+
+    # Test 21: Leader Election
+    test_leader_election()
+
+    # Test 22: Fetch History
+    test_fetch_history()
+
+    # Test 23: Consumption Aggregates
+    test_aggregates()
+
+    # Test 24: Historical List Paging
+    test_historical_paging()
+
+    # Test 25: Synthetic Data
+    test_synthetic_data()
+
+    # Test 26: Maintenance Commands
+    test_maintenance_cli()
+
+    # Test 27: Event Stream
+    test_event_stream()
+
+    # Test 28: Web Response Compression
+    test_response_compression()
+
+    # Test 29: Bounded Web Worker Pool
+    test_bounded_web_pool()
+
+    # Test 30: App Factory and Deferred Imports
+    test_app_factory()
+
     print("\n" + "="*80)
     print("TEST SUITE COMPLETED")
     print("="*80)